@@ -0,0 +1,129 @@
+import argparse
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from tyre_api import create_server
+from tyre_db import TyreDB
+
+def get_paths(db_name: str) -> list[str]:
+    """
+    Builds a mix of requests from the sizes and brands that are in the database.
+
+    Args:
+        db_name (str): The database being served.
+
+    Returns:
+        list[str]: The request paths to cycle through.
+    """
+    with TyreDB(db_name, read_only=True) as db:
+        db.cursor.execute("SELECT DISTINCT width, aspect_ratio, rim_diameter FROM tyre")
+        sizes: list[tuple] = db.cursor.fetchall()
+        db.cursor.execute("SELECT brand_name FROM brand")
+        brands: list[str] = [row[0] for row in db.cursor.fetchall()]
+
+    paths: list[str] = []
+
+    for width, aspect_ratio, rim_diameter in sizes:
+        size: str = f"width={width}&aspect_ratio={aspect_ratio}&rim_diameter={rim_diameter}"
+        paths.append(f"/offers?{size}")
+        paths.append(f"/best-price?{size}")
+        paths.append(f"/best-price?{size}&season=Winter")
+
+    for brand in brands:
+        paths.append(f"/search?q={urllib.request.quote(brand[:4])}")
+
+    return paths
+
+def run_load_test(base_url: str, paths: list[str], threads: int, duration: float) -> tuple[int, int, list[float]]:
+    """
+    Sends requests from several threads for a fixed amount of time.
+
+    Args:
+        base_url (str): The server address (e.g. http://127.0.0.1:8000).
+        paths (list[str]): The request paths to cycle through.
+        threads (int): The number of concurrent clients.
+        duration (float): How long to send requests for in seconds.
+
+    Returns:
+        tuple[int, int, list[float]]: The number of successful requests, failed requests and the latency of each request in milliseconds.
+    """
+    latencies: list[float] = []
+    errors: list[int] = [0]
+    lock = threading.Lock()
+    deadline: float = time.perf_counter() + duration
+
+    def client(offset: int) -> None:
+        local_latencies: list[float] = []
+        local_errors: int = 0
+        index: int = offset
+
+        while time.perf_counter() < deadline:
+            start: float = time.perf_counter()
+
+            try:
+                with urllib.request.urlopen(base_url + paths[index % len(paths)], timeout=10) as response:
+                    response.read()
+                local_latencies.append((time.perf_counter() - start) * 1000)
+            except (urllib.error.URLError, OSError):
+                local_errors += 1
+
+            index += 1
+
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+
+    workers: list[threading.Thread] = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+    return len(latencies), errors[0], latencies
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load tests the read-only query server.")
+    parser.add_argument('--url', help="The address of a running server, one is started in-process if not given.")
+    parser.add_argument('--db', default=TyreDB.get_db_name(), help="The database to serve and build requests from.")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help="How long to run for in seconds.")
+    args = parser.parse_args()
+
+    paths: list[str] = get_paths(args.db)
+
+    if not paths:
+        print(f"There is no data in '{args.db}' to build requests from.")
+        return
+
+    server = None
+    base_url: str | None = args.url
+
+    if base_url is None:
+        server = create_server('127.0.0.1', 0, args.db)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"Sending requests to {base_url} from {args.threads} threads for {args.duration:.0f} seconds...")
+
+    successes, failures, latencies = run_load_test(base_url, paths, args.threads, args.duration)
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+    print(f"Requests: {successes} ok, {failures} failed, {successes / args.duration:.0f} requests/second")
+
+    if latencies:
+        latencies.sort()
+        print(
+            f"Latency: p50 {statistics.median(latencies):.2f} ms, "
+            f"p95 {latencies[max(0, int(len(latencies) * 0.95) - 1)]:.2f} ms, "
+            f"p99 {latencies[max(0, int(len(latencies) * 0.99) - 1)]:.2f} ms"
+        )
+
+if __name__ == "__main__":
+    main()
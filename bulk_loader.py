@@ -0,0 +1,175 @@
+import argparse
+import csv
+import gzip
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import IO, Iterator
+from tyre_batch import NULL
+from tyre_db import TyreDB
+from tyre_snapshot import TyreSnapshot
+
+def open_csv_file(filename: str) -> IO[str]:
+    """
+    Args:
+        filename (str): A CSV file, gzipped if the name ends in '.gz'.
+
+    Returns:
+        IO[str]: The file opened for reading text.
+    """
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', encoding='utf-8', newline='')
+
+    return open(filename, 'r', encoding='utf-8', newline='', buffering=1 << 20)
+
+def read_csv_chunks(filename: str, chunk_rows: int) -> Iterator[list[list[str]]]:
+    """
+    Streams the rows of a tyre_scrape.csv file (see CsvSink) so only one chunk is held in memory at a time.
+    Rows with the wrong number of values (e.g. from early exports that didn't quote pattern names containing commas) are skipped.
+
+    Args:
+        filename (str): The CSV file, gzipped if the name ends in '.gz'.
+        chunk_rows (int): The number of rows in each chunk.
+
+    Returns:
+        Iterator[list[list[str]]]: The chunks of rows, the values are in the order of TyreDB.IMPORT_COLUMNS.
+
+    Raises:
+        ValueError: The file doesn't start with the tyre_scrape.csv header.
+    """
+    with open_csv_file(filename) as f:
+        reader = csv.reader(f)
+        header: list[str] = next(reader, [])
+
+        if tuple(header) != TyreDB.IMPORT_COLUMNS:
+            raise ValueError(f"'{filename}' doesn't have the header of a tyre scrape CSV file")
+
+        column_count: int = len(header)
+        chunk: list[list[str]] = []
+        malformed: int = 0
+
+        for row in reader:
+            if len(row) != column_count:
+                malformed += 1
+                continue
+
+            chunk.append(row)
+
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+
+        if chunk:
+            yield chunk
+
+    if malformed:
+        print(f"Skipped {malformed} malformed row{'s' if malformed != 1 else ''} in '{filename}'.")
+
+def read_snapshot_chunks(filename: str, chunk_rows: int) -> Iterator[list[tuple[str, ...]]]:
+    """
+    Streams the rows of an archived run's snapshot (see tyre_snapshot.write_snapshot()) as the same strings a CSV file would hold.
+    Each chunk is decoded straight from the snapshot's columns without creating any Tyre objects.
+
+    Args:
+        filename (str): The snapshot file.
+        chunk_rows (int): The number of rows in each chunk.
+
+    Returns:
+        Iterator[list[tuple[str, ...]]]: The chunks of rows, the values are in the order of TyreDB.IMPORT_COLUMNS.
+    """
+    with TyreSnapshot(filename) as snapshot:
+        for start in range(0, len(snapshot), chunk_rows):
+            stop: int = min(start + chunk_rows, len(snapshot))
+            columns: list[list[str]] = []
+
+            for name in TyreDB.IMPORT_COLUMNS:
+                if name == 'price':
+                    columns.append([str(value / 100) if value != NULL else 'None' for value in snapshot.column('price_pence')[start:stop]])
+                elif snapshot.columns[name]['kind'] == 'string':
+                    dictionary: list[str] = [str(value) for value in snapshot.dictionary(name)]
+                    columns.append([dictionary[code] for code in snapshot.column(name)[start:stop]])
+                elif snapshot.columns[name]['typecode'] == 'b':
+                    columns.append([str(bool(value)) if value != NULL else 'None' for value in snapshot.column(name)[start:stop]])
+                else:
+                    columns.append([str(value) if value != NULL else 'None' for value in snapshot.column(name)[start:stop]])
+
+            yield list(zip(*columns))
+
+def get_recorded_at(filename: str) -> str:
+    """
+    Args:
+        filename (str): An exported CSV file or snapshot.
+
+    Returns:
+        str: When the file was last modified, roughly when it was scraped, in UTC in the format SQLite's CURRENT_TIMESTAMP uses.
+    """
+    return datetime.fromtimestamp(os.path.getmtime(filename), timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+def import_file(db: TyreDB, filename: str, chunk_rows: int = 100000, keep_dates: bool = True) -> tuple[int, int]:
+    """
+    Imports one CSV file or snapshot in a single transaction, if anything goes wrong none of the file is kept.
+
+    Args:
+        db (TyreDB): The instance of the database object.
+        filename (str): A tyre_scrape.csv file (optionally gzipped) or a '.tys' snapshot.
+        chunk_rows (int): How many rows are staged and upserted at a time.
+        keep_dates (bool): Whether the price history is dated by the file's modification time rather than now.
+
+    Returns:
+        tuple[int, int]: The number of rows read and the number that added or changed a tyre.
+    """
+    chunks = read_snapshot_chunks(filename, chunk_rows) if filename.endswith('.tys') else read_csv_chunks(filename, chunk_rows)
+    recorded_at: str | None = get_recorded_at(filename) if keep_dates else None
+    read: int = 0
+    written: int = 0
+
+    try:
+        for chunk in chunks:
+            read += len(chunk)
+            written += db.import_csv_rows(chunk, recorded_at)
+
+        db.finish_import()
+    except Exception:
+        db.conn.rollback()
+        raise
+
+    return read, written
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Loads exported tyre_scrape.csv files and archived run snapshots into the database.")
+    parser.add_argument('files', nargs='+', help="The CSV files (optionally gzipped) and '.tys' snapshots to load, oldest first so the newest prices are kept.")
+    parser.add_argument('--db', help="The database to load into, defaults to tyres.db.")
+    parser.add_argument('--chunk-rows', type=int, default=100000, help="How many rows are staged and upserted at a time.")
+    parser.add_argument('--no-file-dates', action='store_true', help="Date the price history now instead of by each file's modification time.")
+    args = parser.parse_args()
+
+    start_time: float = time.monotonic()
+    total_read: int = 0
+    total_written: int = 0
+
+    with TyreDB(args.db) as db:
+        # Each file is committed in one go, in WAL mode NORMAL only skips syncing the log on every commit and can't corrupt the database
+        db.cursor.execute("PRAGMA synchronous=NORMAL")
+        db.cursor.execute("PRAGMA temp_store=MEMORY")
+        db.cursor.execute("PRAGMA cache_size=-262144")
+
+        for filename in args.files:
+            file_start_time: float = time.monotonic()
+
+            try:
+                read, written = import_file(db, filename, args.chunk_rows, keep_dates=not args.no_file_dates)
+            except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+                print(f"There was a problem loading '{filename}', none of it was kept: {e}")
+                continue
+
+            total_read += read
+            total_written += written
+            print(f"Loaded {read} row{'s' if read != 1 else ''} from '{filename}' ({written} new or changed) in {time.monotonic() - file_start_time:.2f}s.")
+
+    total_time: float = time.monotonic() - start_time
+    print(f"Loaded {total_read} row{'s' if total_read != 1 else ''} from {len(args.files)} file{'s' if len(args.files) != 1 else ''} "
+          f"({total_written} new or changed) in {total_time:.2f}s ({total_read / max(total_time, 1e-9):.0f} rows/s).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import csv
+import gzip
+import os
+from typing import IO
+from retailer import Retailer
+from tyre_batch import TyreBatch
+
+class CsvSink:
+    """Streams scraped tyres to a CSV file, the finished file only replaces the old one once everything has been written"""
+    def __init__(self, filename: str, compress: bool = False, buffer_rows: int = 5000) -> None:
+        """
+        Opens a temporary file next to the CSV file and writes the header row to it.
+
+        Args:
+            filename (str): The name of the CSV file to write to (e.g. tyre_scrape.csv).
+            compress (bool): Whether to gzip the output, '.gz' is added to the filename if it's missing.
+            buffer_rows (int): How many rows are held in memory before they are written to the file.
+        """
+        self.filename: str = filename if not compress or filename.endswith('.gz') else f"{filename}.gz"
+        self.temp_filename: str = f"{self.filename}.tmp"
+        self.buffer_rows: int = buffer_rows
+        self.rows_written: int = 0
+        self._buffer: list[tuple] = []
+
+        if compress:
+            self._file: IO[str] = gzip.open(self.temp_filename, 'wt', encoding='utf-8', newline='')
+        else:
+            self._file = open(self.temp_filename, 'w', encoding='utf-8', newline='', buffering=1 << 20)
+
+        self._writer = csv.writer(self._file, lineterminator='\n')
+        self._writer.writerow(['retailer', *TyreBatch.get_tyre_attribute_names().split(',')])
+
+    def __enter__(self) -> "CsvSink":
+        """Context manager entry point"""
+        return self
+
+    def __exit__(self, exception_type, exception_val, exception_tb) -> bool:
+        """Context manager exit point - only replaces the CSV file if no exception occurred"""
+        if exception_type is not None:
+            self.discard()
+        else:
+            self.close()
+
+        return False
+
+    def write_tyres(self, retailer_name: str, tyres: TyreBatch) -> None:
+        """
+        Buffers every tyre of a batch, rows are written whenever the buffer fills up.
+
+        Args:
+            retailer_name (str): The retailer the tyres were scraped from.
+            tyres (TyreBatch): The tyres to write.
+        """
+        for row in tyres.get_csv_rows():
+            # Every value goes through str() so None, True, etc. are written the same as earlier exports
+            self._buffer.append((retailer_name, *map(str, row)))
+
+            if len(self._buffer) >= self.buffer_rows:
+                self._write_buffer()
+
+    def write_retailer(self, retailer: Retailer) -> None:
+        """
+        Writes a completed scrape job and flushes it to the temporary file.
+
+        Args:
+            retailer (Retailer): The retailer and the tyres that were scraped.
+        """
+        self.write_tyres(retailer.retailer, retailer.tyres)
+        self.flush()
+
+    def flush(self) -> None:
+        """Writes any buffered rows and flushes them to disk."""
+        self._write_buffer()
+        self._file.flush()
+
+    def close(self) -> None:
+        """Writes any remaining rows then atomically replaces the CSV file with the temporary file."""
+        if self._file.closed:
+            return
+
+        self._write_buffer()
+        self._file.close()
+        os.replace(self.temp_filename, self.filename)
+
+    def discard(self) -> None:
+        """Closes and deletes the temporary file, leaving any existing CSV file untouched."""
+        if not self._file.closed:
+            self._file.close()
+
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+    def _write_buffer(self) -> None:
+        """Writes the buffered rows to the file in one call."""
+        if self._buffer:
+            self._writer.writerows(self._buffer)
+            self.rows_written += len(self._buffer)
+            self._buffer.clear()
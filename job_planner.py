@@ -0,0 +1,153 @@
+from datetime import datetime, timezone
+from scrapers import BaseScraper
+
+# The estimated cost in seconds of a job at a website that has never been scraped
+DEFAULT_COST: float = 30.0
+# The estimated number of results of a job at a website that has never been scraped
+DEFAULT_RESULTS: float = 20.0
+
+class JobEstimate:
+    """The estimated cost and value of one scrape job"""
+    def __init__(self, scraper: BaseScraper, cost: float, value: float, known: bool) -> None:
+        """
+        Args:
+            scraper (BaseScraper): The job.
+            cost (float): The estimated time the job takes in seconds.
+            value (float): How useful running the job is expected to be, roughly the number of tyres it should find.
+            known (bool): Whether the estimate comes from the job's own history rather than the website's average or the defaults.
+        """
+        self.scraper = scraper
+        self.cost = cost
+        self.value = value
+        self.known = known
+
+    def __str__(self) -> str:
+        return (
+            f"{self.scraper.get_retailer_name()} {self.scraper.get_basic_tyre_details()} "
+            f"(~{self.cost:.1f}s, value {self.value:.0f}{'' if self.known else ', no history'})"
+        )
+
+class JobPlan:
+    """The jobs chosen to run within a time budget, in the order they should run, and the jobs left out"""
+    def __init__(self, jobs: list[JobEstimate], skipped: list[JobEstimate], budget: float) -> None:
+        self.jobs = jobs
+        self.skipped = skipped
+        self.budget = budget
+
+    @property
+    def scrapers(self) -> list[BaseScraper]:
+        """
+        Returns:
+            list[BaseScraper]: The chosen jobs, most valuable first.
+        """
+        return [job.scraper for job in self.jobs]
+
+    def get_summary(self) -> str:
+        """
+        Returns:
+            str: How many jobs fit in the budget and which were skipped.
+        """
+        total: int = len(self.jobs) + len(self.skipped)
+        lines: list[str] = [f"Planned {len(self.jobs)} of {total} job{'s' if total != 1 else ''} to fit a {self.budget:.0f} second budget."]
+
+        if self.skipped:
+            lines.append(f"Skipped {len(self.skipped)} job{'s' if len(self.skipped) != 1 else ''}:")
+            lines.extend(f"  {job}" for job in self.skipped)
+
+        return '\n'.join(lines)
+
+def get_job_estimates(scrapers: list[BaseScraper], stats: list[tuple], now: datetime | None = None) -> list[JobEstimate]:
+    """
+    Estimates each job (a size at a postcode/branch) from its recent history. A job that hasn't run before is costed from the same size at the
+    website's other locations, then from the website's average and then the defaults.
+    A job's value is the results it's expected to find, discounted by how often it fails and raised by up to double the longer it has gone
+    without a successful scrape, so stale sizes catch up.
+
+    Args:
+        scrapers (list[BaseScraper]): The jobs.
+        stats (list[tuple]): The return of TyreDB.get_job_history_stats().
+        now (datetime | None): The current time in UTC, used to work out how stale each job is.
+
+    Returns:
+        list[JobEstimate]: The estimate of each job, in the same order.
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None) # recorded_at is stored in UTC without a timezone
+    history: dict[tuple, tuple] = {tuple(row[:5]): row[5:] for row in stats}
+    size_costs: dict[tuple, list[float]] = {}
+    domain_costs: dict[str, list[float]] = {}
+    domain_results: dict[str, list[float]] = {}
+
+    for (domain, _, *size), (duration, result_count, _, _) in history.items():
+        size_costs.setdefault((domain, *size), []).append(duration)
+        domain_costs.setdefault(domain, []).append(duration)
+
+        if result_count is not None:
+            domain_results.setdefault(domain, []).append(result_count)
+
+    estimates: list[JobEstimate] = []
+
+    for scraper in scrapers:
+        domain: str = scraper.domain
+        size: tuple[int, int, int] = (scraper.tyre_width, scraper.aspect_ratio, scraper.rim_diameter)
+        job_history: tuple | None = history.get((domain, scraper.location or '', *size))
+        costs: list[float] = size_costs.get((domain, *size)) or domain_costs.get(domain, [])
+        results: list[float] = domain_results.get(domain, [])
+        average_cost: float = sum(costs) / len(costs) if costs else DEFAULT_COST
+        average_results: float = sum(results) / len(results) if results else DEFAULT_RESULTS
+
+        if job_history is None:
+            estimates.append(JobEstimate(scraper, average_cost, average_results * 2, known=False)) # Never scraped, so as stale as it gets
+            continue
+
+        duration, result_count, success_rate, last_success = job_history
+        stale_days: float = 7.0
+
+        if last_success:
+            stale_days = (now - datetime.fromisoformat(last_success)).total_seconds() / 86400
+
+        staleness: float = 1 + min(max(stale_days, 0.0), 7.0) / 7
+        expected_results: float = result_count if result_count is not None else average_results
+        value: float = max(success_rate, 0.1) * (1 + expected_results) * staleness # Failing jobs are still tried now and then
+
+        estimates.append(JobEstimate(scraper, duration, value, known=True))
+
+    return estimates
+
+def plan_within_budget(scrapers: list[BaseScraper], budget: float, stats: list[tuple], concurrency: dict[str, float] | None = None) -> JobPlan:
+    """
+    Chooses the jobs that give the most value within a time budget.
+    Websites are scraped at the same time, so each one gets the whole budget (times how many of its jobs can run at once).
+    Within a website jobs are taken greedily by value per second, skipping any that no longer fit.
+
+    Args:
+        scrapers (list[BaseScraper]): The jobs.
+        budget (float): How long the run can take in seconds.
+        stats (list[tuple]): The return of TyreDB.get_job_history_stats().
+        concurrency (dict[str, float] | None): How many jobs of each website are expected to run at once, 1 if not given.
+
+    Returns:
+        JobPlan: The chosen jobs, most valuable first, and the skipped jobs.
+    """
+    concurrency = concurrency or {}
+    estimates_by_domain: dict[str, list[JobEstimate]] = {}
+
+    for estimate in get_job_estimates(scrapers, stats):
+        estimates_by_domain.setdefault(estimate.scraper.domain, []).append(estimate)
+
+    chosen: list[JobEstimate] = []
+    skipped: list[JobEstimate] = []
+
+    for domain, estimates in estimates_by_domain.items():
+        remaining: float = budget * concurrency.get(domain, 1.0)
+
+        for estimate in sorted(estimates, key=lambda estimate: estimate.value / max(estimate.cost, 0.1), reverse=True):
+            if estimate.cost <= remaining:
+                chosen.append(estimate)
+                remaining -= estimate.cost
+            else:
+                skipped.append(estimate)
+
+    # The most valuable jobs run first, so if the estimates were optimistic it's the least useful jobs that miss the deadline
+    chosen.sort(key=lambda estimate: estimate.value, reverse=True)
+
+    return JobPlan(chosen, skipped, budget)
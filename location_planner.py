@@ -0,0 +1,161 @@
+import hashlib
+from scrape_scheduler import AdaptiveScheduler, ScrapeResult
+from scrapers import BaseScraper, create_scraper
+from tyre_batch import TyreBatch
+from tyre_db import TyreDB
+
+def get_price_fingerprint(tyres: TyreBatch) -> str | None:
+    """
+    Args:
+        tyres (TyreBatch): The tyres scraped for one location.
+
+    Returns:
+        str | None: A hash of every sku and its price, locations with the same fingerprint are charged the same prices.
+            None if nothing was scraped, as an empty page doesn't say anything about the prices.
+    """
+    if not len(tyres):
+        return None
+
+    offers: list[str] = sorted(f"{sku}={tyres.get_price(i)}" for i, sku in enumerate(tyres.sku))
+
+    return hashlib.sha1('\n'.join(offers).encode('utf-8')).hexdigest()
+
+class LocationZones:
+    """Remembers which locations share the same prices at each retailer, the zone is named after one of its locations"""
+    def __init__(self, zones: dict[tuple[str, str], str] | None = None) -> None:
+        """
+        Args:
+            zones (dict[tuple[str, str], str] | None): The zone of each (domain, location) already known.
+        """
+        self.zones: dict[tuple[str, str], str] = zones or {}
+        self._changed: set[tuple[str, str]] = set()
+
+    @staticmethod
+    def load(db: TyreDB, max_age_days: int = 30) -> "LocationZones":
+        """
+        Args:
+            db (TyreDB): The database the zones were saved to.
+            max_age_days (int): Zones resolved longer ago than this are forgotten so they get resolved again.
+
+        Returns:
+            LocationZones: The zones that were saved.
+        """
+        return LocationZones({(domain, location): zone for domain, location, zone in db.get_location_zones(max_age_days)})
+
+    def save(self, db: TyreDB) -> None:
+        """
+        Saves the zones resolved since they were loaded.
+
+        Args:
+            db (TyreDB): The database to save to.
+        """
+        db.save_location_zones((domain, location, self.zones[domain, location]) for domain, location in self._changed)
+        self._changed.clear()
+
+    def get_zone(self, domain: str, location: str) -> str | None:
+        """
+        Args:
+            domain (str): The retailer's domain.
+            location (str): The postcode or branch.
+
+        Returns:
+            str | None: The location's zone, None if it isn't known.
+        """
+        return self.zones.get((domain, location))
+
+    def set_zone(self, domain: str, location: str, zone: str) -> None:
+        """
+        Args:
+            domain (str): The retailer's domain.
+            location (str): The postcode or branch.
+            zone (str): The zone the location belongs to.
+        """
+        if self.zones.get((domain, location)) != zone:
+            self.zones[domain, location] = zone
+            self._changed.add((domain, location))
+
+    def resolve(self, results: list[ScrapeResult]) -> None:
+        """
+        Groups the locations of scrapes of the same size by the prices they were given.
+        A location joins the zone of any location it matches that already has one, otherwise the matching locations form a new zone.
+
+        Args:
+            results (list[ScrapeResult]): Scrapes of the same retailer and size at different locations.
+        """
+        locations_by_fingerprint: dict[tuple[str, str], list[str]] = {}
+
+        for result in results:
+            fingerprint: str | None = get_price_fingerprint(result.tyres) if result.error is None else None
+
+            if fingerprint is not None and result.scraper.location is not None:
+                locations_by_fingerprint.setdefault((result.scraper.domain, fingerprint), []).append(result.scraper.location)
+
+        for (domain, _), locations in locations_by_fingerprint.items():
+            known_zones: list[str] = sorted({zone for location in locations if (zone := self.get_zone(domain, location))})
+            zone: str = known_zones[0] if known_zones else min(locations)
+
+            for location in locations:
+                self.set_zone(domain, location, zone)
+
+def plan_jobs(
+        scraper_names: list[str],
+        sizes: list[tuple[int, int, int]],
+        locations: dict[str, list[str]],
+        zones: LocationZones,
+        scheduler: AdaptiveScheduler
+) -> list[BaseScraper]:
+    """
+    Plans one scrape per retailer, size and price zone instead of one per retailer, size and location.
+    Locations whose zone isn't known yet are probed with the first size first. The probes go through the scheduler,
+    so the probe of each zone's own location is reused rather than fetched again when the planned jobs are run with the same scheduler.
+
+    Args:
+        scraper_names (list[str]): The registered names of the retailers (e.g. national, dexel).
+        sizes (list[tuple[int, int, int]]): The (tyre_width, aspect_ratio, rim_diameter) of each size.
+        locations (dict[str, list[str]]): The postcodes or branches to scrape for each retailer, a retailer that isn't listed uses its default location.
+        zones (LocationZones): The known zones, updated with any that are resolved by probing.
+        scheduler (AdaptiveScheduler): The scheduler the probes and the planned jobs are run with.
+
+    Returns:
+        list[BaseScraper]: The scrapers to run, each one's locations lists every location it stands in for.
+    """
+    jobs: list[BaseScraper] = []
+
+    for name in scraper_names:
+        template: BaseScraper = create_scraper(name, *sizes[0])
+        domain: str = template.domain
+        name_locations: list[str | None] = list(dict.fromkeys([template.normalise_location(location) for location in locations.get(name) or [] if location] or [None]))
+
+        if len(name_locations) > 1:
+            unknown: list[str] = [location for location in name_locations if zones.get_zone(domain, location) is None]
+
+            if unknown:
+                # The known zones are probed too, so new locations can be matched to them
+                probes: list[BaseScraper] = [create_scraper(name, *sizes[0], location) for location in unknown]
+                probes += [create_scraper(name, *sizes[0], zone) for zone in sorted({zones.get_zone(domain, location) for location in name_locations} - {None})]
+
+                print(f"Probing the prices of {len(unknown)} new location{'s' if len(unknown) != 1 else ''} at {domain}...")
+
+                try:
+                    zones.resolve(list(scheduler.run(probes)))
+                finally:
+                    # The probes ran on their own worker threads, so any browsers they left open would sit idle for the rest of the run
+                    type(probes[0]).close_sessions()
+
+        # Locations that couldn't be resolved (e.g. the probe failed) are scraped on their own
+        members_by_zone: dict[str | None, list[str]] = {}
+
+        for location in name_locations:
+            zone: str | None = zones.get_zone(domain, location) if location is not None else None
+            members_by_zone.setdefault(zone or location, []).append(location)
+
+        if len(name_locations) > 1:
+            print(f"{len(name_locations)} location{'s' if len(name_locations) != 1 else ''} at {domain} share {len(members_by_zone)} price zone{'s' if len(members_by_zone) != 1 else ''}.")
+
+        for zone, members in members_by_zone.items():
+            for size in sizes:
+                scraper: BaseScraper = create_scraper(name, *size, zone)
+                scraper.locations = [location for location in members if location is not None] or scraper.locations
+                jobs.append(scraper)
+
+    return jobs
@@ -0,0 +1,390 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Each pattern belongs to one brand, as it does in the database
+PATTERNS: dict[str, tuple[str, ...]] = {
+    'Goodyear': ('EfficientGrip Performance 2', 'UltraGrip 9+'),
+    'Michelin': ('Primacy 4', 'CrossClimate 2'),
+    'Continental': ('PremiumContact 6', 'WinterContact TS 870'),
+    'Pirelli': ('Cinturato P7', 'Cinturato All Season SF2'),
+    'Bridgestone': ('Turanza T005', 'Blizzak LM005'),
+    'Dunlop': ('Sport Response', 'Winter Sport 5'),
+    'Hankook': ('Ventus Prime 3', 'Kinergy 4S2'),
+    'Falken': ('Ziex ZE310', 'Euroall Season AS210'),
+    'Nexen': ('N Blue HD Plus', 'Winguard Snow G3'),
+    'Avon': ('ZV7', 'WX7 Winter'),
+}
+BRANDS: tuple[str, ...] = tuple(PATTERNS)
+SEASONS: tuple[str, ...] = ('Summer', 'Winter', 'All Season')
+RATINGS: str = 'ABCDE'
+SPEED_RATINGS: str = 'HVWY'
+BRANCHES: tuple[str, ...] = ('Doncaster', 'Sheffield', 'Leeds', 'Rotherham', 'Barnsley', 'Wakefield')
+
+WIDTHS: list[int] = list(range(135, 345, 10))
+PROFILES: list[int] = [16] + list(range(25, 90, 5))
+RIMS: list[int] = list(range(12, 23))
+
+class MockProduct:
+    """One generated tyre, the same size always generates the same products"""
+    __slots__ = ('sku', 'brand', 'pattern', 'load_index', 'speed_rating', 'price', 'wet_grip', 'fuel_efficiency', 'db_rating_number', 'db_rating_letter', 'season', 'budget', 'electric')
+
+    def __init__(self, size: tuple[int, int, int], index: int) -> None:
+        rng = random.Random(f"{size}-{index}")
+        self.sku: str = f"MK{size[0]}{size[1]}{size[2]}{index:04d}"
+        self.brand: str = rng.choice(BRANDS)
+        self.pattern: str = rng.choice(PATTERNS[self.brand])
+        self.load_index: int = rng.randint(82, 104)
+        self.speed_rating: str = rng.choice(SPEED_RATINGS)
+        self.price: float = round(rng.uniform(45, 260), 2)
+        self.wet_grip: str = rng.choice(RATINGS)
+        self.fuel_efficiency: str = rng.choice(RATINGS)
+        self.db_rating_number: int = rng.randint(67, 74)
+        self.db_rating_letter: str = rng.choice('ABC')
+        self.season: str = rng.choice(SEASONS)
+        self.budget: bool = self.brand in ('Nexen', 'Avon')
+        self.electric: bool = rng.random() < 0.1
+
+class MockRetailer:
+    """Builds the pages of a pretend National (one results page per size) and Dexel (size form, branch list, paginated results)"""
+    def __init__(self,
+                 products: int = 40,
+                 page_size: int = 10,
+                 latency: float = 0.05,
+                 jitter: float = 0.02,
+                 error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 retry_after: int = 1,
+                 price_zones: int = 3,
+                 seed: int = 0
+    ) -> None:
+        """
+        Args:
+            products (int): The number of tyres listed for every size.
+            page_size (int): The number of tyres on each Dexel results page.
+            latency (float): How long in seconds each response is delayed by.
+            jitter (float): The most the delay randomly varies by either way.
+            error_rate (float): The share of requests answered with a 500 Internal Server Error.
+            rate_limit_rate (float): The share of requests answered with a 429 Too Many Requests.
+            retry_after (int): The Retry-After header sent with a 429.
+            price_zones (int): How many different sets of prices the postcodes and branches are spread over.
+            seed (int): Seeds the injected latency, errors and rate limiting.
+        """
+        self.products = products
+        self.page_size = page_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.price_zones = price_zones
+        self.stats: dict[str, int] = {'requests': 0, 'ok': 0, 'not_modified': 0, 'errors': 0, 'rate_limited': 0, 'not_found': 0}
+        self._random = random.Random(seed)
+        self._catalogue: dict[tuple[int, int, int], list[MockProduct]] = {}
+        self._lock = threading.Lock()
+
+    def get_products(self, size: tuple[int, int, int]) -> list[MockProduct]:
+        """
+        Args:
+            size (tuple[int, int, int]): The tyre width, aspect ratio and rim diameter.
+
+        Returns:
+            list[MockProduct]: The tyres listed for the size.
+        """
+        with self._lock:
+            if size not in self._catalogue:
+                self._catalogue[size] = [MockProduct(size, i) for i in range(self.products)]
+
+            return self._catalogue[size]
+
+    def get_price(self, product: MockProduct, location: str) -> float:
+        """
+        Args:
+            product (MockProduct): The tyre.
+            location (str): The postcode or branch.
+
+        Returns:
+            float: The tyre's price at the location, each price zone adds £1.
+        """
+        zone: int = int(hashlib.md5(location.upper().encode('utf-8')).hexdigest(), 16) % self.price_zones if location else 0
+        return round(product.price + zone, 2)
+
+    def inject(self) -> int | None:
+        """
+        Sleeps for the configured latency and decides whether the request should fail.
+
+        Returns:
+            int | None: 500 or 429 if the request should fail, None if it should be answered.
+        """
+        with self._lock:
+            self.stats['requests'] += 1
+            delay: float = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            roll: float = self._random.random()
+
+        time.sleep(delay)
+
+        if roll < self.rate_limit_rate:
+            return 429
+
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 500
+
+        return None
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    @staticmethod
+    def get_size(text: str) -> tuple[int, int, int] | None:
+        """
+        Args:
+            text (str): A size in the format 205-55-16.
+
+        Returns:
+            tuple[int, int, int] | None: The size, None if it isn't valid.
+        """
+        try:
+            width, aspect_ratio, rim_diameter = (int(part) for part in text.split('-'))
+        except ValueError:
+            return None
+
+        return width, aspect_ratio, rim_diameter
+
+    def render_national(self, size: tuple[int, int, int], postcode: str) -> str:
+        """
+        Args:
+            size (tuple[int, int, int]): The tyre size searched for.
+            postcode (str): The postcode from the pc parameter.
+
+        Returns:
+            str: A results page laid out like National's tyres-search page.
+        """
+        width, aspect_ratio, rim_diameter = size
+        divs: list[str] = []
+
+        for i, product in enumerate(self.get_products(size)):
+            divs.append(
+                f'<div id="PageContent_ucTyreResults_rptTyres_divTyre_{i}" data-brand="{escape(product.brand)}" '
+                f'data-price="{self.get_price(product, postcode):.2f}" data-grip="WG-{product.wet_grip}" '
+                f'data-tyre-season="{product.season}" data-fuel="RR-{product.fuel_efficiency}" '
+                f'data-budget="{str(product.budget).lower()}" data-electric="{"yes" if product.electric else "no"}" data-tyre-type="Car">'
+                f'<div class="tyreresult"><button data-partcode="{product.sku}">Add</button>'
+                f'<div id="PageContent_ucTyreResults_rptTyres_divTyreLabel_{i}" '
+                f'style="background-image: url(\'/tyre-eprel-image.ashx?NL={product.db_rating_number}&NMV={product.db_rating_letter}&RRC={product.fuel_efficiency}&WG={product.wet_grip}\')"></div></div>'
+                f'<a id="PageContent_ucTyreResults_rptTyres_hypPattern_{i}">{escape(product.pattern)}</a>'
+                f'<div class="details"><p>{escape(product.brand)}</p><p>{width}/{aspect_ratio} R{rim_diameter} {product.load_index}{product.speed_rating}</p></div>'
+                f'</div>'
+            )
+
+        return f"<html><body><h1>Tyres {width}/{aspect_ratio} R{rim_diameter}</h1>{''.join(divs)}</body></html>"
+
+    @staticmethod
+    def render_dexel_home() -> str:
+        return '<html><body><a href="/tyre-size">Search by Tyre Size.</a></body></html>'
+
+    @staticmethod
+    def render_dexel_size_form() -> str:
+        """
+        Returns:
+            str: The size form, the options are all listed up front instead of being loaded as each dropdown is picked.
+        """
+        def options(values: list[int]) -> str:
+            return '<option>Select</option>' + ''.join(f'<option>{value}</option>' for value in values)
+
+        return (
+            '<html><body><form id="size_form" action="/branches">'
+            f'<select name="width" class="width_list">{options(WIDTHS)}</select>'
+            f'<select name="profile" class="profile_list">{options(PROFILES)}</select>'
+            f'<select name="size" class="size_list">{options(RIMS)}</select>'
+            '<a href="#" onclick="document.getElementById(\'size_form\').submit(); return false;">Search</a>'
+            '</form></body></html>'
+        )
+
+    @staticmethod
+    def render_dexel_branches(params: dict[str, str]) -> str:
+        """
+        Args:
+            params (dict[str, str]): The size picked in the form.
+
+        Returns:
+            str: The list of branches to pick from.
+        """
+        branches: list[str] = []
+
+        for branch in BRANCHES:
+            url: str = '/results?' + urlencode({**params, 'branch': branch, 'page': 1})
+            branches.append(
+                f'<div class="branch"><h3>{branch}</h3><p>1 High Street, {branch}</p>'
+                f'<div class="branch-actions"><button onclick="location.href=\'{url}\'">Select This Branch</button></div></div>'
+            )
+
+        return f"<html><body>{''.join(branches)}</body></html>"
+
+    def render_dexel_results(self, params: dict[str, str]) -> str | None:
+        """
+        Args:
+            params (dict[str, str]): The size, branch and page number.
+
+        Returns:
+            str | None: A page of results laid out like Dexel's, None if the parameters aren't valid.
+        """
+        try:
+            size: tuple[int, int, int] = int(params['width']), int(params['profile']), int(params['size'])
+            page: int = max(1, int(params.get('page', 1)))
+        except (KeyError, ValueError):
+            return None
+
+        branch: str = params.get('branch', BRANCHES[0])
+        products: list[MockProduct] = self.get_products(size)
+        divs: list[str] = []
+
+        for product in products[(page - 1) * self.page_size:page * self.page_size]:
+            divs.append(
+                f'<div class="tkf-product">'
+                f'<p class="para-text">{size[0]}/{size[1]}R{size[2]} {product.load_index}{product.speed_rating}</p>'
+                f'<span id="defaultBuyingOptionPrice">£{self.get_price(product, branch):,.2f}</span>'
+                f'<div class="tyre_info_model fuel">{product.fuel_efficiency.lower()}</div>'
+                f'<div class="tyre_info_model grip">{product.wet_grip.lower()}</div>'
+                f'<div class="exterior-noice">{product.db_rating_number}</div>'
+                f'<div class="tyre-icons"><i class="icon-{product.season.lower()}" title="{product.season.lower()}"></i></div>'
+                f'<div class="tyre-icons vehicle-types"><i class="icon-car" title="car"></i></div>'
+                + ('<button title="Electric Vehicle">EV</button>' if product.electric else '') +
+                f'<form class="book_tyre"><input name="prodCode" value="{product.sku}"><input name="brand" value="{escape(product.brand)}">'
+                f'<input name="pattern" value="{escape(product.pattern)}"></form>'
+                f'</div>'
+            )
+
+        # A numbered pager with a '>' link while there are more pages
+        page_count: int = max(1, -(-len(products) // self.page_size))
+        pager: list[str] = [
+            f'<span class="current">{number}</span>' if number == page else f'<a href="/results?{urlencode({**params, "page": number})}">{number}</a>'
+            for number in range(1, page_count + 1)
+        ]
+
+        if page < page_count:
+            pager.append(f'<a href="/results?{urlencode({**params, "page": page + 1})}">&gt;</a>')
+
+        return f"<html><body>{''.join(divs)}<div class=\"pagination\">{' '.join(pager)}</div></body></html>"
+
+    def handle(self, path: str, if_none_match: str | None) -> tuple[int, dict[str, str], bytes]:
+        """
+        Answers a request, after any injected latency and failures.
+
+        Args:
+            path (str): The request path including the query string.
+            if_none_match (str | None): The If-None-Match header of the request.
+
+        Returns:
+            tuple[int, dict[str, str], bytes]: The HTTP status code, headers and body.
+        """
+        failure: int | None = self.inject()
+
+        if failure == 429:
+            self.count('rate_limited')
+            return 429, {'Retry-After': str(self.retry_after)}, b'Too Many Requests'
+
+        if failure == 500:
+            self.count('errors')
+            return 500, {}, b'Internal Server Error'
+
+        url = urlparse(path)
+        params: dict[str, str] = {name: values[0] for name, values in parse_qs(url.query).items()}
+        page: str | None = None
+
+        if url.path == '/__stats':
+            with self._lock:
+                return 200, {'Content-Type': 'application/json'}, json.dumps(self.stats).encode('utf-8')
+
+        if url.path.startswith('/tyres-search/'):
+            size: tuple[int, int, int] | None = MockRetailer.get_size(url.path.rsplit('/', 1)[-1])
+            page = self.render_national(size, params.get('pc', '')) if size else None
+        elif url.path == '/':
+            page = MockRetailer.render_dexel_home()
+        elif url.path == '/tyre-size':
+            page = MockRetailer.render_dexel_size_form()
+        elif url.path == '/branches':
+            page = MockRetailer.render_dexel_branches(params)
+        elif url.path == '/results':
+            page = self.render_dexel_results(params)
+
+        if page is None:
+            self.count('not_found')
+            return 404, {}, b'Not Found'
+
+        body: bytes = page.encode('utf-8')
+        etag: str = f'"{hashlib.sha1(body).hexdigest()}"'
+
+        if if_none_match == etag:
+            self.count('not_modified')
+            return 304, {'ETag': etag}, b''
+
+        self.count('ok')
+
+        return 200, {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag}, body
+
+def create_server(host: str, port: int, retailer: MockRetailer) -> ThreadingHTTPServer:
+    """
+    Creates the mock retailer server, call serve_forever() on it to start handling requests.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 picks a free port.
+        retailer (MockRetailer): Builds the pages and injects the latency and failures.
+
+    Returns:
+        ThreadingHTTPServer: The server.
+    """
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            status, headers, body = retailer.handle(self.path, self.headers.get('If-None-Match'))
+            self.send_response(status)
+
+            for name, value in headers.items():
+                self.send_header(name, value)
+
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass # Logging every request would slow the server down under load
+
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.retailer = retailer
+
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serves pretend National and Dexel pages for testing the scrapers locally.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--products', type=int, default=40, help="The number of tyres listed for every size.")
+    parser.add_argument('--page-size', type=int, default=10, help="The number of tyres on each Dexel results page.")
+    parser.add_argument('--latency', type=float, default=0.05, help="How long in seconds each response is delayed by.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="The share of requests answered with a 500.")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="The share of requests answered with a 429.")
+    args = parser.parse_args()
+
+    retailer = MockRetailer(args.products, args.page_size, args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    server: ThreadingHTTPServer = create_server(args.host, args.port, retailer)
+    base_url: str = f"http://{args.host}:{server.server_address[1]}"
+
+    print(f"Serving the mock retailer on {base_url} (National: {base_url}/tyres-search/205-55-16?pc=DN67RL, Dexel: {base_url}/)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+import argparse
+import json
+import sqlite3
+from datetime import datetime
+import numpy as np
+from tyre_batch import NULL
+from tyre_db import TyreDB
+from tyre_snapshot import TyreSnapshot
+
+PERCENTILES: tuple[int, ...] = (10, 25, 50, 75, 90)
+
+class OfferArrays:
+    """Every priced offer held as parallel NumPy arrays, strings are stored as codes into a list of names"""
+    def __init__(self,
+                 width: np.ndarray,
+                 aspect_ratio: np.ndarray,
+                 rim_diameter: np.ndarray,
+                 brand: np.ndarray,
+                 retailer: np.ndarray,
+                 price: np.ndarray,
+                 brand_names: list[str | None],
+                 retailer_names: list[str | None]
+    ) -> None:
+        """
+        Args:
+            width (np.ndarray): The width of each tyre.
+            aspect_ratio (np.ndarray): The aspect ratio of each tyre.
+            rim_diameter (np.ndarray): The rim diameter of each tyre.
+            brand (np.ndarray): The code of each tyre's brand in brand_names.
+            retailer (np.ndarray): The code of each offer's retailer in retailer_names.
+            price (np.ndarray): The price of each offer in pence.
+            brand_names (list[str | None]): The brand names indexed by code.
+            retailer_names (list[str | None]): The retailer names indexed by code.
+        """
+        self.width = width.astype(np.int64)
+        self.aspect_ratio = aspect_ratio.astype(np.int64)
+        self.rim_diameter = rim_diameter.astype(np.int64)
+        self.brand = brand.astype(np.int64)
+        self.retailer = retailer.astype(np.int64)
+        self.price = price.astype(np.int64)
+        self.brand_names = brand_names
+        self.retailer_names = retailer_names
+
+    def __len__(self) -> int:
+        return len(self.price)
+
+    def size_key(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: A single integer per offer that identifies its size (e.g. 205/55/R16 is 205055016).
+        """
+        return self.width * 1_000_000 + self.aspect_ratio * 1_000 + self.rim_diameter
+
+def size_key_to_str(key: int) -> str:
+    """
+    Args:
+        key (int): A key created by OfferArrays.size_key().
+
+    Returns:
+        str: The size in a friendly format (e.g. 205/55/R16).
+    """
+    return f"{key // 1_000_000}/{key // 1_000 % 1_000}/R{key % 1_000}"
+
+def _encode(values: list[str | None]) -> tuple[np.ndarray, list[str | None]]:
+    """
+    Args:
+        values (list[str | None]): A string per row.
+
+    Returns:
+        tuple[np.ndarray, list[str | None]]: The code of each row and the distinct strings indexed by code.
+    """
+    names: list[str | None] = []
+    lookup: dict[str | None, int] = {}
+    codes = np.empty(len(values), dtype=np.int64)
+
+    for index, value in enumerate(values):
+        code: int | None = lookup.get(value)
+
+        if code is None:
+            code = lookup[value] = len(names)
+            names.append(value)
+
+        codes[index] = code
+
+    return codes, names
+
+def load_offers_from_db(db_name: str | None = None) -> OfferArrays:
+    """
+    Loads every priced offer in the tyre table in one query, tyres removed by TyreDB.finish_run() are left out.
+
+    Args:
+        db_name (str | None): The database to read, defaults to TyreDB.get_db_name().
+
+    Returns:
+        OfferArrays: The offers.
+    """
+    with sqlite3.connect(db_name or TyreDB.get_db_name()) as conn:
+        rows: list[tuple] = conn.execute('''
+            SELECT t.width, t.aspect_ratio, t.rim_diameter, b.brand_name, r.retailer_name, t.price
+            FROM tyre t
+            JOIN retailer r ON r.retailer_id = t.retailer_id
+            LEFT JOIN pattern p ON p.pattern_id = t.pattern_id
+            LEFT JOIN brand b ON b.brand_id = p.brand_id
+            WHERE t.price IS NOT NULL AND t.active = 1
+        ''').fetchall()
+
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return OfferArrays(empty, empty, empty, empty, empty, empty, [], [])
+
+    width, aspect_ratio, rim_diameter, brands, retailers, price = zip(*rows)
+    brand_codes, brand_names = _encode(list(brands))
+    retailer_codes, retailer_names = _encode(list(retailers))
+
+    return OfferArrays(np.array(width), np.array(aspect_ratio), np.array(rim_diameter), brand_codes, retailer_codes, np.array(price), brand_names, retailer_names)
+
+def load_offers_from_snapshot(filename: str) -> OfferArrays:
+    """
+    Loads every priced offer from a snapshot written by tyre_snapshot.write_snapshot().
+    The columns are read straight out of the memory-mapped file, only the priced rows are copied.
+
+    Args:
+        filename (str): The snapshot file.
+
+    Returns:
+        OfferArrays: The offers.
+    """
+    with TyreSnapshot(filename) as snapshot:
+        def column(name: str) -> np.ndarray:
+            info: dict = snapshot.columns[name]
+            return np.frombuffer(snapshot.buffer, dtype=info['typecode'], count=snapshot.rows, offset=info['offset'])
+
+        priced: np.ndarray = column('price_pence') != NULL
+
+        # Boolean indexing copies the rows, so nothing references the memory map once it's closed
+        return OfferArrays(
+            column('tyre_width')[priced], column('aspect_ratio')[priced], column('rim_diameter')[priced],
+            column('brand')[priced], column('retailer')[priced], column('price_pence')[priced],
+            list(snapshot.dictionary('brand')), list(snapshot.dictionary('retailer'))
+        )
+
+def grouped_price_stats(keys: np.ndarray, prices: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Calculates the price statistics of every group in a single sort.
+
+    Args:
+        keys (np.ndarray): The group key of each offer.
+        prices (np.ndarray): The price of each offer in pence.
+
+    Returns:
+        dict[str, np.ndarray]: The keys, counts, min, max, mean and each of PERCENTILES (e.g. p50) per group, prices are in pence.
+    """
+    order: np.ndarray = np.lexsort((prices, keys)) # Sorts by key, then by price within each key
+    sorted_prices: np.ndarray = prices[order].astype(np.float64)
+    group_keys, starts, counts = np.unique(keys[order], return_index=True, return_counts=True)
+
+    stats: dict[str, np.ndarray] = {
+        'key': group_keys,
+        'count': counts,
+        'min': sorted_prices[starts],
+        'max': sorted_prices[starts + counts - 1],
+        'mean': np.add.reduceat(sorted_prices, starts) / counts if len(starts) else np.empty(0),
+    }
+
+    # Linear interpolation between the two closest ranks, the same as np.percentile's default method
+    for percentile in PERCENTILES:
+        position: np.ndarray = starts + (counts - 1) * (percentile / 100)
+        lower: np.ndarray = np.floor(position).astype(np.int64)
+        upper: np.ndarray = np.ceil(position).astype(np.int64)
+        stats[f"p{percentile}"] = sorted_prices[lower] + (sorted_prices[upper] - sorted_prices[lower]) * (position - lower)
+
+    return stats
+
+def retailer_spread(size_keys: np.ndarray, retailers: np.ndarray, prices: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Compares the cheapest offer of each retailer for every size.
+
+    Args:
+        size_keys (np.ndarray): The size key of each offer.
+        retailers (np.ndarray): The retailer code of each offer.
+        prices (np.ndarray): The price of each offer in pence.
+
+    Returns:
+        dict[str, np.ndarray]: Per size the key, number of retailers, the spread between the cheapest and most expensive
+            retailer minimum in pence and the retailer code with the cheapest offer.
+    """
+    # The first row of each (size, retailer) group is that retailer's cheapest offer for the size
+    order: np.ndarray = np.lexsort((prices, retailers, size_keys))
+    pair_keys: np.ndarray = np.stack((size_keys[order], retailers[order]), axis=1)
+    first_of_pair: np.ndarray = np.ones(len(order), dtype=bool)
+    first_of_pair[1:] = np.any(pair_keys[1:] != pair_keys[:-1], axis=1)
+
+    retailer_min_sizes: np.ndarray = size_keys[order][first_of_pair]
+    retailer_min_retailers: np.ndarray = retailers[order][first_of_pair]
+    retailer_min_prices: np.ndarray = prices[order][first_of_pair]
+
+    # Sorting by size then price puts each size's cheapest retailer first
+    order = np.lexsort((retailer_min_prices, retailer_min_sizes))
+    sorted_prices: np.ndarray = retailer_min_prices[order]
+    group_keys, starts, counts = np.unique(retailer_min_sizes[order], return_index=True, return_counts=True)
+
+    return {
+        'key': group_keys,
+        'retailers': counts,
+        'spread': sorted_prices[starts + counts - 1] - sorted_prices[starts],
+        'cheapest_retailer': retailer_min_retailers[order][starts],
+    }
+
+def load_price_changes(db_name: str | None = None) -> dict[str, np.ndarray]:
+    """
+    Works out every price change recorded in the price_history table.
+
+    Args:
+        db_name (str | None): The database to read, defaults to TyreDB.get_db_name().
+
+    Returns:
+        dict[str, np.ndarray]: The size key, brand name, old price and new price of every change,
+            empty arrays if the database has no price history.
+    """
+    with sqlite3.connect(db_name or TyreDB.get_db_name()) as conn:
+        has_history: bool = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'price_history'").fetchone() is not None
+        rows: list[tuple] = conn.execute('''
+            SELECT h.sku, h.retailer_id, h.price, t.width, t.aspect_ratio, t.rim_diameter, b.brand_name
+            FROM price_history h
+            JOIN tyre t ON t.sku = h.sku AND t.retailer_id = h.retailer_id
+            LEFT JOIN pattern p ON p.pattern_id = t.pattern_id
+            LEFT JOIN brand b ON b.brand_id = p.brand_id
+            WHERE h.price IS NOT NULL
+            ORDER BY h.sku, h.retailer_id, h.recorded_at, h.rowid
+        ''').fetchall() if has_history else []
+
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return {'size_key': empty, 'brand': np.empty(0, dtype=object), 'old_price': empty, 'new_price': empty}
+
+    skus, retailer_ids, prices, widths, aspect_ratios, rim_diameters, brands = zip(*rows)
+    offer_codes, _ = _encode([f"{sku}\0{retailer_id}" for sku, retailer_id in zip(skus, retailer_ids)])
+    prices_array = np.array(prices, dtype=np.int64)
+
+    # A change is any history row that follows an earlier row of the same offer
+    is_change: np.ndarray = offer_codes[1:] == offer_codes[:-1]
+    size_keys: np.ndarray = np.array(widths, dtype=np.int64) * 1_000_000 + np.array(aspect_ratios, dtype=np.int64) * 1_000 + np.array(rim_diameters, dtype=np.int64)
+
+    return {
+        'size_key': size_keys[1:][is_change],
+        'brand': np.array(brands, dtype=object)[1:][is_change],
+        'old_price': prices_array[:-1][is_change],
+        'new_price': prices_array[1:][is_change],
+    }
+
+def _change_stats(change_keys: np.ndarray, old_prices: np.ndarray, new_prices: np.ndarray) -> dict:
+    """
+    Args:
+        change_keys (np.ndarray): The group key of each change.
+        old_prices (np.ndarray): The price before each change.
+        new_prices (np.ndarray): The price after each change.
+
+    Returns:
+        dict: Per group key a tuple of the number of changes, increases, decreases and the mean change in percent.
+    """
+    if len(change_keys) == 0:
+        return {}
+
+    percent_change: np.ndarray = np.where(old_prices > 0, (new_prices - old_prices) / np.maximum(old_prices, 1) * 100, 0.0)
+    keys, inverse = np.unique(change_keys, return_inverse=True)
+    counts: np.ndarray = np.bincount(inverse)
+    increases: np.ndarray = np.bincount(inverse, weights=new_prices > old_prices)
+    decreases: np.ndarray = np.bincount(inverse, weights=new_prices < old_prices)
+    mean_percent: np.ndarray = np.bincount(inverse, weights=percent_change) / counts
+
+    return {key: (int(counts[i]), int(increases[i]), int(decreases[i]), float(mean_percent[i])) for i, key in enumerate(keys.tolist())}
+
+def summarise(offers: OfferArrays, changes: dict[str, np.ndarray] | None = None) -> list[dict]:
+    """
+    Builds a summary row per size and per brand.
+
+    Args:
+        offers (OfferArrays): The offers to summarise.
+        changes (dict[str, np.ndarray] | None): The price changes returned by load_price_changes().
+
+    Returns:
+        list[dict]: One dictionary per size and per brand, prices are in pounds.
+    """
+    summary: list[dict] = []
+
+    if len(offers) == 0:
+        return summary
+
+    size_keys: np.ndarray = offers.size_key()
+    prices: np.ndarray = offers.price
+
+    spreads: dict[str, np.ndarray] = retailer_spread(size_keys, offers.retailer, prices)
+    spread_by_size: dict[int, tuple[int, int, int]] = {
+        key: (int(retailers), int(spread), int(cheapest))
+        for key, retailers, spread, cheapest in zip(spreads['key'].tolist(), spreads['retailers'].tolist(), spreads['spread'].tolist(), spreads['cheapest_retailer'].tolist())
+    }
+
+    size_changes: dict = {}
+    brand_changes: dict = {}
+
+    if changes is not None and len(changes['size_key']):
+        size_changes = _change_stats(changes['size_key'], changes['old_price'], changes['new_price'])
+        brand_codes, brand_names = _encode(changes['brand'].tolist())
+        brand_changes = {brand_names[code]: stats for code, stats in _change_stats(brand_codes, changes['old_price'], changes['new_price']).items()}
+
+    for group_type, keys in (('size', size_keys), ('brand', offers.brand)):
+        stats: dict[str, list] = {name: values.tolist() for name, values in grouped_price_stats(keys, prices).items()}
+
+        for i, key in enumerate(stats['key']):
+            row: dict = {
+                'group_type': group_type,
+                'group_key': size_key_to_str(key) if group_type == 'size' else offers.brand_names[key],
+                'offers': stats['count'][i],
+                'min': round(stats['min'][i] / 100, 2),
+                'max': round(stats['max'][i] / 100, 2),
+                'mean': round(stats['mean'][i] / 100, 2),
+            }
+
+            for percentile in PERCENTILES:
+                row[f"p{percentile}"] = round(stats[f"p{percentile}"][i] / 100, 2)
+
+            row['median'] = row['p50']
+
+            if group_type == 'size':
+                retailers, spread, cheapest = spread_by_size[key]
+                row['retailers'] = retailers
+                row['retailer_spread'] = round(spread / 100, 2)
+                row['cheapest_retailer'] = offers.retailer_names[cheapest]
+                change: tuple | None = size_changes.get(key)
+            else:
+                change = brand_changes.get(row['group_key'])
+
+            change_count, increases, decreases, mean_percent = change if change else (0, 0, 0, 0.0)
+            row['price_changes'] = change_count
+            row['price_increases'] = increases
+            row['price_decreases'] = decreases
+            row['change_rate'] = round(change_count / row['offers'], 4) # Price changes per offer currently listed
+            row['mean_change_percent'] = round(mean_percent, 2)
+
+            summary.append(row)
+
+    return summary
+
+def write_summary_table(summary: list[dict], db_name: str | None = None) -> None:
+    """
+    Replaces the contents of the price_summary table with a new summary.
+
+    Args:
+        summary (list[dict]): The rows returned by summarise().
+        db_name (str | None): The database to write to, defaults to TyreDB.get_db_name().
+    """
+    computed_at: str = datetime.now().isoformat(timespec='seconds')
+
+    with sqlite3.connect(db_name or TyreDB.get_db_name()) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS price_summary (
+                group_type          TEXT NOT NULL,
+                group_key           TEXT,
+                offers              INTEGER NOT NULL,
+                min_price           REAL,
+                p10_price           REAL,
+                p25_price           REAL,
+                median_price        REAL,
+                p75_price           REAL,
+                p90_price           REAL,
+                max_price           REAL,
+                mean_price          REAL,
+                retailers           INTEGER,
+                retailer_spread     REAL,
+                cheapest_retailer   TEXT,
+                price_changes       INTEGER,
+                price_increases     INTEGER,
+                price_decreases     INTEGER,
+                change_rate         REAL,
+                mean_change_percent REAL,
+                computed_at         TEXT NOT NULL,
+                PRIMARY KEY (group_type, group_key)
+            )
+        ''')
+        conn.execute("DELETE FROM price_summary")
+        conn.executemany('''
+            INSERT INTO price_summary VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(
+            row['group_type'], row['group_key'], row['offers'], row['min'], row['p10'], row['p25'], row['median'], row['p75'], row['p90'],
+            row['max'], row['mean'], row.get('retailers'), row.get('retailer_spread'), row.get('cheapest_retailer'), row['price_changes'],
+            row['price_increases'], row['price_decreases'], row['change_rate'], row['mean_change_percent'], computed_at
+        ) for row in summary])
+
+def write_summary_json(summary: list[dict], filename: str) -> None:
+    """
+    Args:
+        summary (list[dict]): The rows returned by summarise().
+        filename (str): The JSON file to write to.
+    """
+    with open(filename, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Calculates per size and per brand price statistics.")
+    parser.add_argument('--db', default=TyreDB.get_db_name(), help="The database to read the offers and price history from.")
+    parser.add_argument('--snapshot', help="Read the offers from a snapshot file instead of the database.")
+    parser.add_argument('--json', help="Also write the summary to this JSON file.")
+    args = parser.parse_args()
+
+    offers: OfferArrays = load_offers_from_snapshot(args.snapshot) if args.snapshot else load_offers_from_db(args.db)
+    summary: list[dict] = summarise(offers, load_price_changes(args.db))
+
+    write_summary_table(summary, args.db)
+
+    if args.json:
+        write_summary_json(summary, args.json)
+
+    print(f"Summarised {len(offers)} offer{'s' if len(offers) != 1 else ''} into {len(summary)} row{'s' if len(summary) != 1 else ''}.")
+
+if __name__ == "__main__":
+    main()
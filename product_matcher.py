@@ -0,0 +1,76 @@
+import re
+import unicodedata
+from tyre_batch import TyreBatch
+
+NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+def normalise_name(name: str | None) -> str:
+    """
+    Normalises a brand or pattern name so the same name written differently by each retailer matches.
+    e.g. 'EfficientGrip Performance-2' and 'Efficientgrip  Performance 2' both become 'efficientgrip performance 2'.
+
+    Args:
+        name (str | None): The name to normalise.
+
+    Returns:
+        str: The lower case name with accents removed and any punctuation collapsed to single spaces.
+    """
+    if not name:
+        return ""
+
+    ascii_name: str = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+
+    return NON_ALPHANUMERIC.sub(' ', ascii_name.lower()).strip()
+
+def get_product_key(brand: str | None,
+                    pattern: str | None,
+                    tyre_width: int | None,
+                    aspect_ratio: int | None,
+                    rim_diameter: int | None,
+                    load_index: int | None,
+                    speed_rating: str | None
+) -> str:
+    """
+    Builds the key that identifies the same physical tyre at every retailer.
+
+    Args:
+        brand (str | None): Manufacturer of the tyre (e.g. Goodyear).
+        pattern (str | None): The tread name of the tyre (e.g. EfficientGrip Performance 2).
+        tyre_width (int | None): The width of the tyre (e.g. 205).
+        aspect_ratio (int | None): The aspect ratio of the tyre (e.g. 55).
+        rim_diameter (int | None): The diameter of the tyre in inches (e.g. 16).
+        load_index (int | None): The load index of the tyre (e.g. 91).
+        speed_rating (str | None): The speed rating of the tyre (e.g. V).
+
+    Returns:
+        str: The canonical product key (e.g. goodyear|efficientgrip performance 2|205/55/16|91|V).
+    """
+    normalised_brand: str = normalise_name(brand)
+    normalised_pattern: str = normalise_name(pattern)
+
+    # Some retailers repeat the brand at the start of the pattern name (e.g. 'Goodyear EfficientGrip')
+    if normalised_brand and normalised_pattern.startswith(f"{normalised_brand} "):
+        normalised_pattern = normalised_pattern[len(normalised_brand) + 1:]
+
+    return (
+        f"{normalised_brand}|"
+        f"{normalised_pattern}|"
+        f"{tyre_width}/{aspect_ratio}/{rim_diameter}|"
+        f"{load_index if load_index is not None else ''}|"
+        f"{speed_rating.upper() if speed_rating else ''}"
+    )
+
+def get_product_keys(tyres: TyreBatch) -> list[str]:
+    """
+    Args:
+        tyres (TyreBatch): The tyres to build keys for.
+
+    Returns:
+        list[str]: The product key of each tyre in the batch, in the same order.
+    """
+    return [
+        get_product_key(brand, pattern, tyre_width, aspect_ratio, rim_diameter, load_index, speed_rating)
+        for brand, pattern, tyre_width, aspect_ratio, rim_diameter, load_index, speed_rating in zip(
+            tyres.brand, tyres.pattern, tyres.tyre_width, tyres.aspect_ratio, tyres.rim_diameter, tyres.load_index, tyres.speed_rating
+        )
+    ]
@@ -1,7 +1,8 @@
 from tyre import Tyre
+from tyre_batch import TyreBatch
 
 class Retailer:
     """A class that links a retailer to a set of tyres"""
-    def __init__(self, retailer: str, tyres: list[Tyre]):
+    def __init__(self, retailer: str, tyres: TyreBatch | list[Tyre]):
         self.retailer = retailer
-        self.tyres = tyres
\ No newline at end of file
+        self.tyres: TyreBatch = tyres if isinstance(tyres, TyreBatch) else TyreBatch.from_tyres(tyres)
\ No newline at end of file
@@ -0,0 +1,155 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from location_planner import LocationZones, plan_jobs
+from mock_retailer import BRANCHES, MockRetailer, PROFILES, RIMS, WIDTHS, create_server
+from retailer import Retailer
+from scrape_scheduler import AdaptiveScheduler, DomainSettings, ScrapeResult
+from scrapers import BaseScraper, get_scraper_class
+from tyre_db import TyreDB
+from tyre_scraper import write_scrapes_to_db
+
+def get_sizes(count: int) -> list[tuple[int, int, int]]:
+    """
+    Args:
+        count (int): The number of sizes wanted.
+
+    Returns:
+        list[tuple[int, int, int]]: Different (tyre_width, aspect_ratio, rim_diameter) sizes.
+    """
+    return [(WIDTHS[i % len(WIDTHS)], PROFILES[i // len(WIDTHS) % len(PROFILES)], RIMS[i % len(RIMS)]) for i in range(count)]
+
+def run_load_test(base_url: str, retailer_names: list[str], sizes: list[tuple[int, int, int]], locations: dict[str, list[str]], settings: DomainSettings,
+                  db_name: str) -> None:
+    """
+    Scrapes the mock National and/or Dexel pages through the scheduler and writes the results to a database, timing each stage.
+
+    Args:
+        base_url (str): The address of the mock retailer.
+        retailer_names (list[str]): The registered names of the scrapers to run (national, dexel).
+        sizes (list[tuple[int, int, int]]): The sizes to scrape.
+        locations (dict[str, list[str]]): The postcodes or branches to scrape each size for, by retailer.
+        settings (DomainSettings): The scheduler settings for the mock retailer.
+        db_name (str): The database to write to.
+    """
+    for name in retailer_names:
+        BaseScraper.base_url_overrides[get_scraper_class(name)(*sizes[0]).domain] = base_url
+
+    scheduler = AdaptiveScheduler(default_settings=settings)
+
+    start_time: float = time.perf_counter()
+
+    try:
+        scrapers: list[BaseScraper] = plan_jobs(retailer_names, sizes, locations, LocationZones(), scheduler)
+        planned_time: float = time.perf_counter()
+
+        results: list[ScrapeResult] = list(scheduler.run(scrapers))
+        scraped_time: float = time.perf_counter()
+    finally:
+        for name in retailer_names:
+            get_scraper_class(name).close_sessions()
+
+    # The same as start_scrape(): a zone's prices are stored under every member location, and coalesced jobs are only written once per location
+    retailers: list[Retailer] = []
+    written_jobs: set[tuple] = set()
+
+    for result in results:
+        if result.error is not None:
+            continue
+
+        for retailer_name in result.scraper.get_retailer_names():
+            if (result.scraper.get_job_key(), retailer_name) not in written_jobs:
+                written_jobs.add((result.scraper.get_job_key(), retailer_name))
+                retailers.append(Retailer(retailer_name, result.tyres))
+
+    scraped_count: int = sum(len(result.tyres) for result in results if result.error is None and not result.coalesced)
+    row_count: int = sum(len(retailer.tyres) for retailer in retailers)
+
+    with TyreDB(db_name) as db:
+        db.start_run()
+        write_scrapes_to_db(db, retailers)
+        db.finish_run()
+
+    finished_time: float = time.perf_counter()
+
+    failed: int = sum(result.error is not None for result in results)
+    coalesced: int = sum(result.coalesced for result in results)
+    scrape_seconds: float = scraped_time - planned_time
+    db_seconds: float = finished_time - scraped_time
+    total_seconds: float = finished_time - start_time
+
+    pairs: int = sum(len(sizes) * max(1, len(locations.get(name, []))) for name in retailer_names)
+
+    print(f"Jobs: {pairs} size/location pairs planned as {len(scrapers)} jobs, {failed} failed, {coalesced} coalesced.")
+    print(f"Planning (incl. probes): {planned_time - start_time:.2f}s")
+    print(f"Scraping: {scrape_seconds:.2f}s, {len(results) / scrape_seconds:.1f} jobs/second, {scraped_count / scrape_seconds:.0f} tyres/second")
+    print(f"Database: {db_seconds:.2f}s, {row_count} rows for {len(retailers)} retailer/size pairs, {row_count / db_seconds:.0f} rows/second")
+    print(f"End to end: {total_seconds:.2f}s, {row_count / total_seconds:.0f} rows/second")
+
+    for controller in scheduler.controllers.values():
+        print(controller.get_summary())
+
+    for result in results:
+        if result.error is not None:
+            print(f"First failure ({result.scraper.get_retailer_name()} {result.scraper.tyre_width}/{result.scraper.aspect_ratio}R{result.scraper.rim_diameter}): {result.error}")
+            break
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load tests the scheduler, parsing and database writes against the mock retailer.")
+    parser.add_argument('--url', help="The address of a running mock retailer, one is started in-process if not given.")
+    parser.add_argument('--retailers', nargs='+', choices=['national', 'dexel'], default=['national'],
+                        help="The scrapers to run, dexel drives Chrome through the mock's size form, branch list and results pages.")
+    parser.add_argument('--sizes', type=int, default=20, help="The number of sizes to scrape.")
+    parser.add_argument('--postcodes', nargs='*', default=['DN67RL', 'S11AA', 'LS14AP', 'M11AE', 'B11BB'], help="The postcodes to scrape each size for.")
+    parser.add_argument('--branches', nargs='*', default=list(BRANCHES[:3]), help="The Dexel branches to scrape each size for.")
+    parser.add_argument('--products', type=int, default=40, help="The number of tyres listed for every size.")
+    parser.add_argument('--page-size', type=int, default=10, help="The number of tyres on each Dexel results page.")
+    parser.add_argument('--show-browser', action='store_true', help="Opens a Chrome window for each Dexel worker instead of running headless.")
+    parser.add_argument('--latency', type=float, default=0.05, help="How long in seconds each response is delayed by.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="The share of requests answered with a 500.")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="The share of requests answered with a 429.")
+    parser.add_argument('--max-concurrency', type=int, default=8, help="The most scrapes the scheduler can run at once.")
+    parser.add_argument('--delay', type=float, default=0.0, help="The scheduler's starting gap in seconds between scrapes.")
+    parser.add_argument('--db', help="The database to write to, a temporary one is used if not given.")
+    args = parser.parse_args()
+
+    server = None
+    base_url: str | None = args.url
+
+    if base_url is None:
+        retailer = MockRetailer(args.products, page_size=args.page_size, latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+        server = create_server('127.0.0.1', 0, retailer)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    settings = DomainSettings(initial_concurrency=1, max_concurrency=args.max_concurrency, initial_delay=args.delay, min_delay=0.0,
+                              breaker_cooldown=5.0)
+
+    if 'dexel' in args.retailers:
+        DexelScraper = get_scraper_class('dexel')
+        DexelScraper.headless = not args.show_browser
+        DexelScraper.state_file = None # Deep-links are still reused within the run, but none are left behind in dexel_session.json
+
+    locations: dict[str, list[str]] = {'national': args.postcodes, 'dexel': args.branches}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_name: str = args.db or os.path.join(temp_dir, 'load_test.db')
+
+        print(f"Scraping {args.sizes} sizes from {base_url} into '{db_name}' for "
+              + ", ".join(f"{name} ({len(locations[name])} locations)" for name in args.retailers) + "...")
+
+        run_load_test(base_url, args.retailers, get_sizes(args.sizes), locations, settings, db_name)
+
+    with urllib.request.urlopen(f"{base_url}/__stats", timeout=10) as response:
+        print(f"Mock retailer: {json.loads(response.read())}")
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
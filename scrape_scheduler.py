@@ -0,0 +1,433 @@
+import threading
+import time
+from queue import Queue
+from typing import Callable, Hashable, Iterator
+from scrapers import BaseScraper, BlockedError
+from tyre_batch import TyreBatch
+
+class DomainSettings:
+    """The limits an AIMD controller works within for one domain"""
+    def __init__(self,
+                 initial_concurrency: float = 1.0,
+                 max_concurrency: int = 4,
+                 initial_delay: float = 2.0,
+                 min_delay: float = 0.25,
+                 max_delay: float = 60.0,
+                 additive_increase: float = 1.0,
+                 multiplicative_decrease: float = 0.5,
+                 latency_target: float = 15.0,
+                 breaker_threshold: int = 3,
+                 breaker_cooldown: float = 60.0,
+                 max_breaker_trips: int = 3
+    ) -> None:
+        """
+        Args:
+            initial_concurrency (float): How many scrapes of the domain can run at once to begin with.
+            max_concurrency (int): The most scrapes of the domain that can ever run at once.
+            initial_delay (float): The starting gap in seconds between two scrapes of the domain starting.
+            min_delay (float): The smallest gap the delay can shrink to while the domain is healthy.
+            max_delay (float): The largest gap the delay can grow to while the domain is pushing back.
+            additive_increase (float): How much the concurrency grows after a full window of successful scrapes.
+            multiplicative_decrease (float): What the concurrency and pacing are multiplied by when the domain blocks a scrape.
+            latency_target (float): Scrapes slower than this many seconds (on average) stop the concurrency growing.
+            breaker_threshold (int): How many blocked scrapes in a row open the circuit breaker and pause the domain.
+            breaker_cooldown (float): How long in seconds the domain is paused the first time, doubling each time after.
+            max_breaker_trips (int): After the circuit breaker opens this many times the rest of the domain's jobs are skipped.
+        """
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.additive_increase = additive_increase
+        self.multiplicative_decrease = multiplicative_decrease
+        self.latency_target = latency_target
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.max_breaker_trips = max_breaker_trips
+
+class DomainController:
+    """Adjusts the concurrency and pacing of one domain from the outcome of each scrape (additive increase, multiplicative decrease)"""
+
+    # How much weight the newest sample has in the moving averages
+    SMOOTHING: float = 0.3
+
+    def __init__(self, domain: str, settings: DomainSettings) -> None:
+        """
+        Args:
+            domain (str): The domain being controlled (e.g. national.co.uk).
+            settings (DomainSettings): The limits to work within.
+        """
+        self.domain = domain
+        self.settings = settings
+        self.concurrency: float = settings.initial_concurrency
+        self.delay: float = settings.initial_delay
+        self.in_flight: int = 0
+        self.latency: float | None = None # Moving average of the scrape time in seconds
+        self.error_rate: float = 0.0 # Moving average of the share of scrapes that failed
+        self.successes: int = 0
+        self.blocks: int = 0
+        self.errors: int = 0
+        self.consecutive_blocks: int = 0
+        self.breaker_trips: int = 0
+        self.paused_until: float = 0.0
+        self.half_open: bool = False # Set when the breaker opens, until a probe succeeds a single block opens it again
+        self._next_start: float = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def abandoned(self) -> bool:
+        """
+        Returns:
+            bool: True once the circuit breaker has opened too many times and the domain is being skipped.
+        """
+        return self.breaker_trips >= self.settings.max_breaker_trips
+
+    def acquire(self, deadline: float | None = None) -> bool:
+        """
+        Waits until the domain is allowed another scrape: the circuit is closed, there's a free slot and the pacing delay has passed.
+
+        Args:
+            deadline (float | None): The time.monotonic() time after which no more scrapes should start.
+
+        Returns:
+            bool: True if a scrape can start, False if the domain has been abandoned or the deadline has passed.
+        """
+        with self._condition:
+            while True:
+                if self.abandoned:
+                    return False
+
+                now: float = time.monotonic()
+                until_deadline: float | None = deadline - now if deadline is not None else None
+
+                if until_deadline is not None and until_deadline <= 0:
+                    return False
+
+                if now < self.paused_until:
+                    self._condition.wait(min(self.paused_until - now, until_deadline or float('inf')))
+                elif self.in_flight >= max(1, int(self.concurrency)):
+                    self._condition.wait(until_deadline)
+                elif now < self._next_start:
+                    self._condition.wait(min(self._next_start - now, until_deadline or float('inf')))
+                else:
+                    self.in_flight += 1
+                    self._next_start = now + self.delay
+                    return True
+
+    def acquire_extra(self, wanted: int) -> int:
+        """
+        Lends a running scrape more of the domain's free slots without waiting, for scrapers that load several pages at once (e.g. in browser tabs).
+        Extra slots count towards the concurrency like scrapes do, so every worker of the domain together stays within the current limit.
+
+        Args:
+            wanted (int): How many extra pages the scrape would like to load at once.
+
+        Returns:
+            int: How many extra slots were lent (possibly 0), they must be given back with release_extra().
+        """
+        with self._condition:
+            if self.abandoned or self.half_open or time.monotonic() < self.paused_until:
+                return 0
+
+            lent: int = max(0, min(wanted, max(1, int(self.concurrency)) - self.in_flight))
+            self.in_flight += lent
+
+            return lent
+
+    def release_extra(self, count: int) -> None:
+        """
+        Args:
+            count (int): The number of slots lent by acquire_extra() that are no longer used.
+        """
+        if count <= 0:
+            return
+
+        with self._condition:
+            self.in_flight -= count
+            self._condition.notify_all()
+
+    def record_success(self, latency: float) -> None:
+        """
+        Grows the concurrency by roughly additive_increase per window of successful scrapes and shortens the delay.
+        Slow responses are treated as a sign of load, they keep the concurrency where it is.
+
+        Args:
+            latency (float): How long the scrape took in seconds.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self.successes += 1
+            self.consecutive_blocks = 0
+            self.half_open = False
+            self.latency = latency if self.latency is None else self.latency + DomainController.SMOOTHING * (latency - self.latency)
+            self.error_rate *= 1 - DomainController.SMOOTHING
+
+            if self.latency <= self.settings.latency_target:
+                self.concurrency = min(self.settings.max_concurrency, self.concurrency + self.settings.additive_increase / max(1.0, self.concurrency))
+                self.delay = max(self.settings.min_delay, self.delay * 0.9)
+
+            self._condition.notify_all()
+
+    def record_blocked(self, retry_after: float | None = None) -> None:
+        """
+        Backs off sharply: the concurrency is cut and the delay grows.
+        Too many blocks in a row open the circuit breaker, pausing the domain.
+        Once the pause ends the breaker is half-open, a blocked probe opens it again straight away for twice as long.
+
+        Args:
+            retry_after (float | None): How long the website asked us to wait, if it said.
+        """
+        with self._condition:
+            self.in_flight -= 1
+            self.blocks += 1
+            self.consecutive_blocks += 1
+            self.error_rate += DomainController.SMOOTHING * (1 - self.error_rate)
+            self.concurrency = max(1.0, self.concurrency * self.settings.multiplicative_decrease)
+            self.delay = min(self.settings.max_delay, max(self.delay, self.settings.min_delay) / self.settings.multiplicative_decrease)
+
+            pause: float = retry_after or 0.0
+
+            if self.half_open or self.consecutive_blocks >= self.settings.breaker_threshold:
+                pause = max(pause, self.settings.breaker_cooldown * 2 ** self.breaker_trips)
+                self.breaker_trips += 1
+                self.consecutive_blocks = 0
+                self.half_open = True
+                self.concurrency = 1.0 # One probe at a time when the pause ends
+
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self._condition.notify_all()
+
+    def record_error(self) -> None:
+        """A failed scrape that wasn't a block (e.g. a timeout) only backs off gently, and only once errors become common."""
+        with self._condition:
+            self.in_flight -= 1
+            self.errors += 1
+            self.error_rate += DomainController.SMOOTHING * (1 - self.error_rate)
+
+            if self.error_rate > 0.5:
+                self.concurrency = max(1.0, self.concurrency * 0.75)
+                self.delay = min(self.settings.max_delay, self.delay * 1.5)
+
+            self._condition.notify_all()
+
+    def get_summary(self) -> str:
+        """
+        Returns:
+            str: The current state of the controller, e.g. for printing at the end of a run.
+        """
+        latency: str = f"{self.latency:.2f}s" if self.latency is not None else "n/a"
+
+        return (
+            f"{self.domain}: {self.successes} ok, {self.blocks} blocked, {self.errors} failed, "
+            f"concurrency {self.concurrency:.1f}, delay {self.delay:.2f}s, latency {latency}, "
+            f"breaker opened {self.breaker_trips} time{'s' if self.breaker_trips != 1 else ''}"
+        )
+
+class ScrapeResult:
+    """The outcome of one scrape job"""
+    def __init__(self, scraper: BaseScraper, tyres: TyreBatch | None, error: Exception | None, duration: float, attempts: int, coalesced: bool = False) -> None:
+        """
+        Args:
+            scraper (BaseScraper): The scraper that was run.
+            tyres (TyreBatch | None): The tyres scraped, None if the scrape failed.
+            error (Exception | None): Why the scrape failed, None if it succeeded.
+            duration (float): How long the last attempt took in seconds.
+            attempts (int): How many times the scrape was attempted.
+            coalesced (bool): Whether the outcome was shared from an identical job instead of fetched again.
+        """
+        self.scraper = scraper
+        self.tyres = tyres
+        self.error = error
+        self.duration = duration
+        self.attempts = attempts
+        self.coalesced = coalesced
+
+class SingleFlight:
+    """Makes identical calls share one execution, whether they overlap or come after it finished"""
+    def __init__(self) -> None:
+        self._results: dict[Hashable, object] = {}
+        self._in_flight: dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable[[], object]) -> tuple[object, bool]:
+        """
+        Calls the function unless a call with the same key is running (its result is waited for) or has finished (its result is reused).
+
+        Args:
+            key (Hashable): Identifies identical calls.
+            function (Callable[[], object]): Produces the result, it shouldn't raise.
+
+        Returns:
+            tuple[object, bool]: The result and whether it was shared from another call.
+        """
+        with self._lock:
+            if key in self._results:
+                return self._results[key], True
+
+            event: threading.Event | None = self._in_flight.get(key)
+            leader: bool = event is None
+
+            if leader:
+                event = self._in_flight[key] = threading.Event()
+
+        if not leader:
+            event.wait()
+            return self._results[key], True
+
+        try:
+            result: object = function()
+        except BaseException as e:
+            result = e
+
+        with self._lock:
+            self._results[key] = result
+            del self._in_flight[key]
+
+        event.set()
+
+        return result, False
+
+class AdaptiveScheduler:
+    """Runs scrape jobs concurrently with a DomainController pacing each domain"""
+    def __init__(self, settings: dict[str, DomainSettings] | None = None, default_settings: DomainSettings | None = None, max_attempts: int = 2) -> None:
+        """
+        Args:
+            settings (dict[str, DomainSettings] | None): Settings for particular domains (e.g. {'dexel.co.uk': DomainSettings(max_concurrency=2)}).
+            default_settings (DomainSettings | None): Settings for every other domain.
+            max_attempts (int): How many times a blocked scrape is tried before it's given up on.
+        """
+        self.settings: dict[str, DomainSettings] = settings or {}
+        self.default_settings: DomainSettings = default_settings or DomainSettings()
+        self.max_attempts: int = max_attempts
+        self.controllers: dict[str, DomainController] = {}
+        self.single_flight = SingleFlight() # Outcomes are kept for the life of the scheduler, so use one scheduler per run
+        self.deadline: float | None = None
+
+    def get_controller(self, domain: str) -> DomainController:
+        """
+        Args:
+            domain (str): The domain of a scraper.
+
+        Returns:
+            DomainController: The domain's controller, created the first time it's needed.
+        """
+        if domain not in self.controllers:
+            self.controllers[domain] = DomainController(domain, self.settings.get(domain, self.default_settings))
+
+        return self.controllers[domain]
+
+    def run(self, scrapers: list[BaseScraper], deadline: float | None = None) -> Iterator[ScrapeResult]:
+        """
+        Scrapes every job, yielding each result as soon as it completes.
+        Each domain gets its own worker threads (up to its max_concurrency) so a paused domain never holds up another one.
+
+        Args:
+            scrapers (list[BaseScraper]): The scrape jobs, each domain's jobs are started in this order.
+            deadline (float | None): The time.monotonic() time after which no more jobs are started, the jobs left fail with a TimeoutError.
+
+        Returns:
+            Iterator[ScrapeResult]: The result of each job in the order they complete.
+        """
+        jobs: dict[str, Queue[BaseScraper | None]] = {}
+
+        for scraper in scrapers:
+            jobs.setdefault(scraper.domain, Queue()).put(scraper)
+
+        results: Queue[ScrapeResult] = Queue()
+        workers: list[threading.Thread] = []
+        self.deadline = deadline
+
+        for domain, queue in jobs.items():
+            controller: DomainController = self.get_controller(domain)
+            worker_count: int = min(controller.settings.max_concurrency, queue.qsize())
+
+            for _ in range(worker_count):
+                queue.put(None) # Tells a worker there are no more jobs
+
+            for _ in range(worker_count):
+                worker = threading.Thread(target=self._work, args=(controller, queue, results), daemon=True)
+                worker.start()
+                workers.append(worker)
+
+        for _ in range(len(scrapers)):
+            yield results.get()
+
+        for worker in workers:
+            worker.join()
+
+    def _work(self, controller: DomainController, queue: "Queue[BaseScraper | None]", results: "Queue[ScrapeResult]") -> None:
+        """
+        Takes jobs for one domain off its queue until there are none left.
+
+        Args:
+            controller (DomainController): The domain's controller.
+            queue (Queue[BaseScraper | None]): The domain's jobs, None marks the end.
+            results (Queue[ScrapeResult]): Where each result is put.
+        """
+        while (scraper := queue.get()) is not None:
+            results.put(self._scrape(controller, scraper))
+
+    def _scrape(self, controller: DomainController, scraper: BaseScraper) -> ScrapeResult:
+        """
+        Runs a single job unless an identical one is running or has already run, in which case its outcome is shared.
+
+        Args:
+            controller (DomainController): The domain's controller.
+            scraper (BaseScraper): The job.
+
+        Returns:
+            ScrapeResult: The outcome of the job.
+        """
+        result, coalesced = self.single_flight.do(scraper.get_job_key(), lambda: self._fetch(controller, scraper))
+
+        if isinstance(result, Exception):
+            return ScrapeResult(scraper, None, result, 0.0, 0)
+
+        if coalesced:
+            return ScrapeResult(scraper, result.tyres, result.error, 0.0, 0, coalesced=True)
+
+        return result
+
+    def _fetch(self, controller: DomainController, scraper: BaseScraper) -> ScrapeResult:
+        """
+        Runs a single job, retrying it if the website blocked it.
+
+        Args:
+            controller (DomainController): The domain's controller.
+            scraper (BaseScraper): The job.
+
+        Returns:
+            ScrapeResult: The outcome of the job.
+        """
+        error: Exception | None = None
+        duration: float = 0.0
+
+        for attempt in range(1, self.max_attempts + 1):
+            if not controller.acquire(self.deadline):
+                if controller.abandoned:
+                    return ScrapeResult(scraper, None, BlockedError(f"{controller.domain} is paused after repeated blocks, job skipped"), 0.0, attempt - 1)
+
+                return ScrapeResult(scraper, None, TimeoutError("the deadline passed before the job could start, job skipped"), 0.0, attempt - 1)
+
+            start_time: float = time.monotonic()
+            scraper.controller = controller
+
+            try:
+                tyres: TyreBatch = scraper.scrape()
+            except BlockedError as e:
+                duration = time.monotonic() - start_time
+                controller.record_blocked(e.retry_after)
+                error = e
+                continue
+            except Exception as e:
+                duration = time.monotonic() - start_time
+                controller.record_error()
+                return ScrapeResult(scraper, None, e, duration, attempt)
+
+            duration = time.monotonic() - start_time
+            controller.record_success(duration)
+
+            return ScrapeResult(scraper, tyres, None, duration, attempt)
+
+        return ScrapeResult(scraper, None, error, duration, self.max_attempts)
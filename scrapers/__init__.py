@@ -1,5 +1,16 @@
-from .base_scraper import BaseScraper
-from .national_scraper import NationalScraper
-from .dexel_scraper import DexelScraper
+from .base_scraper import BaseScraper, BlockedError
+from .registry import SCRAPER_REGISTRY, register_scraper, get_scraper_names, get_scraper_class, create_scraper
 
-__all__ = ['BaseScraper', 'NationalScraper', 'DexelScraper']
\ No newline at end of file
+__all__ = ['BaseScraper', 'BlockedError', 'NationalScraper', 'DexelScraper', 'SCRAPER_REGISTRY', 'register_scraper', 'get_scraper_names', 'get_scraper_class', 'create_scraper']
+
+# The concrete scrapers are resolved lazily so that importing the package doesn't import selenium, etc.
+_LAZY_SCRAPERS: dict[str, str] = {
+    'NationalScraper': 'national',
+    'DexelScraper': 'dexel',
+}
+
+def __getattr__(name: str):
+    if name in _LAZY_SCRAPERS:
+        return get_scraper_class(_LAZY_SCRAPERS[name])
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,41 @@
+import re
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+from requests import RequestException
+from csv_sink import CsvSink
 from retailer import Retailer
-from tyre import Tyre
+from tyre_batch import TyreBatch
+
+if TYPE_CHECKING:
+    from scrape_scheduler import DomainController
+
+class BlockedError(RequestException):
+    """Raised when a website refuses a scrape, e.g. a 429 Too Many Requests, a 403 Forbidden or a captcha page"""
+    def __init__(self, reason: str, status_code: int | None = None, retry_after: float | None = None) -> None:
+        """
+        Args:
+            reason (str): Why the scrape was refused (e.g. 'captcha').
+            status_code (int | None): The HTTP status code of the response, if there was one.
+            retry_after (float | None): How many seconds the website asked us to wait before trying again.
+        """
+        super().__init__(f"Blocked by the website: {reason}" + (f" (HTTP {status_code})" if status_code else ""))
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
 
 class BaseScraper(ABC):
-    def __init__(self, tyre_width: int, aspect_ratio: int, rim_diameter: int) -> None:
+    # Markers of a challenge page itself, a page that merely loads a reCAPTCHA widget or script (e.g. a contact form) doesn't match
+    CAPTCHA_MARKERS = re.compile(
+        r'''id=["'](?:challenge-form|challenge-stage|px-captcha|captcha-form)["']'''
+        r'|cf-challenge|captcha-delivery\.com|are you a robot|verify (?:that )?you are (?:a )?human'
+        r'|<title>\s*(?:just a moment|attention required)',
+        re.IGNORECASE
+    )
+
+    # Points a domain at another server (e.g. {'national.co.uk': 'http://127.0.0.1:8001'} for a local mock retailer)
+    base_url_overrides: dict[str, str] = {}
+
+    def __init__(self, tyre_width: int, aspect_ratio: int, rim_diameter: int, location: str | None = None) -> None:
         """
         Creates a new BaseScraper with the basic information that will be searched when scraping.
 
@@ -11,10 +43,15 @@ class BaseScraper(ABC):
             tyre_width (int): The width of the tyre being scraped for.
             aspect_ratio (int): The aspect ratio of the tyre being scraped for.
             rim_diameter (int): The diameter of the tyre being scraped for.
+            location (str | None): Where prices are being scraped for (e.g. a postcode or branch), None uses the website's default.
         """
         self.tyre_width = tyre_width
         self.aspect_ratio = aspect_ratio
         self.rim_diameter = rim_diameter
+        location = location or self.get_default_location()
+        self.location: str | None = self.normalise_location(location) if location else None
+        self.locations: list[str] = [self.location] if self.location else [] # Every location whose prices this scrape stands in for
+        self.controller: DomainController | None = None # Set by the scheduler while the scrape runs, paces the domain
         self.domain = self.get_url().replace('https://', '').replace('http://', '').replace('www.', '').split('/')[0] # Removes any http:// or https:// from the beginning of the URL
 
     @abstractmethod
@@ -25,6 +62,59 @@ class BaseScraper(ABC):
         """
         pass
 
+    def get_base_url(self) -> str:
+        """
+        Returns:
+            str: The URL requests are actually sent to, the return of get_url() unless the domain has been overridden in base_url_overrides.
+        """
+        return BaseScraper.base_url_overrides.get(self.domain, self.get_url()).rstrip('/')
+
+    def get_default_location(self) -> str | None:
+        """
+        Returns:
+            str | None: The location scraped when none is given, None if the website doesn't need one.
+        """
+        return None
+
+    def normalise_location(self, location: str) -> str:
+        """
+        Args:
+            location (str): A postcode or branch as it was given (e.g. on the command line).
+
+        Returns:
+            str: The location written the one way it's used in job keys and retailer names, by default with its whitespace tidied up.
+        """
+        return ' '.join(location.split())
+
+    def get_retailer_name(self, location: str | None = None) -> str:
+        """
+        Args:
+            location (str | None): One of the locations in locations, defaults to the location that's scraped.
+
+        Returns:
+            str: The name the scraped tyres are stored under, the domain for the default location otherwise the domain and location (e.g. national.co.uk (S11AA)).
+        """
+        location = self.normalise_location(location) if location else self.location
+
+        if location is None or location == self.get_default_location():
+            return self.domain
+
+        return f"{self.domain} ({location})"
+
+    def get_retailer_names(self) -> list[str]:
+        """
+        Returns:
+            list[str]: The retailer name of every location this scrape stands in for, the scraped tyres are stored under each of them.
+        """
+        return list(dict.fromkeys(self.get_retailer_name(location) for location in self.locations)) or [self.get_retailer_name()]
+
+    def get_job_key(self) -> tuple:
+        """
+        Returns:
+            tuple: Identifies the request this scrape makes, two scrapers with the same key would fetch exactly the same prices.
+        """
+        return self.domain, self.tyre_width, self.aspect_ratio, self.rim_diameter, self.location
+
     @abstractmethod
     def get_request_url(self, url: str, *extras: str) -> str:
         """
@@ -37,18 +127,24 @@ class BaseScraper(ABC):
         pass
 
     @abstractmethod
-    def scrape(self) -> list[Tyre]:
+    def scrape(self) -> TyreBatch:
         """
         Starts the scraping process for the particular scraper that implements this class.
 
         Returns:
-            list[Tyre]: The list of Tyres that have been scraped from the website.
+            TyreBatch: The batch of Tyres that have been scraped from the website.
 
         Raises:
             RequestException: There was a problem with the connection to the website
+            BlockedError: The website refused the scrape (rate limited, forbidden or a captcha)
         """
         pass
 
+    @staticmethod
+    def close_sessions() -> None:
+        """Closes anything the scraper kept open between jobs (e.g. browsers), called once all the jobs have finished."""
+        pass
+
     @staticmethod
     def get_csv_filename() -> str:
         """
@@ -58,22 +154,45 @@ class BaseScraper(ABC):
         return "tyre_scrape.csv"
 
     @staticmethod
-    def write_to_csv_file(retailers: list[Retailer]) -> None:
+    def open_csv_sink(compress: bool = False) -> CsvSink:
+        """
+        Opens a CSV sink for the file named after the return of get_csv_filename().
+        Completed scrapes can be written to it as they finish, the file is only replaced once the sink is closed.
+
+        Args:
+            compress (bool): Whether to gzip the CSV file.
+
+        Returns:
+            CsvSink: The open CSV sink.
+        """
+        return CsvSink(BaseScraper.get_csv_filename(), compress=compress)
+
+    @staticmethod
+    def write_to_csv_file(retailers: list[Retailer], compress: bool = False) -> None:
         """
         Writes each Tyre entry to a CSV file named after the return of get_csv_filename().
         If the file exists the file will be overwritten.
 
         Args:
             retailers (list[Retailer]): The list of retailer objects that were scraped.
+            compress (bool): Whether to gzip the CSV file.
         """
-        with open(BaseScraper.get_csv_filename(), "w", encoding='utf-8') as f:
-            f.write(f"retailer,{Tyre.get_tyre_attribute_names()}\n")
-
+        with BaseScraper.open_csv_sink(compress) as sink:
             for retailer in retailers:
-                tyres: list[Tyre] = retailer.tyres
+                sink.write_retailer(retailer)
 
-                for tyre in tyres:
-                    f.write(f"{retailer.retailer},{tyre}\n")
+    @staticmethod
+    def is_captcha_page(page_source: str) -> bool:
+        """
+        Only call this once the page is missing what was expected (e.g. no products), plenty of normal pages mention captchas.
+
+        Args:
+            page_source (str): The HTML of the page that was loaded.
+
+        Returns:
+            bool: True if the page looks like a captcha or bot challenge instead of results.
+        """
+        return BaseScraper.CAPTCHA_MARKERS.search(page_source) is not None
 
     def get_basic_tyre_details(self) -> str:
         """
@@ -0,0 +1,131 @@
+import json
+import os
+import re
+import threading
+from selenium.common import WebDriverException
+from selenium.webdriver.ie.webdriver import WebDriver
+
+def get_results_url_template(url: str, size: tuple[int, int, int]) -> str | None:
+    """
+    Turns the URL a size's results were found at into a template the other sizes can be deep-linked with.
+
+    Args:
+        url (str): The URL of the results page (e.g. https://example.com/results?width=205&profile=55&size=16).
+        size (tuple[int, int, int]): The tyre_width, aspect_ratio and rim_diameter the results are for.
+
+    Returns:
+        str | None: The URL with the size replaced by {tyre_width}, {aspect_ratio} and {rim_diameter} placeholders,
+            None if the size isn't in the URL (e.g. the website keeps it in the session), so it can't be deep-linked.
+    """
+    template: str = url.replace('{', '{{').replace('}', '}}')
+    position: int = template.find('/', template.find('://') + 3) if '://' in template else 0 # Skips the host and any port number
+
+    if position < 0:
+        return None
+
+    for name, value in zip(('tyre_width', 'aspect_ratio', 'rim_diameter'), size):
+        match = re.compile(rf'(?<![\d.]){value}(?![\d.])').search(template, position)
+
+        if not match:
+            return None
+
+        template = f"{template[:match.start()]}{{{name}}}{template[match.end():]}"
+        position = match.start() + len(name) + 2
+
+    return template
+
+class SessionState:
+    """The deep-link template and cookies/localStorage saved for each location so a new browser can skip the navigation"""
+    def __init__(self, filename: str | None) -> None:
+        """
+        Args:
+            filename (str | None): The JSON file the state is saved to, None only keeps it in memory.
+        """
+        self.filename = filename
+        self._states: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    self._states = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring the saved browser sessions in '{filename}': {e}")
+
+    def get(self, key: str) -> dict | None:
+        """
+        Args:
+            key (str): The location (e.g. a branch name).
+
+        Returns:
+            dict | None: The saved results_url template, cookies and local_storage, None if nothing has been saved.
+        """
+        with self._lock:
+            return self._states.get(key)
+
+    def put(self, key: str, state: dict) -> None:
+        """
+        Saves the state of a location, replacing the file once it's written in full.
+
+        Args:
+            key (str): The location (e.g. a branch name).
+            state (dict): The results_url template, cookies and local_storage.
+        """
+        with self._lock:
+            self._states[key] = state
+
+            if not self.filename:
+                return
+
+            try:
+                with open(f"{self.filename}.tmp", 'w', encoding='utf-8') as f:
+                    json.dump(self._states, f)
+
+                os.replace(f"{self.filename}.tmp", self.filename)
+            except OSError as e:
+                print(f"There was a problem saving the browser sessions to '{self.filename}': {e}")
+
+class BrowserSession:
+    """A browser kept open between the jobs of one worker thread, along with the location its cookies were set up for"""
+    def __init__(self, driver: WebDriver) -> None:
+        self.driver = driver
+        self.location_key: str | None = None
+
+    @staticmethod
+    def save_state(driver: WebDriver) -> dict:
+        """
+        Args:
+            driver (WebDriver): The browser on a page of the website.
+
+        Returns:
+            dict: The browser's cookies and localStorage for the website.
+        """
+        return {
+            'cookies': driver.get_cookies(),
+            'local_storage': driver.execute_script("return Object.assign({}, window.localStorage);") or {},
+        }
+
+    @staticmethod
+    def restore_state(driver: WebDriver, state: dict) -> None:
+        """
+        Puts saved cookies and localStorage back, the browser must already be on a page of the website.
+
+        Args:
+            driver (WebDriver): The browser.
+            state (dict): The state from save_state().
+        """
+        for cookie in state.get('cookies', []):
+            try:
+                driver.add_cookie(cookie)
+            except WebDriverException as e:
+                print(f"Skipping saved cookie '{cookie.get('name')}': {e}")
+
+        for name, value in state.get('local_storage', {}).items():
+            driver.execute_script("window.localStorage.setItem(arguments[0], arguments[1]);", name, value)
+
+    def quit(self) -> None:
+        """Closes the browser, ignoring a browser that has already gone."""
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
@@ -1,9 +1,11 @@
+import os
 import re
+import threading
 import time
-from bs4 import BeautifulSoup, ResultSet
-from bs4.element import Tag
+from urllib.parse import urljoin
+from lxml import etree, html
 from selenium import webdriver
-from selenium.common import NoSuchElementException
+from selenium.common import NoSuchElementException, TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.ie.webdriver import WebDriver
 from selenium.webdriver.common.by import By
@@ -12,13 +14,55 @@ from selenium.webdriver.support.select import Select
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import utils
-from scrapers.base_scraper import BaseScraper
-from tyre import Tyre
+from scrapers.base_scraper import BaseScraper, BlockedError
+from scrapers.browser_session import BrowserSession, SessionState, get_results_url_template
+from scrapers.extraction import ExtractionSpec, Field, has_class, to_price
+from tyre_batch import TyreBatch
 
 class DexelScraper(BaseScraper):
     """Scraper for Dexel tyres website"""
-    def __init__(self, tyre_width: int, aspect_ratio: int, rim_diameter: int) -> None:
-        super().__init__(tyre_width, aspect_ratio, rim_diameter)
+    SPEC = ExtractionSpec(
+        items="//div[@class='tkf-product']", # Each div tag holds 1 tyre product
+        fields={
+            'sku': Field(f".//form[{has_class('book_tyre')}]//input[@name='prodCode']", attribute='value'),
+            'brand': Field(f".//form[{has_class('book_tyre')}]//input[@name='brand']", attribute='value', convert=str.title),
+            'pattern': Field(f".//form[{has_class('book_tyre')}]//input[@name='pattern']", attribute='value'),
+            'price': Field(".//span[@id='defaultBuyingOptionPrice']", convert=to_price),
+            'fuel_efficiency': Field(".//div[starts-with(@class, 'tyre_info_model fuel')]", convert=str.upper),
+            'wet_grip': Field(".//div[starts-with(@class, 'tyre_info_model grip')]", convert=str.upper),
+            'db_rating_number': Field(f".//div[{has_class('exterior-noice')}]", convert=int),
+            'season': Field(f"(.//div[{has_class('tyre-icons')}])[1]//i[starts-with(@class, 'icon-')]", attribute='title', convert=str.capitalize),
+            'tyre_type': Field(".//div[starts-with(@class, 'tyre-icons vehicle-types')]//i[starts-with(@class, 'icon-')]", attribute='title', convert=str.capitalize),
+            'electric': Field(".//button[@title='Electric Vehicle']", exists=True),
+            # The tyre details hold the load index and speed rating after the size (e.g. 205/55R16 91V), this website doesn't list a decibel letter or budget tyres
+            'load_index': Field(f".//p[{has_class('para-text')}]", regex=r'\b(\d+)[A-Z]\b', convert=int),
+            'speed_rating': Field(f".//p[{has_class('para-text')}]", regex=r'\b\d+([A-Z])\b', convert=str.upper),
+        }
+    )
+
+    PAGER_LINKS = etree.XPath(f"//*[{has_class('pagination')}]//a[@href]") # The links of the numbered pager
+
+    # The most results pages a worker's browser loads at once, each in its own tab, the domain's concurrency limit caps the tabs of every worker together
+    max_tabs: int = 4
+    # Whether Chrome runs without a window (e.g. on a server or for load tests)
+    headless: bool = False
+    # A directory to keep a Chrome profile per worker in so cookies survive between runs, None starts with a fresh profile each run
+    profile_dir: str | None = None
+    # Where the deep-link URL and cookies of each branch are saved so later runs can skip the navigation, None only keeps them for the run
+    state_file: str | None = 'dexel_session.json'
+
+    _session_state: SessionState | None = None
+    _local = threading.local() # Each worker thread keeps its own browser open between jobs
+    _sessions: set[BrowserSession] = set()
+    _next_worker: int = 0 # Only ever goes up, so a replacement browser never gets the profile of one still open
+    _sessions_lock = threading.Lock()
+
+    def __init__(self, tyre_width: int, aspect_ratio: int, rim_diameter: int, location: str | None = None) -> None:
+        """
+        Args:
+            location (str | None): The name of the branch prices are scraped for, None picks the first branch offered.
+        """
+        super().__init__(tyre_width, aspect_ratio, rim_diameter, location)
 
     def get_url(self) -> str:
         return "https://www.dexel.co.uk"
@@ -26,14 +70,23 @@ class DexelScraper(BaseScraper):
     def get_request_url(self, url: str, *extras) -> str:
         return ""
 
-    def load_webdriver(self) -> WebDriver:
+    def load_webdriver(self, profile: str | None = None) -> WebDriver:
         """
         Loads the webdriver with options enabled to try and minimise being detected as a bot.
 
+        Args:
+            profile (str | None): The Chrome user data directory to use, None uses a fresh temporary profile.
         Returns:
             WebDriver: The WebDriver object for accessing the webpage.
         """
         options = Options()
+
+        if profile:
+            options.add_argument(f'--user-data-dir={os.path.abspath(profile)}')
+
+        if DexelScraper.headless:
+            options.add_argument('--headless=new')
+
         options.add_argument('--disable-blink-features=AutomationControlled')
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option('useAutomationExtension', False)
@@ -41,10 +94,122 @@ class DexelScraper(BaseScraper):
         driver = webdriver.Chrome(options=options)
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
 
-        driver.get(self.get_url())
+        driver.get(self.get_base_url())
 
         return driver
 
+    @staticmethod
+    def get_session_state() -> SessionState:
+        """
+        Returns:
+            SessionState: The saved deep-link URLs and cookies of each branch, loaded from state_file the first time.
+        """
+        with DexelScraper._sessions_lock:
+            if DexelScraper._session_state is None:
+                DexelScraper._session_state = SessionState(DexelScraper.state_file)
+
+            return DexelScraper._session_state
+
+    def get_session(self) -> BrowserSession:
+        """
+        Returns:
+            BrowserSession: The browser of the current worker thread, started the first time the worker needs one.
+        """
+        session: BrowserSession | None = getattr(DexelScraper._local, 'session', None)
+
+        if session is None:
+            with DexelScraper._sessions_lock:
+                worker: int = DexelScraper._next_worker
+                DexelScraper._next_worker += 1
+
+            # Chrome locks its profile, so each worker gets its own directory
+            profile: str | None = os.path.join(DexelScraper.profile_dir, f"worker-{worker}") if DexelScraper.profile_dir else None
+            session = BrowserSession(self.load_webdriver(profile))
+
+            with DexelScraper._sessions_lock:
+                DexelScraper._sessions.add(session)
+
+            DexelScraper._local.session = session
+
+        return session
+
+    @staticmethod
+    def discard_session(session: BrowserSession) -> None:
+        """
+        Closes a browser that can't be trusted any more (e.g. it was shown a captcha), the worker starts a new one for its next job.
+
+        Args:
+            session (BrowserSession): The browser session.
+        """
+        session.quit()
+
+        with DexelScraper._sessions_lock:
+            DexelScraper._sessions.discard(session)
+
+        if getattr(DexelScraper._local, 'session', None) is session:
+            DexelScraper._local.session = None
+
+    @staticmethod
+    def close_sessions() -> None:
+        """Closes the browser of every worker, call once all the jobs have finished."""
+        with DexelScraper._sessions_lock:
+            sessions: list[BrowserSession] = list(DexelScraper._sessions)
+            DexelScraper._sessions = set()
+            DexelScraper._next_worker = 0 # Every browser is closed, so the next run can pick up the worker profiles again
+
+        for session in sessions:
+            session.quit()
+
+        DexelScraper._local = threading.local()
+
+    def open_results_directly(self, session: BrowserSession) -> bool:
+        """
+        Deep-links straight to the results for the size using the URL saved when the branch was last navigated to,
+        restoring the branch's saved cookies first if the browser was set up for another branch.
+
+        Args:
+            session (BrowserSession): The worker's browser session.
+        Returns:
+            bool: True if the results loaded, False if the branch hasn't been navigated to before or the link didn't work.
+        """
+        key: str = self.location or ''
+        state: dict | None = DexelScraper.get_session_state().get(key)
+
+        if not state or not state.get('results_url'):
+            return False
+
+        driver: WebDriver = session.driver
+
+        if session.location_key != key:
+            BrowserSession.restore_state(driver, state)
+            session.location_key = key
+
+        driver.get(state['results_url'].format(tyre_width=self.tyre_width, aspect_ratio=self.aspect_ratio, rim_diameter=self.rim_diameter))
+
+        try:
+            WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.tkf-product')))
+        except TimeoutException:
+            if BaseScraper.is_captcha_page(driver.page_source):
+                raise BlockedError('captcha')
+
+            return False
+
+        return True
+
+    def save_session(self, session: BrowserSession) -> None:
+        """
+        Saves the URL of the results page as a deep-link template along with the branch's cookies, after navigating to them.
+
+        Args:
+            session (BrowserSession): The worker's browser session, on the results page.
+        """
+        key: str = self.location or ''
+        session.location_key = key
+        results_url: str | None = get_results_url_template(session.driver.current_url, (self.tyre_width, self.aspect_ratio, self.rim_diameter))
+
+        if results_url:
+            DexelScraper.get_session_state().put(key, {'results_url': results_url, **BrowserSession.save_state(session.driver)})
+
     @staticmethod
     def scroll_into_view(driver: WebDriver, element: WebElement) -> None:
         """
@@ -65,8 +230,14 @@ class DexelScraper(BaseScraper):
         Returns:
             bool: True if everything was successful, False if the search criteria wasn't found.
         """
-        # Searches for the Search button
-        tyre_select_button: WebElement = driver.find_element(By.LINK_TEXT, 'Search by Tyre Size.')
+        # Searches for the Search button, the homepage loads a reCAPTCHA script so the page is only checked for a challenge if the button is missing
+        try:
+            tyre_select_button: WebElement = driver.find_element(By.LINK_TEXT, 'Search by Tyre Size.')
+        except NoSuchElementException:
+            if BaseScraper.is_captcha_page(driver.page_source):
+                raise BlockedError('captcha')
+
+            raise
         DexelScraper.scroll_into_view(driver, tyre_select_button) # Scrolls the button into view otherwise an error will occur when simulating the click
         time.sleep(0.5)
         tyre_select_button.click()
@@ -127,7 +298,11 @@ class DexelScraper(BaseScraper):
 
         time.sleep(utils.random_number())
 
-        branch_button = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, "//button[text()='Select This Branch']")))
+        branch_button: WebElement | None = self.find_branch_button(driver)
+
+        if branch_button is None:
+            return False
+
         DexelScraper.scroll_into_view(driver, branch_button)
         time.sleep(0.5)
         branch_button.click()
@@ -136,137 +311,186 @@ class DexelScraper(BaseScraper):
 
         return True
 
-    def scrape(self) -> list[Tyre]:
+    def find_branch_button(self, driver: WebDriver) -> WebElement | None:
         """
-        Scrapes the Dexel website.
+        Finds the "Select This Branch" button of the branch being scraped, or the first branch if no location was given.
 
+        Args:
+            driver (WebDriver): The object needed to be able to interact with the loaded webpage.
         Returns:
-            list[Tyre]: The list of Tyres scraped.
+            WebElement | None: The button, None if the branch wasn't offered.
         """
-        driver: WebDriver = self.load_webdriver()
-        # Navigates to the results page step by step with random time delay intervals.
-        # If None is returned the match was unsuccessful
-        if not self.navigate_to_results(driver):
-            return []
+        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, "//button[text()='Select This Branch']")))
+        branch_buttons: list[WebElement] = driver.find_elements(By.XPATH, "//button[text()='Select This Branch']")
 
-        next_page_button: WebElement # Holds a reference to the '>' next page button each time a page loads
-        tyres: list[Tyre] = []
+        if self.location is None:
+            return branch_buttons[0]
 
-        while True: # Keeps looping until there is no more '>' next page button.
-            soup: BeautifulSoup = BeautifulSoup(driver.page_source, 'lxml')
-            divs: ResultSet[Tag] = soup.select('div[class="tkf-product"]') # Each div tag holds 1 tyre product
-
-            for div in divs:
-                sku: str | None = None
-                load_index: int | None = None
-                speed_rating: str | None = None
-                db_rating_letter = None # This website doesn't have letter ratings
-                brand: str | None = None
-                pattern: str | None = None
-                price: float | None = None
-                wet_grip: str | None = None
-                season: str | None = None
-                fuel_efficiency: str | None = None
-                db_rating_number: int | None = None
-                budget = None # This website doesn't list if a tyre is budget
-                tyre_type: str | None = None
-
-                tyre_details_div: Tag | None = div.find('p', class_='para-text')
-                price_span: Tag | None = div.find('span', id='defaultBuyingOptionPrice')
-
-                if price_span:
-                    price_temp: str | None = re.sub(r'\s+', '', price_span.get_text(strip=True)[1:])
-                    price = float(price_temp) if price_temp else None
-
-                fuel_efficiency_div: Tag | None = div.find('div', class_=re.compile('^tyre_info_model fuel'))
-
-                if fuel_efficiency_div:
-                    fuel_efficiency = fuel_efficiency_div.get_text(strip=True).upper()
-
-                wet_grip_div: Tag | None = div.find('div', class_=re.compile('^tyre_info_model grip'))
-
-                if wet_grip_div:
-                    wet_grip = wet_grip_div.get_text(strip=True).upper()
-
-                db_rating_number_div: Tag | None = div.find('div', class_='exterior-noice')
-
-                if db_rating_number_div:
-                    db_rating_number = int(db_rating_number_div.get_text(strip=True))
-
-                tyre_icons_div: Tag | None = div.find('div', class_='tyre-icons')
-
-                if tyre_icons_div:
-                    weather_icon_tag: Tag | None = tyre_icons_div.find('i', class_=re.compile('^icon-'))
-
-                    if weather_icon_tag:
-                        weather: str | None = weather_icon_tag.get('title')
-
-                        if weather:
-                            season = weather.capitalize()
-
-                tyre_icons_vehicle_div: Tag | None = div.find('div', class_=re.compile('^tyre-icons vehicle-types'))
-
-                if tyre_icons_vehicle_div:
-                    vehicle_icon_tag: Tag | None = tyre_icons_vehicle_div.find('i', class_=re.compile('^icon-'))
-
-                    if vehicle_icon_tag:
-                        vehicle_type: str | None = vehicle_icon_tag.get('title')
-
-                        if vehicle_type:
-                            tyre_type = vehicle_type.capitalize()
-
-                ev_button: Tag | None = div.find('button', title='Electric Vehicle')
-                electric: bool = ev_button != None
-
-                if tyre_details_div:
-                    tyre_speed_details: str | None = tyre_details_div.get_text(strip=True).split()[1]
-                    match = re.search(r'\d+[A-Z]', tyre_speed_details) # Removes any garbage around the load index and speed rating
-
-                    if match:
-                        tyre_speed_details = match.group()
-                        load_index = int(tyre_speed_details[:-1])
-                        speed_rating = tyre_speed_details[-1:].upper()
-
-                form: Tag | None = div.find('form', class_='book_tyre')
-
-                if form:
-                    sku = form.find('input', {'name': 'prodCode'}).get('value').strip()
-                    brand = form.find('input', {'name': 'brand'}).get('value').strip().title()
-                    pattern = form.find('input', {'name': 'pattern'}).get('value').strip()
-
-                tyres.append(
-                    Tyre(
-                        sku=sku,
-                        brand=brand,
-                        pattern=pattern,
-                        tyre_width=self.tyre_width,
-                        aspect_ratio=self.aspect_ratio,
-                        rim_diameter=self.rim_diameter,
-                        load_index=load_index,
-                        speed_rating=speed_rating,
-                        price=price,
-                        wet_grip=wet_grip,
-                        season=season,
-                        fuel_efficiency=fuel_efficiency,
-                        db_rating_number=db_rating_number,
-                        db_rating_letter=db_rating_letter,
-                        budget=budget,
-                        electric=electric,
-                        tyre_type=tyre_type
-                    )
-                )
+        for branch_button in branch_buttons:
+            # The button shares a container with the branch's name and address
+            branch_details: WebElement = branch_button.find_element(By.XPATH, './ancestor::div[2]')
+
+            if self.location.lower() in branch_details.text.lower():
+                return branch_button
+
+        return None
+
+    @staticmethod
+    def get_pager(page_source: str, page_url: str) -> tuple[int, str | None]:
+        """
+        Reads the numbered pager at the bottom of a results page.
+
+        Args:
+            page_source (str): The HTML of the results page.
+            page_url (str): The URL of the results page, the pager's links are relative to it.
+        Returns:
+            tuple[int, str | None]: The highest page number in the pager and a URL template with a {page} placeholder for loading any page,
+                the template is None if the pager has no numbered links to a page after the first (e.g. it's run by JavaScript).
+        """
+        page_links: dict[int, str] = {}
+
+        for link in DexelScraper.PAGER_LINKS(html.fromstring(page_source)):
+            text: str = link.text_content().strip()
+
+            if text.isdigit():
+                page_links[int(text)] = link.get('href')
+
+        page_count: int = max(page_links, default=1)
+        linked_pages: list[int] = [page for page, href in page_links.items() if page > 1 and not href.lower().startswith('javascript:')]
+
+        if not linked_pages:
+            return page_count, None
+
+        # The page's number is the last one in its link (e.g. /results?width=205&profile=55&size=16&page=3)
+        page: int = max(linked_pages)
+        href: str = urljoin(page_url, page_links[page]).replace('{', '{{').replace('}', '}}')
+        match: re.Match | None = None
+
+        for match in re.finditer(rf'(?<!\d){page}(?!\d)', href):
+            pass
+
+        return page_count, f"{href[:match.start()]}{{page}}{href[match.end():]}" if match else None
+
+    def scrape_pages_in_tabs(self, driver: WebDriver, tyres: TyreBatch, seen_skus: set[str], page_template: str, page_count: int) -> None:
+        """
+        Loads the rest of the results pages in batches of up to max_tabs tabs, so the pages of a batch load at the same time.
+        The first tab of a batch uses the job's own slot, any more are borrowed from the domain's controller so the tabs of every worker stay within its limit.
+        The pager of each page is read again in case it only lists the pages near the current one.
+
+        Args:
+            driver (WebDriver): The browser, on the first page of results.
+            tyres (TyreBatch): The batch the tyres are added to.
+            seen_skus (set[str]): The prodCodes already added, a product listed on two pages is only added once.
+            page_template (str): The URL of any page with a {page} placeholder.
+            page_count (int): The highest page number known so far.
+        """
+        results_tab: str = driver.current_window_handle
+        next_page: int = 2
 
+        while next_page <= page_count:
+            wanted: int = min(page_count - next_page + 1, DexelScraper.max_tabs) - 1
+            borrowed: int = self.controller.acquire_extra(wanted) if self.controller is not None else wanted
+            pages: range = range(next_page, next_page + borrowed + 1)
+            next_page = pages[-1] + 1
+            open_tabs: set[str] = set(driver.window_handles)
+
+            try:
+                # window.open() doesn't wait for the page to load, so every tab loads at once
+                for page in pages:
+                    driver.execute_script("window.open(arguments[0], '_blank');", page_template.format(page=page))
+
+                for tab in [handle for handle in driver.window_handles if handle not in open_tabs]:
+                    driver.switch_to.window(tab)
+
+                    try:
+                        WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.tkf-product')))
+                    except TimeoutException:
+                        if BaseScraper.is_captcha_page(driver.page_source):
+                            raise BlockedError('captcha')
+
+                    page_source: str = driver.page_source
+                    DexelScraper.SPEC.extract(page_source, tyres, (self.tyre_width, self.aspect_ratio, self.rim_diameter), seen_skus)
+                    page_count = max(page_count, DexelScraper.get_pager(page_source, driver.current_url)[0])
+                    driver.close()
+            finally:
+                if self.controller is not None:
+                    self.controller.release_extra(borrowed)
+
+            driver.switch_to.window(results_tab)
+
+    def scrape_pages_in_order(self, driver: WebDriver, tyres: TyreBatch, seen_skus: set[str]) -> None:
+        """
+        Clicks through the rest of the results pages one at a time, for when the pager's links can't be opened directly.
+
+        Args:
+            driver (WebDriver): The browser, on the first page of results.
+            tyres (TyreBatch): The batch the tyres are added to.
+            seen_skus (set[str]): The prodCodes already added, a product listed on two pages is only added once.
+        """
+        while True: # Keeps looping until there is no more '>' next page button.
             try:
                 # At the bottom of the search results page, as long as there's a '>' button it means there's more pages to load
-                next_page_button = driver.find_element(By.LINK_TEXT, '>')
-                DexelScraper.scroll_into_view(driver, next_page_button)
-                time.sleep(0.5)
-                next_page_button.click() # Click the '>' button and wait to see if there's another one, if not break out and finish
-                WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.LINK_TEXT, '>')))
-                time.sleep(utils.random_number())
+                next_page_button: WebElement = driver.find_element(By.LINK_TEXT, '>')
             except NoSuchElementException:
-                break # Breaks out of the while loop
+                break # The last page has been reached
+
+            DexelScraper.scroll_into_view(driver, next_page_button)
+            time.sleep(0.5)
+            next_page_button.click()
+
+            # The old button goes stale once the next page has replaced it
+            WebDriverWait(driver, 60).until(EC.staleness_of(next_page_button))
+            WebDriverWait(driver, 60).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.tkf-product')))
+
+            page_source: str = driver.page_source
+
+            if not DexelScraper.SPEC.extract(page_source, tyres, (self.tyre_width, self.aspect_ratio, self.rim_diameter), seen_skus) and BaseScraper.is_captcha_page(page_source):
+                raise BlockedError('captcha')
+
+    def scrape(self) -> TyreBatch:
+        """
+        Scrapes the Dexel website.
+
+        Returns:
+            TyreBatch: The batch of Tyres scraped.
+        """
+        tyres = TyreBatch()
+        seen_skus: set[str] = set()
+        session: BrowserSession = self.get_session()
+        driver: WebDriver = session.driver
+
+        try:
+            # Only the first job for a branch has to click through the website, the rest deep-link to their results
+            found_results: bool = self.open_results_directly(session)
+
+            if not found_results:
+                if driver.current_url.rstrip('/') != self.get_base_url():
+                    driver.get(self.get_base_url())
+
+                # Navigates to the results page step by step with random time delay intervals.
+                # If False is returned the match was unsuccessful
+                found_results = self.navigate_to_results(driver)
+
+                if found_results:
+                    self.save_session(session)
+
+            if not found_results:
+                return tyres
+
+            page_source: str = driver.page_source
+
+            if not DexelScraper.SPEC.extract(page_source, tyres, (self.tyre_width, self.aspect_ratio, self.rim_diameter), seen_skus) and BaseScraper.is_captcha_page(page_source):
+                raise BlockedError('captcha')
+
+            page_count, page_template = DexelScraper.get_pager(page_source, driver.current_url)
 
-        driver.close()
+            if page_template:
+                self.scrape_pages_in_tabs(driver, tyres, seen_skus, page_template, page_count)
+            else:
+                self.scrape_pages_in_order(driver, tyres, seen_skus)
+        except Exception:
+            # A browser left part way through (e.g. shown a captcha or with tabs still open) isn't reused
+            DexelScraper.discard_session(session)
+            raise
 
-        return tyres
\ No newline at end of file
+        return tyres
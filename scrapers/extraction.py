@@ -0,0 +1,187 @@
+import re
+from typing import Callable
+from lxml import etree, html
+from tyre_batch import TyreBatch
+
+# The Tyre fields a spec can fill in, the size comes from the scraper
+TYRE_FIELDS: tuple[str, ...] = (
+    'sku', 'brand', 'pattern', 'load_index', 'speed_rating', 'price', 'wet_grip', 'season',
+    'fuel_efficiency', 'db_rating_number', 'db_rating_letter', 'budget', 'electric', 'tyre_type'
+)
+
+def has_class(name: str) -> str:
+    """
+    Args:
+        name (str): A CSS class name.
+
+    Returns:
+        str: An XPath predicate matching elements that have the class among others (the equivalent of the CSS selector .name).
+    """
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+def to_price(text: str) -> float:
+    """
+    Args:
+        text (str): A price with any currency symbol, spaces or thousand separators (e.g. '£1, 085.50').
+
+    Returns:
+        float: The price.
+
+    Raises:
+        ValueError: There's no number in the text.
+    """
+    return float(re.sub(r'[^\d.]', '', text))
+
+def to_bool(*true_values: str) -> Callable[[str], bool]:
+    """
+    Args:
+        true_values (str): The values (in lower case) that mean True, anything else means False.
+
+    Returns:
+        Callable[[str], bool]: A converter for a Field.
+    """
+    return lambda text: text.lower() in true_values
+
+class Field:
+    """How to extract one Tyre field from a product on the page"""
+    def __init__(self,
+                 xpath: str,
+                 attribute: str | None = None,
+                 regex: str | None = None,
+                 group: int = 1,
+                 convert: Callable[[str], object] | None = None,
+                 exists: bool = False
+    ) -> None:
+        """
+        Args:
+            xpath (str): Where the value is, relative to the product element. The first match is used.
+            attribute (str | None): The attribute of the matched element holding the value, its text is used if not given.
+            regex (str | None): A pattern the value must match, the value becomes the matched group.
+            group (int): The regex group holding the value.
+            convert (Callable[[str], object] | None): Turns the text into the field's type (e.g. int, to_price, str.title).
+            exists (bool): The field is True if the xpath matches anything and False otherwise, used for flags such as electric.
+        """
+        self.xpath = xpath
+        self.attribute = attribute
+        self.regex = regex
+        self.group = group
+        self.convert = convert
+        self.exists = exists
+
+class ExtractionSpec:
+    """Describes where each Tyre field is on a retailer's results page, compiled once into lxml XPath and regex objects"""
+    def __init__(self, items: str, fields: dict[str, Field], required: tuple[str, ...] = ('sku',)) -> None:
+        """
+        Args:
+            items (str): An XPath matching the element of each product on the page.
+            fields (dict[str, Field]): How to extract each Tyre field, fields that aren't given are left as None.
+            required (tuple[str, ...]): Products missing any of these fields are skipped.
+
+        Raises:
+            ValueError: A field isn't a Tyre field.
+            lxml.etree.XPathSyntaxError: An XPath isn't valid.
+            re.error: A regex isn't valid.
+        """
+        unknown_fields: set[str] = set(fields) - set(TYRE_FIELDS)
+
+        if unknown_fields:
+            raise ValueError(f"Unknown Tyre field(s) in the extraction spec: {', '.join(sorted(unknown_fields))}")
+
+        self.items = etree.XPath(items)
+        self.required: tuple[str, ...] = required
+        self.fields: list[tuple[str, etree.XPath, re.Pattern | None, int, Callable[[str], object] | None, bool]] = []
+
+        for name, field in fields.items():
+            path: str = f"({field.xpath})[1]/@{field.attribute}" if field.attribute else f"({field.xpath})[1]"
+            xpath = etree.XPath(f"boolean({field.xpath})" if field.exists else f"string({path})", smart_strings=False)
+            self.fields.append((name, xpath, re.compile(field.regex) if field.regex else None, field.group, field.convert, field.exists))
+
+    def extract_item(self, item: etree._Element) -> dict[str, object] | None:
+        """
+        Args:
+            item (etree._Element): The element of one product.
+
+        Returns:
+            dict[str, object] | None: The value of each field in the spec, None if a required field is missing.
+        """
+        values: dict[str, object] = {}
+
+        for name, xpath, regex, group, convert, exists in self.fields:
+            if exists:
+                values[name] = xpath(item)
+                continue
+
+            value: object = xpath(item).strip()
+
+            if value and regex is not None:
+                match = regex.search(value)
+                value = match.group(group).strip() if match else ''
+
+            if not value:
+                value = None
+            elif convert is not None:
+                try:
+                    value = convert(value)
+                except (ValueError, TypeError, IndexError) as e:
+                    print(f"Error converting the {name} '{value}': {e}")
+                    value = None
+
+            values[name] = value
+
+        for name in self.required:
+            if values.get(name) is None:
+                return None
+
+        return values
+
+    def extract(self, page: str | bytes | etree._Element, tyres: TyreBatch, size: tuple[int, int, int], seen_skus: set[str] | None = None) -> int:
+        """
+        Extracts every product on a page and adds them to a batch.
+
+        Args:
+            page (str | bytes | etree._Element): The HTML of the page, or the page already parsed by lxml.
+            tyres (TyreBatch): The batch the tyres are added to.
+            size (tuple[int, int, int]): The tyre_width, aspect_ratio and rim_diameter that was searched for.
+            seen_skus (set[str] | None): If given, products with a sku in the set are skipped and the sku of each product added is put in it,
+                so the pages of a paginated result can't add a product twice.
+
+        Returns:
+            int: The number of product elements found on the page, including any skipped for missing a required field.
+        """
+        root: etree._Element = html.fromstring(page) if isinstance(page, (str, bytes)) else page
+        items: list[etree._Element] = self.items(root)
+        tyre_width, aspect_ratio, rim_diameter = size
+
+        for item in items:
+            values: dict[str, object] | None = self.extract_item(item)
+
+            if values is None:
+                continue
+
+            if seen_skus is not None:
+                if values.get('sku') in seen_skus:
+                    continue
+
+                seen_skus.add(values.get('sku'))
+
+            tyres.add(
+                sku=values.get('sku'),
+                brand=values.get('brand'),
+                pattern=values.get('pattern'),
+                tyre_width=tyre_width,
+                aspect_ratio=aspect_ratio,
+                rim_diameter=rim_diameter,
+                load_index=values.get('load_index'),
+                speed_rating=values.get('speed_rating'),
+                price=values.get('price'),
+                wet_grip=values.get('wet_grip'),
+                season=values.get('season'),
+                fuel_efficiency=values.get('fuel_efficiency'),
+                db_rating_number=values.get('db_rating_number'),
+                db_rating_letter=values.get('db_rating_letter'),
+                budget=values.get('budget'),
+                electric=bool(values.get('electric')),
+                tyre_type=values.get('tyre_type')
+            )
+
+        return len(items)
@@ -0,0 +1,71 @@
+from importlib import import_module
+from scrapers.base_scraper import BaseScraper
+
+# Maps a retailer name to the "module:ClassName" path of its scraper.
+# Modules are only imported the first time a job needs them, so an HTTP only run never pays for Selenium.
+SCRAPER_REGISTRY: dict[str, str] = {
+    'national': 'scrapers.national_scraper:NationalScraper',
+    'dexel': 'scrapers.dexel_scraper:DexelScraper',
+}
+
+_loaded_scrapers: dict[str, type[BaseScraper]] = {}
+
+def register_scraper(name: str, import_path: str) -> None:
+    """
+    Registers a scraper so it can be created by name without importing it up front.
+
+    Args:
+        name (str): The name jobs will use to refer to the scraper (e.g. national).
+        import_path (str): Where the scraper class lives in the format "package.module:ClassName".
+    """
+    SCRAPER_REGISTRY[name.lower()] = import_path
+    _loaded_scrapers.pop(name.lower(), None)
+
+def get_scraper_names() -> list[str]:
+    """
+    Returns:
+        list[str]: The names of every registered scraper.
+    """
+    return list(SCRAPER_REGISTRY)
+
+def get_scraper_class(name: str) -> type[BaseScraper]:
+    """
+    Imports (on first use) and returns the scraper class registered under a name.
+
+    Args:
+        name (str): The registered name of the scraper (e.g. national, dexel).
+
+    Returns:
+        type[BaseScraper]: The scraper class.
+
+    Raises:
+        KeyError: No scraper has been registered with that name.
+    """
+    key: str = name.lower()
+    scraper_class: type[BaseScraper] | None = _loaded_scrapers.get(key)
+
+    if scraper_class is None:
+        if key not in SCRAPER_REGISTRY:
+            raise KeyError(f"No scraper registered with the name '{name}'")
+
+        module_name, class_name = SCRAPER_REGISTRY[key].split(':')
+        scraper_class = getattr(import_module(module_name), class_name)
+        _loaded_scrapers[key] = scraper_class
+
+    return scraper_class
+
+def create_scraper(name: str, tyre_width: int, aspect_ratio: int, rim_diameter: int, location: str | None = None) -> BaseScraper:
+    """
+    Creates a scraper job by name, importing the retailer module only if it hasn't been already.
+
+    Args:
+        name (str): The registered name of the scraper (e.g. national, dexel).
+        tyre_width (int): The width of the tyre being scraped for.
+        aspect_ratio (int): The aspect ratio of the tyre being scraped for.
+        rim_diameter (int): The diameter of the tyre being scraped for.
+        location (str | None): Where prices are being scraped for (e.g. a postcode or branch), None uses the website's default.
+
+    Returns:
+        BaseScraper: The scraper ready to be scraped.
+    """
+    return get_scraper_class(name)(tyre_width, aspect_ratio, rim_diameter, location)
@@ -0,0 +1,67 @@
+import requests
+from requests import Response
+from scrapers.base_scraper import BaseScraper, BlockedError
+from scrapers.extraction import ExtractionSpec
+from tyre_batch import TyreBatch
+
+# The ETag and body of each results page already fetched, so an unchanged page isn't downloaded again
+_page_cache: dict[str, tuple[str, bytes]] = {}
+
+class SpecScraper(BaseScraper):
+    """
+    Scraper for a website that lists every result for a size on one page that can be fetched without a browser.
+    A retailer only needs get_url(), get_request_url() and an ExtractionSpec describing its results page.
+    """
+    SPEC: ExtractionSpec
+
+    def fetch_page(self) -> bytes:
+        """
+        Fetches the results page, sending the ETag of the last copy so an unchanged page isn't downloaded again.
+
+        Returns:
+            bytes: The HTML of the page.
+
+        Raises:
+            RequestException: There was a problem with the connection to the website
+            BlockedError: The website refused the request (rate limited or forbidden)
+        """
+        try:
+            request_url: str = self.get_request_url(self.get_base_url())
+            cached_page: tuple[str, bytes] | None = _page_cache.get(request_url)
+            headers: dict[str, str] = {'If-None-Match': cached_page[0]} if cached_page else {}
+            response: Response = requests.get(request_url, headers=headers, timeout=10)
+
+            # Rate limiting and bot blocking are reported separately so the scheduler can back off
+            if response.status_code in (403, 429):
+                retry_after: str | None = response.headers.get('Retry-After')
+                raise BlockedError('rate limited' if response.status_code == 429 else 'forbidden', response.status_code,
+                                   float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+            response.raise_for_status()
+        except BlockedError:
+            raise
+        except requests.RequestException as e:
+            raise requests.RequestException(e)
+
+        if response.status_code == 304 and cached_page:
+            return cached_page[1]
+
+        if response.headers.get('ETag'):
+            _page_cache[request_url] = (response.headers['ETag'], response.content)
+
+        return response.content
+
+    def scrape(self) -> TyreBatch:
+        """
+        Scrapes the website's results page with the retailer's extraction spec.
+
+        Returns:
+            TyreBatch: The batch of Tyres scraped.
+        """
+        tyres = TyreBatch()
+        page: bytes = self.fetch_page()
+
+        if not self.SPEC.extract(page, tyres, (self.tyre_width, self.aspect_ratio, self.rim_diameter)) and BaseScraper.is_captcha_page(page.decode('utf-8', 'replace')):
+            raise BlockedError('captcha')
+
+        return tyres
@@ -0,0 +1,48 @@
+import statistics
+import subprocess
+import sys
+
+# Each snippet is run in a fresh interpreter, the same way a short-lived worker process would start up
+SNIPPETS: dict[str, str] = {
+    'python (baseline)': 'pass',
+    'import scrapers': 'import scrapers',
+    'national scraper': "import scrapers; scrapers.get_scraper_class('national')",
+    'dexel scraper': "import scrapers; scrapers.get_scraper_class('dexel')",
+    'all scrapers (eager)': 'from scrapers import NationalScraper, DexelScraper',
+}
+
+def time_snippet(snippet: str, runs: int) -> list[float]:
+    """
+    Times how long a fresh Python process takes to run a snippet.
+
+    Args:
+        snippet (str): The Python code to run.
+        runs (int): How many times to run the snippet.
+
+    Returns:
+        list[float]: The time in milliseconds for each run.
+    """
+    timer_code: str = (
+        "import time; _start = time.perf_counter()\n"
+        f"{snippet}\n"
+        "print((time.perf_counter() - _start) * 1000)"
+    )
+    timings: list[float] = []
+
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', timer_code], capture_output=True, text=True, check=True)
+        timings.append(float(result.stdout.strip()))
+
+    return timings
+
+def main() -> None:
+    runs: int = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    print(f"Import time per fresh process (median of {runs} runs):")
+
+    for name, snippet in SNIPPETS.items():
+        timings: list[float] = time_snippet(snippet, runs)
+        print(f"  {name:<22} {statistics.median(timings):8.1f} ms")
+
+if __name__ == "__main__":
+    main()
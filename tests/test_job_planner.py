@@ -0,0 +1,23 @@
+from job_planner import JobEstimate, get_job_estimates, plan_within_budget
+from scrapers import BaseScraper, create_scraper
+from tyre_db import TyreDB
+
+def test_history_is_kept_per_location(tmp_path):
+    with TyreDB(str(tmp_path / "tyres.db")) as db:
+        db.add_job_history([
+            ('national.co.uk', 'S11AA', 205, 55, 16, 4.0, 40, True),
+            ('national.co.uk', 'LS14AP', 205, 55, 16, 20.0, 10, True),
+        ])
+        stats: list[tuple] = db.get_job_history_stats()
+
+    scrapers: list[BaseScraper] = [create_scraper('national', 205, 55, 16, postcode) for postcode in ('s1 1aa', 'LS14AP', 'M11AE')]
+    estimates: list[JobEstimate] = get_job_estimates(scrapers, stats)
+
+    assert [(estimate.cost, estimate.known) for estimate in estimates] == [(4.0, True), (20.0, True), (12.0, False)]
+
+def test_budget_scales_with_concurrency():
+    scrapers: list[BaseScraper] = [create_scraper('national', 205, 55, 16 + index) for index in range(4)]
+    stats: list[tuple] = [('national.co.uk', 'DN67RL', 205, 55, 16 + index, 10.0, 20, 1.0, None) for index in range(4)]
+
+    assert len(plan_within_budget(scrapers, 25.0, stats).jobs) == 2
+    assert len(plan_within_budget(scrapers, 25.0, stats, {'national.co.uk': 2.0}).jobs) == 4
@@ -0,0 +1,32 @@
+import time
+from scrape_scheduler import DomainController, DomainSettings
+
+def test_blocked_probe_reopens_breaker():
+    controller = DomainController('example.co.uk', DomainSettings(breaker_threshold=3, breaker_cooldown=60.0, max_breaker_trips=5))
+
+    for _ in range(3):
+        controller.in_flight += 1
+        controller.record_blocked()
+
+    assert controller.breaker_trips == 1 and controller.half_open
+    first_pause: float = controller.paused_until - time.monotonic()
+    assert 55.0 < first_pause <= 60.0
+
+    # The probe sent once the pause ends is blocked too, which opens the breaker again for twice as long
+    controller.paused_until = time.monotonic()
+    controller.in_flight += 1
+    controller.record_blocked()
+
+    assert controller.breaker_trips == 2
+    assert controller.paused_until - time.monotonic() > 115.0
+    assert controller.acquire_extra(3) == 0
+
+    # A probe that gets through closes the breaker
+    controller.paused_until = time.monotonic()
+    assert controller.acquire(time.monotonic() + 1.0)
+    controller.record_success(1.0)
+
+    assert not controller.half_open
+    controller.in_flight += 1
+    controller.record_blocked()
+    assert controller.breaker_trips == 2
@@ -0,0 +1,93 @@
+from location_planner import LocationZones, plan_jobs
+from mock_retailer import MockProduct, MockRetailer
+from scrape_scheduler import AdaptiveScheduler
+from scrapers import BaseScraper, DexelScraper, NationalScraper, create_scraper
+from scrapers.extraction import to_price
+from tyre import Tyre
+from tyre_batch import TyreBatch
+
+def test_captcha_page_needs_a_challenge_marker():
+    # A normal page that loads a reCAPTCHA widget on a form isn't a challenge
+    assert not BaseScraper.is_captcha_page(
+        '<html><head><script src="https://www.google.com/recaptcha/api.js"></script></head>'
+        '<body><a href="/tyres">Search by Tyre Size.</a><form><div class="g-recaptcha" data-sitekey="x"></div></form></body></html>'
+    )
+
+    assert BaseScraper.is_captcha_page('<html><head><title>Just a moment...</title></head><body><form id="challenge-form"></form></body></html>')
+    assert BaseScraper.is_captcha_page('<html><body><div class="cf-challenge-running"></div></body></html>')
+    assert BaseScraper.is_captcha_page('<html><body><h1>Are you a robot?</h1></body></html>')
+    assert BaseScraper.is_captcha_page('<html><body><iframe src="https://geo.captcha-delivery.com/captcha/?initialCid=x"></iframe></body></html>')
+
+def test_postcodes_are_normalised():
+    scrapers: list[BaseScraper] = [create_scraper('national', 205, 55, 16, postcode) for postcode in ('S1 1AA', 's11aa', 'S11AA')]
+
+    assert len({scraper.get_job_key() for scraper in scrapers}) == 1
+    assert {scraper.get_retailer_name() for scraper in scrapers} == {'national.co.uk (S11AA)'}
+    assert scrapers[0].get_request_url('https://national.co.uk').endswith('?pc=S11AA')
+    assert create_scraper('national', 205, 55, 16, 'dn6 7rl').get_retailer_name() == 'national.co.uk'
+
+    # The same postcode written three ways is one location, so there's nothing to probe and only one job
+    jobs: list[BaseScraper] = plan_jobs(['national'], [(205, 55, 16)], {'national': ['S1 1AA', 's11aa', 'S11AA']}, LocationZones(), AdaptiveScheduler())
+
+    assert [(job.location, job.locations) for job in jobs] == [('S11AA', ['S11AA'])]
+
+def get_mock_products(retailer: MockRetailer, size: tuple[int, int, int]) -> list[MockProduct]:
+    """
+    Args:
+        retailer (MockRetailer): The mock retailer.
+        size (tuple[int, int, int]): The size searched for.
+
+    Returns:
+        list[MockProduct]: The products listed for the size, the first one priced over £1,000 so its price has a thousands separator.
+    """
+    products: list[MockProduct] = retailer.get_products(size)
+    products[0].price = 1084.5
+
+    return products
+
+def test_national_spec_extracts_mock_page():
+    retailer = MockRetailer(products=12)
+    size: tuple[int, int, int] = (205, 55, 16)
+    products: list[MockProduct] = get_mock_products(retailer, size)
+    tyres = TyreBatch()
+
+    assert NationalScraper.SPEC.extract(retailer.render_national(size, 'S11AA'), tyres, size) == 12
+
+    for product, tyre in zip(products, tyres, strict=True):
+        assert (tyre.sku, tyre.brand, tyre.pattern, tyre.tyre_width, tyre.aspect_ratio, tyre.rim_diameter) == (product.sku, product.brand.title(), product.pattern, *size)
+        assert (tyre.load_index, tyre.speed_rating) == (product.load_index, product.speed_rating)
+        assert tyre.price_pence == Tyre.price_to_pence(retailer.get_price(product, 'S11AA'))
+        assert (tyre.wet_grip, tyre.fuel_efficiency, tyre.season, tyre.tyre_type) == (product.wet_grip, product.fuel_efficiency, product.season, 'Car')
+        assert (tyre.db_rating_number, tyre.db_rating_letter) == (product.db_rating_number, product.db_rating_letter)
+        assert (tyre.budget, tyre.electric) == (product.budget, product.electric)
+
+def test_dexel_spec_extracts_mock_page():
+    retailer = MockRetailer(products=12, page_size=10)
+    size: tuple[int, int, int] = (205, 55, 16)
+    products: list[MockProduct] = get_mock_products(retailer, size)
+    params: dict[str, str] = {'width': '205', 'profile': '55', 'size': '16', 'branch': 'Leeds', 'page': '1'}
+    page: str = retailer.render_dexel_results(params)
+    tyres = TyreBatch()
+
+    assert '£1,08' in page
+    assert DexelScraper.SPEC.extract(page, tyres, size) == 10
+
+    for product, tyre in zip(products[:10], tyres, strict=True):
+        assert (tyre.sku, tyre.brand, tyre.pattern, tyre.tyre_width, tyre.aspect_ratio, tyre.rim_diameter) == (product.sku, product.brand.title(), product.pattern, *size)
+        assert (tyre.load_index, tyre.speed_rating) == (product.load_index, product.speed_rating)
+        assert tyre.price_pence == Tyre.price_to_pence(retailer.get_price(product, 'Leeds'))
+        assert (tyre.wet_grip, tyre.fuel_efficiency, tyre.season, tyre.tyre_type) == (product.wet_grip, product.fuel_efficiency, product.season.capitalize(), 'Car')
+        assert tyre.db_rating_number == product.db_rating_number
+        assert tyre.electric == product.electric
+
+    # The second page only adds the products that weren't on the first
+    seen_skus: set[str] = set(tyres.sku)
+    DexelScraper.SPEC.extract(retailer.render_dexel_results({**params, 'page': '2'}), tyres, size, seen_skus)
+
+    assert list(tyres.sku) == [product.sku for product in products]
+    assert DexelScraper.get_pager(page, 'http://127.0.0.1/results') == (2, 'http://127.0.0.1/results?width=205&profile=55&size=16&branch=Leeds&page={page}')
+
+def test_to_price_handles_separators():
+    assert to_price('£1,085.50') == 1085.5
+    assert to_price('£1, 085.50') == 1085.5
+    assert to_price(' £ 89.99 ') == 89.99
@@ -0,0 +1,104 @@
+from bulk_loader import import_file
+from price_analytics import load_offers_from_db
+from product_matcher import get_product_key
+from tyre_batch import TyreBatch
+from tyre_db import TyreDB
+
+PRODUCT_KEY: str = get_product_key('Goodyear', 'EfficientGrip Performance 2', 205, 55, 16, 91, 'V')
+
+def make_batch(*offers: tuple[str, float]) -> TyreBatch:
+    """
+    Args:
+        offers (tuple[str, float]): The sku and price of each listing of the same Goodyear tyre.
+
+    Returns:
+        TyreBatch: The listings.
+    """
+    tyres = TyreBatch()
+
+    for sku, price in offers:
+        tyres.add(sku, 'Goodyear', 'EfficientGrip Performance 2', 205, 55, 16, 91, 'V', price, season='Summer', tyre_type='Car')
+
+    return tyres
+
+def write_run(db: TyreDB, batches: dict[str, TyreBatch]) -> None:
+    """
+    Args:
+        db (TyreDB): The database to write to.
+        batches (dict[str, TyreBatch]): The tyres each retailer listed this run.
+    """
+    db.start_run()
+
+    for retailer_name, tyres in batches.items():
+        db.add_tyres(db.get_or_create_retailer(retailer_name), tyres)
+
+    db.finish_run()
+
+def test_removed_offer_drops_out(tmp_path):
+    db_name: str = str(tmp_path / "tyres.db")
+
+    with TyreDB(db_name) as db:
+        write_run(db, {'cheap.co.uk': make_batch(('CHEAP1', 80.0), ('CHEAP2', 95.0)), 'dear.co.uk': make_batch(('DEAR1', 90.0))})
+
+        assert db.get_cheapest_offer(PRODUCT_KEY) == ('cheap.co.uk', 'CHEAP1', 8000)
+
+        # The cheapest listing has gone from the retailer's results, so finish_run() marks it as removed
+        write_run(db, {'cheap.co.uk': make_batch(('CHEAP2', 95.0)), 'dear.co.uk': make_batch(('DEAR1', 90.0))})
+
+        assert db.get_cheapest_offer(PRODUCT_KEY) == ('dear.co.uk', 'DEAR1', 9000)
+        assert [sku for _, sku, _ in db.get_offers_for_product(PRODUCT_KEY)] == ['DEAR1', 'CHEAP2']
+        assert db.get_best_price(205, 55, 16)[-1] == 9000
+
+    assert sorted(load_offers_from_db(db_name).price.tolist()) == [9000, 9500]
+
+def make_catalogue(db: TyreDB, tyre_count: int, pattern_count: int) -> None:
+    """
+    Fills the database with one retailer listing tyre_count tyres spread over pattern_count patterns of 20 brands.
+
+    Args:
+        db (TyreDB): The database to fill.
+        tyre_count (int): The number of tyres.
+        pattern_count (int): The number of patterns.
+    """
+    tyres = TyreBatch()
+
+    for index in range(tyre_count):
+        pattern: int = index % pattern_count
+        tyres.add(f"SKU{index}", f"Brand{pattern % 20}", f"Pattern {pattern}", 175 + 10 * (index % 9), 40 + 5 * (index % 8), 14 + index % 6,
+                  80 + index % 20, 'V', 50 + index % 200, season='Summer', tyre_type='Car')
+
+    db.add_tyres(db.get_or_create_retailer('example.co.uk'), tyres)
+    db.conn.commit()
+
+def test_search_offers_uses_pattern_index(tmp_path):
+    with TyreDB(str(tmp_path / "tyres.db")) as db:
+        make_catalogue(db, 90000, 2000)
+
+        db.cursor.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT t.sku FROM pattern_search s JOIN tyre t ON t.pattern_id = s.pattern_id
+            WHERE pattern_search MATCH ? AND t.active = 1
+        ''', ('brand1*',))
+        plan: list[str] = [row[-1] for row in db.cursor.fetchall()]
+
+        assert any('idx_tyre_pattern' in step for step in plan), plan
+        assert not any(step.startswith('SCAN t') for step in plan), plan
+
+        # Each query matches about 100 of the 2000 patterns
+        for text in ('brand1', 'brand1 pattern', 'pattern 1999'):
+            assert db.search_offers(text)
+
+def test_bulk_import_moves_data_generation(tmp_path):
+    csv_name: str = str(tmp_path / "tyre_scrape.csv")
+
+    with open(csv_name, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(TyreDB.IMPORT_COLUMNS) + '\n')
+        f.write('cheap.co.uk,CHEAP1,Goodyear,205,55,16,91,V,EfficientGrip Performance 2,80.0,B,Summer,C,70,B,False,False,Car\n')
+
+    with TyreDB(str(tmp_path / "tyres.db")) as db:
+        write_run(db, {'dear.co.uk': make_batch(('DEAR1', 90.0))})
+        generation: int = db.get_data_generation()
+
+        assert import_file(db, csv_name) == (1, 1)
+        assert db.get_data_generation() > generation
+        assert db.get_cheapest_offer(PRODUCT_KEY) == ('cheap.co.uk', 'CHEAP1', 8000)
@@ -0,0 +1,87 @@
+import json
+import struct
+from retailer import Retailer
+from tyre import Tyre
+from tyre_batch import TyreBatch
+from tyre_snapshot import MAGIC, VERSION, TyreSnapshot, write_snapshot
+
+def get_fields(tyre: Tyre) -> tuple:
+    """
+    Args:
+        tyre (Tyre): A tyre.
+
+    Returns:
+        tuple: The value of every attribute of the tyre.
+    """
+    return tuple(getattr(tyre, name) for name in Tyre.__slots__)
+
+def make_retailers() -> list[Retailer]:
+    """
+    Returns:
+        list[Retailer]: Two retailers sharing some brands and patterns, with missing values and a non-ASCII name.
+    """
+    national = TyreBatch()
+    national.add('N1', 'Goodyear', 'EfficientGrip Performance 2', 205, 55, 16, 91, 'V', 89.99, 'A', 'Summer', 'B', 70, 'B', False, False, 'Car')
+    national.add('N2', 'Michelin', 'Primacy 4+', 205, 55, 16, 94, 'W', 1234.5, season='All Season', electric=True, tyre_type='Car')
+    national.add('N3', 'Avon', None, 225, 45, 17, None, None, None)
+
+    dexel = TyreBatch()
+    dexel.add('D1', 'Goodyear', 'EfficientGrip Performance 2', 205, 55, 16, 91, 'V', 85.0, 'A', 'Summer', 'B', 70, 'B', False, False, 'Car')
+    dexel.add('D2', 'Nokian', 'Hakkapeliitta Ä', 225, 45, 17, 94, 'H', 120.0, season='Winter', budget=True)
+
+    return [Retailer('national.co.uk', national), Retailer('dexel.co.uk (Leeds)', dexel), Retailer('empty.co.uk', TyreBatch())]
+
+def test_snapshot_round_trip(tmp_path):
+    filename: str = str(tmp_path / 'run.tys')
+    retailers: list[Retailer] = make_retailers()
+
+    assert write_snapshot(filename, retailers) == 5
+
+    expected: list[tuple] = [get_fields(tyre) for retailer in retailers for tyre in retailer.tyres]
+
+    with TyreSnapshot(filename) as snapshot:
+        assert len(snapshot) == 5
+        assert [get_fields(snapshot.get_tyre(index)) for index in range(len(snapshot))] == expected
+        assert [snapshot.get_value('retailer', index) for index in range(len(snapshot))] == ['national.co.uk'] * 3 + ['dexel.co.uk (Leeds)'] * 2
+
+        assert snapshot.filter(tyre_width=205, aspect_ratio=55, rim_diameter=16) == [0, 1, 3]
+        assert snapshot.filter(brand='goodyear') == [0, 3]
+        assert snapshot.filter(rim_diameter=17, retailer='dexel.co.uk (Leeds)') == [4]
+        assert snapshot.filter(brand='Pirelli') == []
+        assert snapshot.filter(retailer='empty.co.uk') == []
+
+        regrouped: list[Retailer] = snapshot.get_retailers(snapshot.filter(brand='Goodyear'))
+        assert [(retailer.retailer, [tyre.sku for tyre in retailer.tyres]) for retailer in regrouped] == [('national.co.uk', ['N1']), ('dexel.co.uk (Leeds)', ['D1'])]
+
+def test_snapshot_layout(tmp_path):
+    filename: str = str(tmp_path / 'run.tys')
+    write_snapshot(filename, make_retailers())
+
+    with open(filename, 'rb') as f:
+        data: bytes = f.read()
+
+    version, header_length = struct.unpack_from('<II', data, len(MAGIC))
+    header: dict = json.loads(data[len(MAGIC) + 8:len(MAGIC) + 8 + header_length])
+    columns: dict[str, dict] = header['columns']
+
+    assert data.startswith(MAGIC) and version == VERSION == 2
+
+    # Every column is 8-byte aligned after the header, and the dictionaries are stored after all of the columns rather than in the header
+    column_offsets: list[int] = [info['offset'] for info in columns.values()]
+    dictionary_offsets: list[int] = [info['dictionary_offset'] for info in columns.values() if info['kind'] == 'string']
+
+    assert all(offset % 8 == 0 for offset in column_offsets + dictionary_offsets)
+    assert min(column_offsets) >= len(MAGIC) + 8 + header_length
+    assert min(dictionary_offsets) > max(column_offsets)
+    assert not any('dictionary' in info for info in columns.values())
+
+def test_empty_snapshot(tmp_path):
+    filename: str = str(tmp_path / 'empty.tys')
+
+    assert write_snapshot(filename, []) == 0
+
+    with TyreSnapshot(filename) as snapshot:
+        assert len(snapshot) == 0
+        assert snapshot.filter() == []
+        assert snapshot.filter(brand='Goodyear') == []
+        assert snapshot.get_retailers([]) == []
@@ -1,4 +1,11 @@
+import sys
+
 class Tyre:
+    __slots__ = (
+        'sku', 'brand', 'pattern', 'tyre_width', 'aspect_ratio', 'rim_diameter', 'price_pence', 'load_index', 'speed_rating',
+        'wet_grip', 'season', 'fuel_efficiency', 'db_rating_number', 'db_rating_letter', 'budget', 'electric', 'tyre_type'
+    )
+
     def __init__(self,
                  sku: str | None,
                  brand: str | None,
@@ -40,23 +47,46 @@ class Tyre:
             electric (bool | None): Whether the tyre was made for an electric car.
             tyre_type (str | None): The type of vehicle the tyre is for (e.g. Car).
         """
+        # The low cardinality strings are interned so thousands of tyres share a single copy of e.g. 'Goodyear'
         self.sku = sku
-        self.brand = brand
+        self.brand = Tyre.intern(brand)
         self.pattern = pattern
         self.tyre_width = tyre_width
         self.aspect_ratio = aspect_ratio
         self.rim_diameter = rim_diameter
-        self.price_pence = int(round(price * 100)) if price is not None else None # Rounds the float to avoid floating point errors then converts it into a whole number if the price isn't None
+        self.price_pence = Tyre.price_to_pence(price)
         self.load_index = load_index
-        self.speed_rating = speed_rating
-        self.wet_grip = wet_grip
-        self.season = season
-        self.fuel_efficiency = fuel_efficiency
+        self.speed_rating = Tyre.intern(speed_rating)
+        self.wet_grip = Tyre.intern(wet_grip)
+        self.season = Tyre.intern(season)
+        self.fuel_efficiency = Tyre.intern(fuel_efficiency)
         self.db_rating_number = db_rating_number
-        self.db_rating_letter = db_rating_letter
+        self.db_rating_letter = Tyre.intern(db_rating_letter)
         self.budget = budget
         self.electric = electric
-        self.tyre_type = tyre_type
+        self.tyre_type = Tyre.intern(tyre_type)
+
+    @staticmethod
+    def intern(value: str | None) -> str | None:
+        """
+        Args:
+            value (str | None): The string to intern.
+
+        Returns:
+            str | None: The shared interned copy of the string, or None if there was no string.
+        """
+        return sys.intern(str(value)) if value is not None else None
+
+    @staticmethod
+    def price_to_pence(price: float | None) -> int | None:
+        """
+        Args:
+            price (float | None): The price of one tyre in pounds.
+
+        Returns:
+            int | None: The price in pence, or None if there was no price.
+        """
+        return int(round(price * 100)) if price is not None else None # Rounds the float to avoid floating point errors then converts it into a whole number if the price isn't None
 
     def __repr__(self) -> str:
         """
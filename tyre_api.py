@@ -0,0 +1,266 @@
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Queue
+from typing import Callable, Iterator
+from urllib.parse import parse_qs, urlparse
+from tyre_db import TyreDB
+
+OFFER_FIELDS: tuple[str, ...] = ('retailer', 'sku', 'brand', 'pattern', 'load_index', 'speed_rating', 'season', 'price')
+SEARCH_FIELDS: tuple[str, ...] = ('retailer', 'sku', 'brand', 'pattern', 'width', 'aspect_ratio', 'rim_diameter', 'price')
+BEST_PRICE_FIELDS: tuple[str, ...] = ('sku', 'retailer', 'brand', 'pattern', 'price')
+
+class ConnectionPool:
+    """A fixed size pool of read-only database connections shared by the request threads"""
+    def __init__(self, db_name: str, size: int) -> None:
+        """
+        Args:
+            db_name (str): The database file.
+            size (int): The number of connections to open.
+        """
+        self._connections: Queue[TyreDB] = Queue()
+
+        for _ in range(size):
+            self._connections.put(TyreDB(db_name, read_only=True))
+
+    @contextmanager
+    def connection(self) -> Iterator[TyreDB]:
+        """
+        Borrows a connection for the duration of a with block, waiting if they're all in use.
+
+        Returns:
+            Iterator[TyreDB]: The borrowed read-only database.
+        """
+        db: TyreDB = self._connections.get()
+
+        try:
+            yield db
+        finally:
+            self._connections.put(db)
+
+    def close(self) -> None:
+        """Closes every connection in the pool."""
+        while not self._connections.empty():
+            self._connections.get().conn.close()
+
+class ResponseCache:
+    """A least recently used cache of response bodies that's emptied whenever a new scrape has been committed"""
+    def __init__(self, max_entries: int) -> None:
+        """
+        Args:
+            max_entries (int): The number of responses kept before the least recently used is dropped.
+        """
+        self.max_entries: int = max_entries
+        self.generation: int | None = None
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, generation: int) -> bytes | None:
+        """
+        Args:
+            key (str): The request path and query string.
+            generation (int): The current data generation from TyreDB.get_data_generation().
+
+        Returns:
+            bytes | None: The cached response body, or None if it isn't cached for this generation.
+        """
+        with self._lock:
+            if generation != self.generation:
+                self._entries.clear()
+                self.generation = generation
+
+            body: bytes | None = self._entries.get(key)
+
+            if body is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            return body
+
+    def put(self, key: str, generation: int, body: bytes) -> None:
+        """
+        Args:
+            key (str): The request path and query string.
+            generation (int): The data generation the response was built from.
+            body (bytes): The response body.
+        """
+        with self._lock:
+            if generation != self.generation:
+                return # A newer scrape was committed while the response was being built
+
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class TyreAPI:
+    """The query endpoints, each one takes the query string parameters and returns something that can be turned into JSON"""
+    def __init__(self, pool: ConnectionPool, cache: ResponseCache) -> None:
+        self.pool = pool
+        self.cache = cache
+        self.routes: dict[str, Callable[[TyreDB, dict[str, str]], object]] = {
+            '/offers': TyreAPI.get_offers,
+            '/best-price': TyreAPI.get_best_price,
+            '/search': TyreAPI.search,
+            '/brands': TyreAPI.search_brands,
+        }
+
+    @staticmethod
+    def get_size(params: dict[str, str]) -> tuple[int, int, int]:
+        """
+        Args:
+            params (dict[str, str]): The query string parameters.
+
+        Returns:
+            tuple[int, int, int]: The width, aspect_ratio and rim_diameter parameters.
+
+        Raises:
+            ValueError: A size parameter is missing or isn't a number.
+        """
+        try:
+            return int(params['width']), int(params['aspect_ratio']), int(params['rim_diameter'])
+        except (KeyError, ValueError):
+            raise ValueError("width, aspect_ratio and rim_diameter must be given as whole numbers")
+
+    @staticmethod
+    def get_limit(params: dict[str, str], default: int) -> int:
+        """
+        Args:
+            params (dict[str, str]): The query string parameters.
+            default (int): The limit used if the parameter isn't given.
+
+        Returns:
+            int: The limit parameter, capped between 1 and 1000.
+
+        Raises:
+            ValueError: The limit parameter isn't a number.
+        """
+        try:
+            return max(1, min(int(params.get('limit', default)), 1000))
+        except ValueError:
+            raise ValueError("limit must be a whole number")
+
+    @staticmethod
+    def get_offers(db: TyreDB, params: dict[str, str]) -> list[dict]:
+        offers: list[tuple] = db.get_offers_by_size(*TyreAPI.get_size(params), limit=TyreAPI.get_limit(params, 100))
+        return [dict(zip(OFFER_FIELDS, offer)) for offer in offers]
+
+    @staticmethod
+    def get_best_price(db: TyreDB, params: dict[str, str]) -> dict | None:
+        best_price: tuple | None = db.get_best_price(*TyreAPI.get_size(params), season_name=params.get('season'))
+        return dict(zip(BEST_PRICE_FIELDS, best_price)) if best_price else None
+
+    @staticmethod
+    def search(db: TyreDB, params: dict[str, str]) -> list[dict]:
+        offers: list[tuple] = db.search_offers(params.get('q', ''), limit=TyreAPI.get_limit(params, 50))
+        return [dict(zip(SEARCH_FIELDS, offer)) for offer in offers]
+
+    @staticmethod
+    def search_brands(db: TyreDB, params: dict[str, str]) -> list[dict]:
+        brands: list[tuple] = db.search_brands(params.get('q', ''), limit=TyreAPI.get_limit(params, 20))
+        return [{'brand_id': brand_id, 'brand': brand_name} for brand_id, brand_name in brands]
+
+    def handle(self, path: str) -> tuple[int, bytes]:
+        """
+        Answers a request from the cache, or from the database if it isn't cached.
+
+        Args:
+            path (str): The request path including the query string (e.g. /best-price?width=205&aspect_ratio=55&rim_diameter=16).
+
+        Returns:
+            tuple[int, bytes]: The HTTP status code and the JSON response body.
+        """
+        url = urlparse(path)
+
+        if url.path == '/health':
+            return 200, json.dumps({'status': 'ok', 'cache_hits': self.cache.hits, 'cache_misses': self.cache.misses}).encode('utf-8')
+
+        route: Callable | None = self.routes.get(url.path)
+
+        if route is None:
+            return 404, json.dumps({'error': f"Unknown endpoint '{url.path}'"}).encode('utf-8')
+
+        params: dict[str, str] = {name: values[0] for name, values in parse_qs(url.query).items()}
+
+        with self.pool.connection() as db:
+            generation: int = db.get_data_generation()
+            body: bytes | None = self.cache.get(path, generation)
+
+            if body is not None:
+                return 200, body
+
+            try:
+                body = json.dumps(route(db, params)).encode('utf-8')
+            except ValueError as e:
+                return 400, json.dumps({'error': str(e)}).encode('utf-8')
+
+        self.cache.put(path, generation, body)
+
+        return 200, body
+
+def create_server(host: str, port: int, db_name: str, pool_size: int = 4, cache_size: int = 1024) -> ThreadingHTTPServer:
+    """
+    Creates the read-only query server, call serve_forever() on it to start handling requests.
+
+    Args:
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 picks a free port.
+        db_name (str): The database file to read.
+        pool_size (int): The number of read-only connections.
+        cache_size (int): The number of responses cached.
+
+    Returns:
+        ThreadingHTTPServer: The server.
+    """
+    api = TyreAPI(ConnectionPool(db_name, pool_size), ResponseCache(cache_size))
+
+    class RequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            status, body = api.handle(self.path)
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            pass # Logging every request would slow the server down under load
+
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.api = api
+
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serves read-only JSON queries over the tyre database.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--db', default=TyreDB.get_db_name(), help="The database to serve.")
+    parser.add_argument('--pool-size', type=int, default=4, help="The number of read-only database connections.")
+    parser.add_argument('--cache-size', type=int, default=1024, help="The number of responses to cache.")
+    args = parser.parse_args()
+
+    server: ThreadingHTTPServer = create_server(args.host, args.port, args.db, args.pool_size, args.cache_size)
+
+    print(f"Serving '{args.db}' on http://{args.host}:{server.server_address[1]} (endpoints: /offers, /best-price, /search, /brands, /health)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.api.pool.close()
+
+if __name__ == "__main__":
+    main()
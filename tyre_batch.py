@@ -0,0 +1,283 @@
+from array import array
+from typing import Iterable, Iterator
+from tyre import Tyre
+
+# Sentinel stored in the numeric arrays when a value is None
+NULL: int = -1
+
+class StringColumn:
+    """A dictionary encoded column of strings, each row is stored as an index into a list of distinct values"""
+    def __init__(self) -> None:
+        self.values: list[str | None] = []
+        self.codes: array = array('I')
+        self._lookup: dict[str | None, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> str | None:
+        return self.values[self.codes[index]]
+
+    def __iter__(self) -> Iterator[str | None]:
+        values: list[str | None] = self.values
+        return (values[code] for code in self.codes)
+
+    def append(self, value: str | None) -> None:
+        """
+        Args:
+            value (str | None): The string to add as a new row.
+        """
+        code: int | None = self._lookup.get(value)
+
+        if code is None:
+            code = len(self.values)
+            self.values.append(Tyre.intern(value))
+            self._lookup[value] = code
+
+        self.codes.append(code)
+
+class NumberColumn:
+    """A column of whole numbers stored in a typed array, None is stored as the NULL sentinel"""
+    def __init__(self, typecode: str) -> None:
+        self.data: array = array(typecode)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index: int) -> int | None:
+        value: int = self.data[index]
+        return None if value == NULL else value
+
+    def __iter__(self) -> Iterator[int | None]:
+        return (None if value == NULL else value for value in self.data)
+
+    def append(self, value: int | None) -> None:
+        """
+        Args:
+            value (int | None): The number to add as a new row.
+        """
+        self.data.append(NULL if value is None else int(value))
+
+class BoolColumn(NumberColumn):
+    """A column of optional booleans stored as -1 (None), 0 (False) or 1 (True)"""
+    def __init__(self) -> None:
+        super().__init__('b')
+
+    def __getitem__(self, index: int) -> bool | None:
+        value: int = self.data[index]
+        return None if value == NULL else bool(value)
+
+    def __iter__(self) -> Iterator[bool | None]:
+        return (None if value == NULL else bool(value) for value in self.data)
+
+class TyreBatch:
+    """A columnar container of tyres, each attribute is stored in its own compact array"""
+
+    # The attributes in the same order as Tyre.get_tyre_attribute_names(), price is stored in pence
+    ATTRIBUTE_NAMES: tuple[str, ...] = (
+        'sku', 'brand', 'tyre_width', 'aspect_ratio', 'rim_diameter', 'load_index', 'speed_rating', 'pattern', 'price_pence',
+        'wet_grip', 'season', 'fuel_efficiency', 'db_rating_number', 'db_rating_letter', 'budget', 'electric', 'tyre_type'
+    )
+
+    def __init__(self) -> None:
+        self.sku: list[str | None] = [] # SKUs are unique per tyre so there is nothing to gain from encoding them
+        self.brand = StringColumn()
+        self.tyre_width = NumberColumn('h')
+        self.aspect_ratio = NumberColumn('h')
+        self.rim_diameter = NumberColumn('h')
+        self.load_index = NumberColumn('h')
+        self.speed_rating = StringColumn()
+        self.pattern = StringColumn()
+        self.price_pence = NumberColumn('q')
+        self.wet_grip = StringColumn()
+        self.season = StringColumn()
+        self.fuel_efficiency = StringColumn()
+        self.db_rating_number = NumberColumn('h')
+        self.db_rating_letter = StringColumn()
+        self.budget = BoolColumn()
+        self.electric = BoolColumn()
+        self.tyre_type = StringColumn()
+
+    @classmethod
+    def from_tyres(cls, tyres: Iterable[Tyre]) -> "TyreBatch":
+        """
+        Args:
+            tyres (Iterable[Tyre]): The tyres to store in the batch.
+
+        Returns:
+            TyreBatch: A new batch holding all the tyres.
+        """
+        batch = cls()
+        batch.extend(tyres)
+
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.sku)
+
+    def __iter__(self) -> Iterator[Tyre]:
+        return (self[index] for index in range(len(self)))
+
+    def __getitem__(self, index: int) -> Tyre:
+        """
+        Args:
+            index (int): The row of the tyre.
+
+        Returns:
+            Tyre: A Tyre object built from the row.
+        """
+        return Tyre(
+            sku=self.sku[index],
+            brand=self.brand[index],
+            pattern=self.pattern[index],
+            tyre_width=self.tyre_width[index],
+            aspect_ratio=self.aspect_ratio[index],
+            rim_diameter=self.rim_diameter[index],
+            load_index=self.load_index[index],
+            speed_rating=self.speed_rating[index],
+            price=self.get_price(index),
+            wet_grip=self.wet_grip[index],
+            season=self.season[index],
+            fuel_efficiency=self.fuel_efficiency[index],
+            db_rating_number=self.db_rating_number[index],
+            db_rating_letter=self.db_rating_letter[index],
+            budget=self.budget[index],
+            electric=self.electric[index],
+            tyre_type=self.tyre_type[index]
+        )
+
+    def __str__(self) -> str:
+        """
+        A string representation of every tyre in the batch ready to be written to a CSV file.
+
+        Returns:
+            str: One line per tyre, each line formatted the same as Tyre.__str__().
+        """
+        return "\n".join(self.get_csv_lines())
+
+    @staticmethod
+    def get_tyre_attribute_names() -> str:
+        """
+        Returns:
+            str: The header names separated by commas, the same as Tyre.get_tyre_attribute_names().
+        """
+        return Tyre.get_tyre_attribute_names()
+
+    def add(self,
+            sku: str | None,
+            brand: str | None,
+            pattern: str | None,
+            tyre_width: int | None,
+            aspect_ratio: int | None,
+            rim_diameter: int | None,
+            load_index: int | None,
+            speed_rating: str | None,
+            price: float | None,
+            wet_grip: str | None = None,
+            season: str | None = None,
+            fuel_efficiency: str | None = None,
+            db_rating_number: int | None = None,
+            db_rating_letter: str | None = None,
+            budget: bool | None = None,
+            electric: bool | None = None,
+            tyre_type: str | None = None
+    ) -> None:
+        """
+        Adds a tyre to the batch without creating a Tyre object, the arguments are the same as Tyre.
+        """
+        self.sku.append(sku)
+        self.brand.append(brand)
+        self.pattern.append(pattern)
+        self.tyre_width.append(tyre_width)
+        self.aspect_ratio.append(aspect_ratio)
+        self.rim_diameter.append(rim_diameter)
+        self.load_index.append(load_index)
+        self.speed_rating.append(speed_rating)
+        self.price_pence.append(Tyre.price_to_pence(price))
+        self.wet_grip.append(wet_grip)
+        self.season.append(season)
+        self.fuel_efficiency.append(fuel_efficiency)
+        self.db_rating_number.append(db_rating_number)
+        self.db_rating_letter.append(db_rating_letter)
+        self.budget.append(budget)
+        self.electric.append(electric)
+        self.tyre_type.append(tyre_type)
+
+    def append(self, tyre: Tyre) -> None:
+        """
+        Args:
+            tyre (Tyre): The tyre to add to the batch.
+        """
+        self.add(
+            sku=tyre.sku,
+            brand=tyre.brand,
+            pattern=tyre.pattern,
+            tyre_width=tyre.tyre_width,
+            aspect_ratio=tyre.aspect_ratio,
+            rim_diameter=tyre.rim_diameter,
+            load_index=tyre.load_index,
+            speed_rating=tyre.speed_rating,
+            price=tyre.get_price(),
+            wet_grip=tyre.wet_grip,
+            season=tyre.season,
+            fuel_efficiency=tyre.fuel_efficiency,
+            db_rating_number=tyre.db_rating_number,
+            db_rating_letter=tyre.db_rating_letter,
+            budget=tyre.budget,
+            electric=tyre.electric,
+            tyre_type=tyre.tyre_type
+        )
+
+    def extend(self, tyres: Iterable[Tyre]) -> None:
+        """
+        Args:
+            tyres (Iterable[Tyre]): The tyres to add to the batch.
+        """
+        for tyre in tyres:
+            self.append(tyre)
+
+    def get_price(self, index: int) -> float | None:
+        """
+        Args:
+            index (int): The row of the tyre.
+
+        Returns:
+            float | None: The price of the tyre.
+        """
+        price_pence: int | None = self.price_pence[index]
+        return price_pence / 100 if price_pence is not None else None
+
+    def get_column(self, name: str) -> list:
+        """
+        Args:
+            name (str): One of the names in ATTRIBUTE_NAMES.
+
+        Returns:
+            list: Every value of the column with None in place of missing values.
+        """
+        return list(getattr(self, name))
+
+    def get_records(self) -> Iterator[tuple]:
+        """
+        Returns:
+            Iterator[tuple]: One tuple per tyre, the values are in the order of ATTRIBUTE_NAMES.
+        """
+        return zip(*(getattr(self, name) for name in TyreBatch.ATTRIBUTE_NAMES))
+
+    def get_csv_rows(self) -> Iterator[tuple]:
+        """
+        Returns:
+            Iterator[tuple]: One tuple per tyre in the order of get_tyre_attribute_names(), with the price in pounds.
+        """
+        price_index: int = TyreBatch.ATTRIBUTE_NAMES.index('price_pence')
+
+        for record in self.get_records():
+            price_pence: int | None = record[price_index]
+            yield record[:price_index] + (price_pence / 100 if price_pence is not None else None,) + record[price_index + 1:]
+
+    def get_csv_lines(self) -> Iterator[str]:
+        """
+        Returns:
+            Iterator[str]: One line per tyre, the same as calling str() on each Tyre.
+        """
+        return (",".join(str(value) for value in row) for row in self.get_csv_rows())
@@ -1,13 +1,39 @@
+import json
+import re
 import sqlite3
 from sqlite3 import Connection, Cursor
+from typing import Callable, Iterable, Sequence
+from product_matcher import get_product_key, get_product_keys
 from tyre import Tyre
+from tyre_batch import TyreBatch
 
 class TyreDB:
     """Database handler for tyre scraping"""
-    def __init__(self):
-        """Initialize database connection and create the tables."""
-        self.conn: Connection = sqlite3.connect(TyreDB.get_db_name())
-        self.cursor: Cursor = self.conn.cursor()
+    def __init__(self, db_name: str | None = None, read_only: bool = False):
+        """
+        Initialize database connection and create the tables.
+
+        Args:
+            db_name (str | None): The database file, defaults to get_db_name().
+            read_only (bool): Open a read-only connection that can be shared between threads, the schema isn't created.
+        """
+        self.db_name: str = db_name or TyreDB.get_db_name()
+        self.read_only: bool = read_only
+        self.run_id: int | None = None # Set by start_run() while a scrape run is being written
+        self._run_scope: set[tuple[int, int, int, int]] = set() # The (retailer_id, width, aspect ratio, rim diameter) written this run
+        self._import_sizes: set[tuple[int, int, int]] = set() # The sizes written by import_csv_rows() since finish_import()
+
+        if read_only:
+            self.conn: Connection = sqlite3.connect(f"file:{self.db_name}?mode=ro", uri=True, check_same_thread=False)
+            self.cursor: Cursor = self.conn.cursor()
+            return
+
+        self.conn = sqlite3.connect(self.db_name)
+        self.cursor = self.conn.cursor()
+
+        # WAL lets readers (e.g. the API server) keep reading while a scrape is being written
+        self.cursor.execute("PRAGMA journal_mode=WAL")
+
         self._create_tables()
 
     @staticmethod
@@ -20,7 +46,9 @@ class TyreDB:
 
     def __exit__(self, exception_type, exception_val, exception_tb) -> bool:
         """Context manager exit point - ensures connection is closed"""
-        if exception_type is not None:
+        if self.read_only:
+            pass
+        elif exception_type is not None:
             # If an exception occurred, rollback any uncommitted changes
             self.conn.rollback()
         else:
@@ -93,6 +121,9 @@ class TyreDB:
                     budget INTEGER,
                     electric INTEGER,
                     vehicle_tyre_type_id INTEGER,
+                    product_key TEXT,
+                    last_seen_run_id INTEGER,
+                    active INTEGER NOT NULL DEFAULT 1,
                     PRIMARY KEY (sku, retailer_id),
                     FOREIGN KEY (retailer_id) REFERENCES retailer(retailer_id),
                     FOREIGN KEY (pattern_id) REFERENCES pattern(pattern_id),
@@ -100,6 +131,172 @@ class TyreDB:
                 )
             ''')
 
+            # Databases created before product matching existed need the column adding and filling in
+            if self._add_column_if_missing('tyre', 'product_key', 'TEXT'):
+                self._backfill_product_keys()
+
+            # Tracks which run last saw each tyre so tyres that disappear can be reported as removed
+            self._add_column_if_missing('tyre', 'last_seen_run_id', 'INTEGER')
+            self._add_column_if_missing('tyre', 'active', 'INTEGER NOT NULL DEFAULT 1')
+
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scrape_run (
+                    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at  TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TEXT
+                )
+            ''')
+
+            # The change feed, one row per new or removed tyre and per changed price or rating
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tyre_change (
+                    change_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                    run_id      INTEGER NOT NULL,
+                    retailer_id INTEGER NOT NULL,
+                    sku         TEXT NOT NULL,
+                    change_type TEXT NOT NULL,
+                    old_value,
+                    new_value,
+                    FOREIGN KEY (run_id) REFERENCES scrape_run(run_id),
+                    FOREIGN KEY (retailer_id) REFERENCES retailer(retailer_id)
+                )
+            ''')
+
+            self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tyre_change_run ON tyre_change(run_id)
+            ''')
+
+            # Links the same physical tyre across retailers
+            self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tyre_product_key ON tyre(product_key, price)
+            ''')
+
+            self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tyre_size ON tyre(width, aspect_ratio, rim_diameter, price)
+            ''')
+
+            # Finds the offers of the patterns matched by search_offers()
+            self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tyre_pattern ON tyre(pattern_id, active, price)
+            ''')
+
+            # The cheapest offer per size (season_id 0) and per size and season, kept up to date by add_tyres()
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS best_price (
+                    width         INTEGER NOT NULL,
+                    aspect_ratio  INTEGER NOT NULL,
+                    rim_diameter  INTEGER NOT NULL,
+                    season_id     INTEGER NOT NULL,
+                    sku           TEXT NOT NULL,
+                    retailer_id   INTEGER NOT NULL,
+                    retailer_name TEXT NOT NULL,
+                    brand_name    TEXT,
+                    pattern_name  TEXT,
+                    price         INTEGER NOT NULL,
+                    PRIMARY KEY (width, aspect_ratio, rim_diameter, season_id)
+                ) WITHOUT ROWID
+            ''')
+
+            # Fills the table in for databases created before it existed
+            self.cursor.execute("SELECT EXISTS (SELECT 1 FROM best_price), EXISTS (SELECT 1 FROM tyre)")
+            has_best_prices, has_tyres = self.cursor.fetchone()
+
+            if has_tyres and not has_best_prices:
+                self.cursor.execute("SELECT DISTINCT width, aspect_ratio, rim_diameter FROM tyre")
+                self.refresh_best_prices(self.cursor.fetchall())
+
+            # Full text indexes of the brand and pattern names, kept in sync by get_or_create_brand() and get_or_create_pattern()
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS brand_search USING fts5(
+                    brand_name, brand_id UNINDEXED, prefix='2 3 4'
+                )
+            ''')
+
+            self.cursor.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS pattern_search USING fts5(
+                    pattern_name, brand_name, pattern_id UNINDEXED, prefix='2 3 4'
+                )
+            ''')
+
+            # Fills the indexes in for databases created before they existed
+            self.cursor.execute('''
+                INSERT INTO brand_search (brand_name, brand_id)
+                SELECT brand_name, brand_id FROM brand WHERE NOT EXISTS (SELECT 1 FROM brand_search)
+            ''')
+
+            self.cursor.execute('''
+                INSERT INTO pattern_search (pattern_name, brand_name, pattern_id)
+                SELECT p.pattern_name, b.brand_name, p.pattern_id
+                FROM pattern p
+                LEFT JOIN brand b ON b.brand_id = p.brand_id
+                WHERE NOT EXISTS (SELECT 1 FROM pattern_search)
+            ''')
+
+            # How long each scrape job took and how many tyres it found, used to plan runs that have to finish by a deadline
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS job_history (
+                    run_id       INTEGER,
+                    domain       TEXT NOT NULL,
+                    location     TEXT NOT NULL DEFAULT '',
+                    width        INTEGER NOT NULL,
+                    aspect_ratio INTEGER NOT NULL,
+                    rim_diameter INTEGER NOT NULL,
+                    duration     REAL NOT NULL,
+                    result_count INTEGER NOT NULL,
+                    succeeded    INTEGER NOT NULL,
+                    recorded_at  TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (run_id) REFERENCES scrape_run(run_id)
+                )
+            ''')
+
+            # Each postcode/branch is a job of its own, databases created before that was tracked have their history kept under no location
+            self._add_column_if_missing('job_history', 'location', "TEXT NOT NULL DEFAULT ''")
+            self.cursor.execute("DROP INDEX IF EXISTS idx_job_history_job")
+            self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_job_history_location_job ON job_history(domain, location, width, aspect_ratio, rim_diameter, recorded_at)
+            ''')
+
+            # Which price zone each postcode/branch belongs to at a retailer, locations in the same zone share one scrape
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS location_zone (
+                    domain      TEXT NOT NULL,
+                    location    TEXT NOT NULL,
+                    zone        TEXT NOT NULL,
+                    resolved_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (domain, location)
+                ) WITHOUT ROWID
+            ''')
+
+            # Every new offer and every price change is recorded so price movements can be analysed over time
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS price_history (
+                    sku         TEXT NOT NULL,
+                    retailer_id INTEGER NOT NULL,
+                    price       INTEGER,
+                    recorded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (sku, retailer_id) REFERENCES tyre(sku, retailer_id)
+                )
+            ''')
+
+            self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_price_history_offer ON price_history(sku, retailer_id, recorded_at)
+            ''')
+
+            self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS tyre_price_inserted AFTER INSERT ON tyre
+                BEGIN
+                    INSERT INTO price_history (sku, retailer_id, price) VALUES (NEW.sku, NEW.retailer_id, NEW.price);
+                END
+            ''')
+
+            self.cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS tyre_price_updated AFTER UPDATE OF price ON tyre
+                WHEN OLD.price IS NOT NEW.price
+                BEGIN
+                    INSERT INTO price_history (sku, retailer_id, price) VALUES (NEW.sku, NEW.retailer_id, NEW.price);
+                END
+            ''')
+
             self.conn.commit()
         except Exception as e:
             print(f"There was a problem creating the database schema: {e}")
@@ -113,6 +310,42 @@ class TyreDB:
         # Create known vehicle tyre types
         self.get_or_create_vehicle_tyre_type("Car")
 
+    def _add_column_if_missing(self, table: str, column: str, definition: str) -> bool:
+        """
+        Adds a column to an existing table if the table was created before the column existed.
+
+        Args:
+            table (str): The name of the table.
+            column (str): The name of the column.
+            definition (str): The column type and constraints (e.g. TEXT).
+
+        Returns:
+            bool: True if the column had to be added.
+        """
+        self.cursor.execute(f"PRAGMA table_info({table})")
+
+        if any(row[1] == column for row in self.cursor.fetchall()):
+            return False
+
+        self.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+        return True
+
+    def _backfill_product_keys(self) -> None:
+        """Sets the product_key of every tyre that doesn't have one yet."""
+        self.cursor.execute('''
+            SELECT t.sku, t.retailer_id, b.brand_name, p.pattern_name, t.width, t.aspect_ratio, t.rim_diameter, t.load_index, t.speed_rating
+            FROM tyre t
+            LEFT JOIN pattern p ON p.pattern_id = t.pattern_id
+            LEFT JOIN brand b ON b.brand_id = p.brand_id
+            WHERE t.product_key IS NULL
+        ''')
+
+        self.cursor.executemany(
+            "UPDATE tyre SET product_key = ? WHERE sku = ? AND retailer_id = ?",
+            [(get_product_key(*row[2:]), row[0], row[1]) for row in self.cursor.fetchall()]
+        )
+
     def get_or_create_retailer(self, retailer_name: str) -> int:
         """
         Gets/creates the retailer_id for a retailer.
@@ -163,9 +396,15 @@ class TyreDB:
             "INSERT INTO brand (brand_name) VALUES (?)", (brand_name.title(),)
         )
 
+        brand_id: int = self.cursor.lastrowid
+
+        self.cursor.execute(
+            "INSERT INTO brand_search (brand_name, brand_id) VALUES (?, ?)", (brand_name.title(), brand_id)
+        )
+
         self.conn.commit()
 
-        return self.cursor.lastrowid
+        return brand_id
 
     def get_or_create_season(self, season_name: str | None) -> int:
         """
@@ -252,9 +491,16 @@ class TyreDB:
             "INSERT INTO pattern (pattern_name, brand_id, season_id) VALUES (?, ?, ?)", (pattern_checked, brand_id, season_id)
         )
 
+        pattern_id: int = self.cursor.lastrowid
+
+        self.cursor.execute(
+            "INSERT INTO pattern_search (pattern_name, brand_name, pattern_id) SELECT ?, brand_name, ? FROM brand WHERE brand_id = ?",
+            (pattern_checked, pattern_id, brand_id)
+        )
+
         self.conn.commit()
 
-        return self.cursor.lastrowid
+        return pattern_id
 
     def add_tyre(self, retailer_id: int, tyre: Tyre) -> None:
         """
@@ -265,17 +511,282 @@ class TyreDB:
             retailer_id (int): The ID of the retailer being added/changed.
             tyre (Tyre): The tyre to be added/changed.
         """
-        brand_id: int = self.get_or_create_brand(tyre.brand)
-        season_id: int = self.get_or_create_season(tyre.season)
-        pattern_id: int = self.get_or_create_pattern(tyre.pattern, brand_id, season_id)
-        vehicle_tyre_type_id: int = self.get_or_create_vehicle_tyre_type(tyre.tyre_type)
+        self.add_tyres(retailer_id, TyreBatch.from_tyres([tyre]))
+
+    def add_tyres(self, retailer_id: int, tyres: TyreBatch) -> None:
+        """
+        Adds a batch of tyres to the database for a specific retailer in a single statement.
+        If a tyre already exists at a certain retailer the tyres information gets updated with any changes.
+        The brand, season, pattern and vehicle tyre type ids are only looked up once per distinct value.
+        Each tyre's product key is stored with it so the same tyre can be found at other retailers.
+        The best prices of every size in the batch are refreshed afterwards.
+        While a run is in progress (see start_run()) any new tyres and price or rating changes are added to the change feed.
+
+        Args:
+            retailer_id (int): The ID of the retailer being added/changed.
+            tyres (TyreBatch): The tyres to be added/changed.
+        """
+        brand_ids: dict[str | None, int] = {}
+        season_ids: dict[str | None, int] = {}
+        pattern_ids: dict[tuple[str | None, int], int] = {}
+        vehicle_tyre_type_ids: dict[str | None, int] = {}
+        rows: list[tuple] = []
+        product_keys: list[str] = get_product_keys(tyres)
+
+        for product_key, (sku, brand, tyre_width, aspect_ratio, rim_diameter, load_index, speed_rating, pattern, price_pence, wet_grip,
+             season, fuel_efficiency, db_rating_number, db_rating_letter, budget, electric, tyre_type) in zip(product_keys, tyres.get_records()):
+            if brand not in brand_ids:
+                brand_ids[brand] = self.get_or_create_brand(brand)
+
+            if season not in season_ids:
+                season_ids[season] = self.get_or_create_season(season)
+
+            brand_id: int = brand_ids[brand]
+
+            if (pattern, brand_id) not in pattern_ids:
+                pattern_ids[(pattern, brand_id)] = self.get_or_create_pattern(pattern, brand_id, season_ids[season])
+
+            if tyre_type not in vehicle_tyre_type_ids:
+                vehicle_tyre_type_ids[tyre_type] = self.get_or_create_vehicle_tyre_type(tyre_type)
+
+            rows.append((
+                sku, retailer_id, tyre_width, aspect_ratio, rim_diameter, load_index, speed_rating, pattern_ids[(pattern, brand_id)], price_pence, wet_grip, fuel_efficiency,
+                db_rating_number, db_rating_letter, budget, electric, vehicle_tyre_type_ids[tyre_type], product_key, self.run_id
+            ))
+
+        if self.run_id is not None:
+            self._record_changes(retailer_id, rows)
+
+        self.cursor.executemany('''
+            INSERT INTO tyre (
+                sku, retailer_id, width, aspect_ratio, rim_diameter, load_index, speed_rating, pattern_id,
+                price, wet_grip, fuel_efficiency, db_rating_number, db_rating_letter,
+                budget, electric, vehicle_tyre_type_id, product_key, last_seen_run_id, active
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT(sku, retailer_id) DO UPDATE SET
+                width = excluded.width,
+                aspect_ratio = excluded.aspect_ratio,
+                rim_diameter = excluded.rim_diameter,
+                load_index = excluded.load_index,
+                speed_rating = excluded.speed_rating,
+                pattern_id = excluded.pattern_id,
+                price = excluded.price,
+                wet_grip = excluded.wet_grip,
+                fuel_efficiency = excluded.fuel_efficiency,
+                db_rating_number = excluded.db_rating_number,
+                db_rating_letter = excluded.db_rating_letter,
+                budget = excluded.budget,
+                electric = excluded.electric,
+                vehicle_tyre_type_id = excluded.vehicle_tyre_type_id,
+                product_key = excluded.product_key,
+                last_seen_run_id = COALESCE(excluded.last_seen_run_id, tyre.last_seen_run_id),
+                active = 1
+            ''', rows
+        )
+
+        self.refresh_best_prices({(row[2], row[3], row[4]) for row in rows})
+
+    # The columns compared between runs and their position in the rows built by add_tyres()
+    TRACKED_CHANGES: tuple[tuple[str, int], ...] = (
+        ('price', 8), ('wet_grip', 9), ('fuel_efficiency', 10), ('db_rating_number', 11), ('db_rating_letter', 12)
+    )
+
+    def _record_changes(self, retailer_id: int, rows: list[tuple]) -> None:
+        """
+        Compares the rows about to be written with what's already stored and adds the differences to the change feed.
+
+        Args:
+            retailer_id (int): The ID of the retailer being written.
+            rows (list[tuple]): The rows built by add_tyres(), before they're written.
+        """
+        existing: dict[str, tuple] = {}
+
+        for size in {(row[2], row[3], row[4]) for row in rows}:
+            self._run_scope.add((retailer_id, *size))
+            self.cursor.execute('''
+                SELECT sku, active, price, wet_grip, fuel_efficiency, db_rating_number, db_rating_letter
+                FROM tyre
+                WHERE retailer_id = ? AND width = ? AND aspect_ratio = ? AND rim_diameter = ?
+            ''', (retailer_id, *size))
+
+            existing.update((row[0], row[1:]) for row in self.cursor.fetchall())
+
+        changes: list[tuple] = []
+        seen: set[str] = set()
+
+        for row in rows:
+            sku: str = row[0]
+
+            if sku in seen:
+                continue
+
+            seen.add(sku)
+            previous: tuple | None = existing.get(sku)
+
+            # A tyre that was removed in an earlier run and has come back is reported as new again
+            if previous is None or not previous[0]:
+                changes.append((self.run_id, retailer_id, sku, 'new', None, row[8]))
+                continue
+
+            for (change_type, index), old_value in zip(TyreDB.TRACKED_CHANGES, previous[1:]):
+                if old_value != row[index]:
+                    changes.append((self.run_id, retailer_id, sku, change_type, old_value, row[index]))
+
+        self.cursor.executemany(
+            "INSERT INTO tyre_change (run_id, retailer_id, sku, change_type, old_value, new_value) VALUES (?, ?, ?, ?, ?, ?)", changes
+        )
+
+    # The columns of a tyre_scrape.csv file, see CsvSink
+    IMPORT_COLUMNS: tuple[str, ...] = ('retailer', *Tyre.get_tyre_attribute_names().split(','))
+
+    # How the raw CSV values of each name column are stored, the same as get_or_create_brand() etc. ('None' is a missing value)
+    IMPORT_NAMES: dict[str, Callable[[str | None], str | None]] = {
+        'brand': lambda value: value.title() if value else None,
+        'season': lambda value: value.title() if value else "None",
+        'pattern': lambda value: value.strip() if value else "Unknown",
+        'tyre_type': lambda value: value.title() if value else None,
+    }
+
+    def _create_import_tables(self) -> None:
+        """Creates the temporary staging tables used by import_csv_rows(), they only last as long as the connection."""
+        columns: str = ', '.join(f"{column} TEXT" for column in TyreDB.IMPORT_COLUMNS)
+
+        self.cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS import_tyre ({columns})")
+
+        # The stored name of each raw brand, season, pattern and vehicle tyre type value seen so far
+        self.cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS import_name (
+                kind  TEXT NOT NULL,
+                value TEXT NOT NULL,
+                name  TEXT,
+                PRIMARY KEY (kind, value)
+            ) WITHOUT ROWID
+        ''')
+
+        # The product key of each raw combination of the columns it's built from
+        self.cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS import_product (
+                brand        TEXT NOT NULL,
+                pattern      TEXT NOT NULL,
+                tyre_width   TEXT NOT NULL,
+                aspect_ratio TEXT NOT NULL,
+                rim_diameter TEXT NOT NULL,
+                load_index   TEXT NOT NULL,
+                speed_rating TEXT NOT NULL,
+                product_key  TEXT NOT NULL,
+                PRIMARY KEY (brand, pattern, tyre_width, aspect_ratio, rim_diameter, load_index, speed_rating)
+            ) WITHOUT ROWID
+        ''')
+
+    def import_csv_rows(self, rows: list[Sequence[str]], recorded_at: str | None = None) -> int:
+        """
+        Adds a chunk of tyre_scrape.csv rows to the database with set-based statements instead of building a TyreBatch.
+        The rows are copied into a staging table, any new retailers, brands, seasons, patterns and vehicle tyre types are created
+        with one statement each, then every tyre is upserted with a single INSERT ... SELECT that has the same effect as add_tyres().
+        Names and product keys are only worked out in Python once per distinct raw value for the life of the connection.
+        Rows without a sku, brand or size are skipped. Nothing is committed and the best prices aren't refreshed until finish_import().
+        Unlike add_tyres() nothing is added to the change feed, even while a run is in progress.
+
+        Args:
+            rows (list[Sequence[str]]): The rows as read from the CSV file, each with a value for every column in IMPORT_COLUMNS.
+            recorded_at (str | None): The UTC time (YYYY-MM-DD HH:MM:SS) the prices were scraped, stored in price_history instead of now.
+
+        Returns:
+            int: The number of rows that added a tyre or changed one.
+        """
+        self._create_import_tables()
+        self.cursor.execute("DELETE FROM import_tyre")
+        self.cursor.executemany(
+            f"INSERT INTO import_tyre VALUES ({', '.join('?' * len(TyreDB.IMPORT_COLUMNS))})", rows
+        )
+        self.cursor.execute('''
+            DELETE FROM import_tyre
+            WHERE sku = 'None' OR brand = 'None' OR tyre_width = 'None' OR aspect_ratio = 'None' OR rim_diameter = 'None'
+        ''')
+
+        self.cursor.execute(
+            " UNION ".join(f"SELECT '{kind}', {kind} FROM import_tyre" for kind in TyreDB.IMPORT_NAMES) +
+            " EXCEPT SELECT kind, value FROM import_name"
+        )
+        new_names: list[tuple[str, str, str | None]] = [
+            (kind, value, TyreDB.IMPORT_NAMES[kind](None if value == 'None' else value)) for kind, value in self.cursor.fetchall()
+        ]
+        self.cursor.executemany("INSERT INTO import_name (kind, value, name) VALUES (?, ?, ?)", new_names)
 
+        self.cursor.execute('''
+            SELECT brand, pattern, tyre_width, aspect_ratio, rim_diameter, load_index, speed_rating FROM import_tyre
+            EXCEPT
+            SELECT brand, pattern, tyre_width, aspect_ratio, rim_diameter, load_index, speed_rating FROM import_product
+        ''')
+        self.cursor.executemany(
+            "INSERT INTO import_product VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(*row, get_product_key(*(None if value == 'None' else value for value in row))) for row in self.cursor.fetchall()]
+        )
+
+        self.cursor.execute("SELECT (SELECT COALESCE(MAX(brand_id), 0) FROM brand), (SELECT COALESCE(MAX(pattern_id), 0) FROM pattern)")
+        last_brand_id, last_pattern_id = self.cursor.fetchone()
+
+        self.cursor.execute("INSERT OR IGNORE INTO retailer (retailer_name) SELECT DISTINCT retailer FROM import_tyre")
+
+        for table, kind in (('brand', 'brand'), ('season', 'season'), ('vehicle_tyre_type', 'tyre_type')):
+            self.cursor.execute(
+                f"INSERT OR IGNORE INTO {table} ({table}_name) SELECT name FROM import_name WHERE kind = ? AND name IS NOT NULL", (kind,)
+            )
+
+        self.cursor.execute("INSERT INTO brand_search (brand_name, brand_id) SELECT brand_name, brand_id FROM brand WHERE brand_id > ?", (last_brand_id,))
+
+        # Every pattern in the chunk already exists unless it has a name that hasn't been seen before
+        if any(kind == 'pattern' for kind, _, _ in new_names):
+            # Pattern names are unique across brands, so a pattern first seen under another brand is shared rather than added again.
+            # Like add_tyres() a pattern listed under more than one season keeps the season of the row it first appears in.
+            self.cursor.execute('''
+                INSERT OR IGNORE INTO pattern (pattern_name, brand_id, season_id)
+                SELECT pn.name, b.brand_id, s.season_id
+                FROM (SELECT brand, pattern, season, MIN(rowid) AS first_row FROM import_tyre GROUP BY brand, pattern, season) t
+                JOIN import_name pn ON pn.kind = 'pattern' AND pn.value = t.pattern
+                JOIN import_name bn ON bn.kind = 'brand' AND bn.value = t.brand
+                JOIN brand b ON b.brand_name = bn.name
+                JOIN import_name sn ON sn.kind = 'season' AND sn.value = t.season
+                JOIN season s ON s.season_name = sn.name
+                ORDER BY t.first_row
+            ''')
+
+            self.cursor.execute('''
+                INSERT INTO pattern_search (pattern_name, brand_name, pattern_id)
+                SELECT p.pattern_name, b.brand_name, p.pattern_id
+                FROM pattern p
+                LEFT JOIN brand b ON b.brand_id = p.brand_id
+                WHERE p.pattern_id > ?
+            ''', (last_pattern_id,))
+
+        self.cursor.execute("SELECT COALESCE(MAX(rowid), 0) FROM price_history")
+        last_price_history_id: int = self.cursor.fetchone()[0]
+
+        # Rows are sorted by the primary key so the index is written in order, a tyre listed more than once still ends up with its last values.
+        # Tyres that haven't changed since they were last loaded are left alone, so re-loading overlapping exports mostly skips the writes.
         self.cursor.execute('''
             INSERT INTO tyre (
                 sku, retailer_id, width, aspect_ratio, rim_diameter, load_index, speed_rating, pattern_id,
                 price, wet_grip, fuel_efficiency, db_rating_number, db_rating_letter,
-                budget, electric, vehicle_tyre_type_id
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                budget, electric, vehicle_tyre_type_id, product_key, last_seen_run_id, active
+            )
+            SELECT
+                t.sku, r.retailer_id, CAST(t.tyre_width AS INTEGER), CAST(t.aspect_ratio AS INTEGER), CAST(t.rim_diameter AS INTEGER),
+                CAST(NULLIF(t.load_index, 'None') AS INTEGER), NULLIF(t.speed_rating, 'None'), p.pattern_id,
+                CAST(ROUND(CAST(NULLIF(t.price, 'None') AS REAL) * 100) AS INTEGER), NULLIF(t.wet_grip, 'None'), NULLIF(t.fuel_efficiency, 'None'),
+                CAST(NULLIF(t.db_rating_number, 'None') AS INTEGER), NULLIF(t.db_rating_letter, 'None'),
+                CASE t.budget WHEN 'True' THEN 1 WHEN 'False' THEN 0 END, CASE t.electric WHEN 'True' THEN 1 WHEN 'False' THEN 0 END,
+                v.vehicle_tyre_type_id, k.product_key, :run_id, 1
+            FROM import_tyre t
+            JOIN retailer r ON r.retailer_name = t.retailer
+            JOIN import_name pn ON pn.kind = 'pattern' AND pn.value = t.pattern
+            JOIN pattern p ON p.pattern_name = pn.name
+            JOIN import_product k ON k.brand = t.brand AND k.pattern = t.pattern AND k.tyre_width = t.tyre_width
+                AND k.aspect_ratio = t.aspect_ratio AND k.rim_diameter = t.rim_diameter AND k.load_index = t.load_index AND k.speed_rating = t.speed_rating
+            LEFT JOIN import_name vn ON vn.kind = 'tyre_type' AND vn.value = t.tyre_type
+            LEFT JOIN vehicle_tyre_type v ON v.vehicle_tyre_type_name = vn.name
+            WHERE true
+            ORDER BY t.sku, t.retailer, t.rowid
             ON CONFLICT(sku, retailer_id) DO UPDATE SET
                 width = excluded.width,
                 aspect_ratio = excluded.aspect_ratio,
@@ -290,9 +801,408 @@ class TyreDB:
                 db_rating_letter = excluded.db_rating_letter,
                 budget = excluded.budget,
                 electric = excluded.electric,
-                vehicle_tyre_type_id = excluded.vehicle_tyre_type_id
-            ''', (
-                tyre.sku, retailer_id, tyre.tyre_width, tyre.aspect_ratio, tyre.rim_diameter, tyre.load_index, tyre.speed_rating, pattern_id, tyre.price_pence, tyre.wet_grip, tyre.fuel_efficiency,
-                tyre.db_rating_number, tyre.db_rating_letter, tyre.budget, tyre.electric, vehicle_tyre_type_id
+                vehicle_tyre_type_id = excluded.vehicle_tyre_type_id,
+                product_key = excluded.product_key,
+                last_seen_run_id = COALESCE(excluded.last_seen_run_id, tyre.last_seen_run_id),
+                active = 1
+            WHERE (
+                tyre.width, tyre.aspect_ratio, tyre.rim_diameter, tyre.load_index, tyre.speed_rating, tyre.pattern_id, tyre.price,
+                tyre.wet_grip, tyre.fuel_efficiency, tyre.db_rating_number, tyre.db_rating_letter, tyre.budget, tyre.electric,
+                tyre.vehicle_tyre_type_id, tyre.product_key, tyre.last_seen_run_id, tyre.active
+            ) IS NOT (
+                excluded.width, excluded.aspect_ratio, excluded.rim_diameter, excluded.load_index, excluded.speed_rating, excluded.pattern_id, excluded.price,
+                excluded.wet_grip, excluded.fuel_efficiency, excluded.db_rating_number, excluded.db_rating_letter, excluded.budget, excluded.electric,
+                excluded.vehicle_tyre_type_id, excluded.product_key, COALESCE(excluded.last_seen_run_id, tyre.last_seen_run_id), 1
+            )
+        ''', {'run_id': self.run_id})
+
+        written: int = self.cursor.rowcount
+
+        # The triggers record prices at the current time, historical files are dated when they were scraped instead
+        if recorded_at is not None:
+            self.cursor.execute("UPDATE price_history SET recorded_at = ? WHERE rowid > ?", (recorded_at, last_price_history_id))
+
+        self.cursor.execute('''
+            SELECT DISTINCT CAST(tyre_width AS INTEGER), CAST(aspect_ratio AS INTEGER), CAST(rim_diameter AS INTEGER)
+            FROM import_tyre
+        ''')
+        self._import_sizes.update(self.cursor.fetchall())
+        self.cursor.execute("DELETE FROM import_tyre")
+
+        return written
+
+    def finish_import(self) -> None:
+        """
+        Refreshes the best prices of every size written by import_csv_rows() since the last call and commits.
+        Outside of a scrape run the import is recorded as a finished run in the same transaction, so get_data_generation() moves on
+        and anything cached against the old data (e.g. the API's responses) is dropped.
+        """
+        self.refresh_best_prices(self._import_sizes)
+        self._import_sizes.clear()
+
+        if self.run_id is None:
+            self.cursor.execute("INSERT INTO scrape_run (finished_at) VALUES (CURRENT_TIMESTAMP)")
+
+        self.conn.commit()
+
+    def start_run(self) -> int:
+        """
+        Starts a scrape run, tyres written until finish_run() is called are compared against the previous runs.
+
+        Returns:
+            int: The run_id of the new run.
+        """
+        self.cursor.execute("INSERT INTO scrape_run DEFAULT VALUES")
+        self.conn.commit()
+        self.run_id = self.cursor.lastrowid
+        self._run_scope.clear()
+
+        return self.run_id
+
+    def finish_run(self, changes_filename: str | None = None) -> dict[str, int]:
+        """
+        Finishes the current run.
+        Any tyre that was listed before for a retailer and size scraped this run, but not seen this run, is marked as removed.
+
+        Args:
+            changes_filename (str | None): If given, the run's changes are also written to this JSONL file.
+
+        Returns:
+            dict[str, int]: The number of changes of each change type.
+        """
+        if self.run_id is None:
+            return {}
+
+        removed_sizes: set[tuple[int, int, int]] = set()
+
+        for retailer_id, width, aspect_ratio, rim_diameter in self._run_scope:
+            self.cursor.execute('''
+                SELECT sku, price FROM tyre
+                WHERE retailer_id = ? AND width = ? AND aspect_ratio = ? AND rim_diameter = ?
+                AND active = 1 AND last_seen_run_id IS NOT ?
+            ''', (retailer_id, width, aspect_ratio, rim_diameter, self.run_id))
+
+            removed: list[tuple] = self.cursor.fetchall()
+
+            if not removed:
+                continue
+
+            self.cursor.executemany(
+                "INSERT INTO tyre_change (run_id, retailer_id, sku, change_type, old_value, new_value) VALUES (?, ?, ?, 'removed', ?, NULL)",
+                [(self.run_id, retailer_id, sku, price) for sku, price in removed]
+            )
+            self.cursor.executemany(
+                "UPDATE tyre SET active = 0 WHERE sku = ? AND retailer_id = ?", [(sku, retailer_id) for sku, _ in removed]
             )
-        )
\ No newline at end of file
+            removed_sizes.add((width, aspect_ratio, rim_diameter))
+
+        self.refresh_best_prices(removed_sizes)
+        self.cursor.execute("UPDATE scrape_run SET finished_at = CURRENT_TIMESTAMP WHERE run_id = ?", (self.run_id,))
+        self.conn.commit()
+
+        self.cursor.execute("SELECT change_type, COUNT(*) FROM tyre_change WHERE run_id = ? GROUP BY change_type", (self.run_id,))
+        change_counts: dict[str, int] = dict(self.cursor.fetchall())
+
+        if changes_filename:
+            self.write_changes_jsonl(self.run_id, changes_filename)
+
+        self.run_id = None
+        self._run_scope.clear()
+
+        return change_counts
+
+    def get_changes(self, run_id: int) -> list[dict]:
+        """
+        Args:
+            run_id (int): The run to get the changes of.
+
+        Returns:
+            list[dict]: Each change with its retailer name, sku, change type and the old and new values.
+        """
+        self.cursor.execute('''
+            SELECT c.run_id, r.retailer_name, c.sku, c.change_type, c.old_value, c.new_value
+            FROM tyre_change c
+            JOIN retailer r ON r.retailer_id = c.retailer_id
+            WHERE c.run_id = ?
+            ORDER BY c.change_id
+        ''', (run_id,))
+
+        columns: list[str] = [column[0] for column in self.cursor.description]
+
+        return [dict(zip(columns, row)) for row in self.cursor.fetchall()]
+
+    def write_changes_jsonl(self, run_id: int, filename: str) -> None:
+        """
+        Writes the changes of a run to a JSONL file, one change per line.
+
+        Args:
+            run_id (int): The run to write the changes of.
+            filename (str): The file to write to.
+        """
+        with open(filename, 'w', encoding='utf-8') as f:
+            for change in self.get_changes(run_id):
+                f.write(f"{json.dumps(change)}\n")
+
+    def get_data_generation(self) -> int:
+        """
+        Returns:
+            int: The run_id of the last finished scrape run, it increases each time a run is committed.
+        """
+        self.cursor.execute("SELECT COALESCE(MAX(run_id), 0) FROM scrape_run WHERE finished_at IS NOT NULL")
+
+        return self.cursor.fetchone()[0]
+
+    def get_offers_by_size(self, width: int, aspect_ratio: int, rim_diameter: int, limit: int = 100) -> list[tuple]:
+        """
+        Gets the current offers for a size.
+
+        Args:
+            width (int): The width of the tyre (e.g. 205).
+            aspect_ratio (int): The aspect ratio of the tyre (e.g. 55).
+            rim_diameter (int): The diameter of the tyre in inches (e.g. 16).
+            limit (int): The maximum number of offers returned.
+
+        Returns:
+            list[tuple]: (retailer_name, sku, brand_name, pattern_name, load_index, speed_rating, season_name, price in pence)
+                of each offer, cheapest first.
+        """
+        self.cursor.execute('''
+            SELECT r.retailer_name, t.sku, b.brand_name, p.pattern_name, t.load_index, t.speed_rating, s.season_name, t.price
+            FROM tyre t
+            JOIN retailer r ON r.retailer_id = t.retailer_id
+            LEFT JOIN pattern p ON p.pattern_id = t.pattern_id
+            LEFT JOIN brand b ON b.brand_id = p.brand_id
+            LEFT JOIN season s ON s.season_id = p.season_id
+            WHERE t.width = ? AND t.aspect_ratio = ? AND t.rim_diameter = ? AND t.active = 1
+            ORDER BY t.price IS NULL, t.price
+            LIMIT ?
+        ''', (width, aspect_ratio, rim_diameter, limit))
+
+        return self.cursor.fetchall()
+
+    def get_offers_for_product(self, product_key: str) -> list[tuple]:
+        """
+        Gets every retailer's current offer for the same physical tyre using the product key index, tyres removed by finish_run() are left out.
+
+        Args:
+            product_key (str): A key created by product_matcher.get_product_key().
+
+        Returns:
+            list[tuple]: (retailer_name, sku, price in pence) for each offer, cheapest first.
+        """
+        self.cursor.execute('''
+            SELECT r.retailer_name, t.sku, t.price
+            FROM tyre t
+            JOIN retailer r ON r.retailer_id = t.retailer_id
+            WHERE t.product_key = ? AND t.active = 1
+            ORDER BY t.price IS NULL, t.price
+        ''', (product_key,))
+
+        return self.cursor.fetchall()
+
+    def get_cheapest_offer(self, product_key: str) -> tuple | None:
+        """
+        Gets the cheapest current offer for the same physical tyre across every retailer, tyres removed by finish_run() are left out.
+
+        Args:
+            product_key (str): A key created by product_matcher.get_product_key().
+
+        Returns:
+            tuple | None: (retailer_name, sku, price in pence) of the cheapest offer, or None if no retailer has a price for it.
+        """
+        self.cursor.execute('''
+            SELECT r.retailer_name, t.sku, t.price
+            FROM tyre t
+            JOIN retailer r ON r.retailer_id = t.retailer_id
+            WHERE t.product_key = ? AND t.price IS NOT NULL AND t.active = 1
+            ORDER BY t.price
+            LIMIT 1
+        ''', (product_key,))
+
+        return self.cursor.fetchone()
+
+    def refresh_best_prices(self, sizes: Iterable[tuple[int, int, int]]) -> None:
+        """
+        Recalculates the best_price rows of only the sizes given, e.g. the sizes that were just written.
+
+        Args:
+            sizes (Iterable[tuple[int, int, int]]): The (width, aspect ratio, rim diameter) of each size to refresh.
+        """
+        for size in sizes:
+            self.cursor.execute(
+                "DELETE FROM best_price WHERE width = ? AND aspect_ratio = ? AND rim_diameter = ?", size
+            )
+
+            # SQLite takes the bare columns from the row that has the MIN() price, giving the cheapest offer of each group
+            self.cursor.execute('''
+                INSERT INTO best_price (
+                    width, aspect_ratio, rim_diameter, season_id, sku, retailer_id, retailer_name, brand_name, pattern_name, price
+                )
+                SELECT t.width, t.aspect_ratio, t.rim_diameter, 0, t.sku, t.retailer_id, r.retailer_name, b.brand_name, p.pattern_name, MIN(t.price)
+                FROM tyre t
+                JOIN retailer r ON r.retailer_id = t.retailer_id
+                LEFT JOIN pattern p ON p.pattern_id = t.pattern_id
+                LEFT JOIN brand b ON b.brand_id = p.brand_id
+                WHERE t.width = :width AND t.aspect_ratio = :aspect_ratio AND t.rim_diameter = :rim_diameter AND t.price IS NOT NULL AND t.active = 1
+                GROUP BY t.width, t.aspect_ratio, t.rim_diameter
+                UNION ALL
+                SELECT t.width, t.aspect_ratio, t.rim_diameter, p.season_id, t.sku, t.retailer_id, r.retailer_name, b.brand_name, p.pattern_name, MIN(t.price)
+                FROM tyre t
+                JOIN retailer r ON r.retailer_id = t.retailer_id
+                JOIN pattern p ON p.pattern_id = t.pattern_id
+                LEFT JOIN brand b ON b.brand_id = p.brand_id
+                WHERE t.width = :width AND t.aspect_ratio = :aspect_ratio AND t.rim_diameter = :rim_diameter AND t.price IS NOT NULL AND t.active = 1
+                GROUP BY t.width, t.aspect_ratio, t.rim_diameter, p.season_id
+            ''', {'width': size[0], 'aspect_ratio': size[1], 'rim_diameter': size[2]})
+
+    def get_best_price(self, width: int, aspect_ratio: int, rim_diameter: int, season_name: str | None = None) -> tuple | None:
+        """
+        Gets the cheapest offer for a size from the best_price table without joining any other tables.
+
+        Args:
+            width (int): The width of the tyre (e.g. 205).
+            aspect_ratio (int): The aspect ratio of the tyre (e.g. 55).
+            rim_diameter (int): The diameter of the tyre in inches (e.g. 16).
+            season_name (str | None): Only consider tyres for this season (e.g. Winter), None for every season.
+
+        Returns:
+            tuple | None: (sku, retailer_name, brand_name, pattern_name, price in pence), or None if the size has no priced offers.
+        """
+        self.cursor.execute('''
+            SELECT sku, retailer_name, brand_name, pattern_name, price
+            FROM best_price
+            WHERE width = ? AND aspect_ratio = ? AND rim_diameter = ?
+            AND season_id = COALESCE((SELECT season_id FROM season WHERE season_name = ?), CASE WHEN ? IS NULL THEN 0 END)
+        ''', (width, aspect_ratio, rim_diameter, season_name.title() if season_name else None, season_name))
+
+        return self.cursor.fetchone()
+
+    @staticmethod
+    def get_search_query(text: str) -> str:
+        """
+        Turns free text into an FTS5 query where every word must match the start of a word in the name.
+
+        Args:
+            text (str): The text being searched for (e.g. 'efficientgrip perf').
+
+        Returns:
+            str: The FTS5 query (e.g. '"efficientgrip"* "perf"*'), empty if the text has no words.
+        """
+        return " ".join(f'"{word}"*' for word in re.findall(r'\w+', text.lower()))
+
+    def search_brands(self, text: str, limit: int = 20) -> list[tuple]:
+        """
+        Searches the brand names by prefix.
+
+        Args:
+            text (str): The text being searched for (e.g. 'good').
+            limit (int): The maximum number of brands returned.
+
+        Returns:
+            list[tuple]: (brand_id, brand_name) of each matching brand, best match first.
+        """
+        query: str = TyreDB.get_search_query(text)
+
+        if not query:
+            return []
+
+        self.cursor.execute(
+            "SELECT brand_id, brand_name FROM brand_search WHERE brand_search MATCH ? ORDER BY rank LIMIT ?", (query, limit)
+        )
+
+        return self.cursor.fetchall()
+
+    def search_offers(self, text: str, limit: int = 50) -> list[tuple]:
+        """
+        Searches the brand and pattern names by prefix (e.g. 'EfficientGrip', '4Seas', 'goodyear vector')
+        and returns the current offers for the matching patterns.
+
+        Args:
+            text (str): The text being searched for.
+            limit (int): The maximum number of offers returned.
+
+        Returns:
+            list[tuple]: (retailer_name, sku, brand_name, pattern_name, width, aspect_ratio, rim_diameter, price in pence)
+                of each matching offer, cheapest first.
+        """
+        query: str = TyreDB.get_search_query(text)
+
+        if not query:
+            return []
+
+        self.cursor.execute('''
+            SELECT r.retailer_name, t.sku, s.brand_name, s.pattern_name, t.width, t.aspect_ratio, t.rim_diameter, t.price
+            FROM pattern_search s
+            JOIN tyre t ON t.pattern_id = s.pattern_id
+            JOIN retailer r ON r.retailer_id = t.retailer_id
+            WHERE pattern_search MATCH ? AND t.active = 1
+            ORDER BY t.price IS NULL, t.price
+            LIMIT ?
+        ''', (query, limit))
+
+        return self.cursor.fetchall()
+
+    def get_location_zones(self, max_age_days: int = 30) -> list[tuple]:
+        """
+        Args:
+            max_age_days (int): Zones resolved longer ago than this are left out so they get resolved again.
+
+        Returns:
+            list[tuple]: (domain, location, zone) of each location whose price zone is known.
+        """
+        self.cursor.execute('''
+            SELECT domain, location, zone FROM location_zone
+            WHERE resolved_at >= datetime('now', ?)
+        ''', (f"-{max_age_days} days",))
+
+        return self.cursor.fetchall()
+
+    def save_location_zones(self, zones: Iterable[tuple[str, str, str]]) -> None:
+        """
+        Args:
+            zones (Iterable[tuple[str, str, str]]): (domain, location, zone) of each location whose price zone was resolved.
+        """
+        self.cursor.executemany('''
+            INSERT INTO location_zone (domain, location, zone) VALUES (?, ?, ?)
+            ON CONFLICT (domain, location) DO UPDATE SET zone = excluded.zone, resolved_at = CURRENT_TIMESTAMP
+        ''', zones)
+
+        self.conn.commit()
+
+    def add_job_history(self, jobs: Iterable[tuple[str, str | None, int, int, int, float, int, bool]]) -> None:
+        """
+        Records how each scrape job went, against the current run if one has been started.
+
+        Args:
+            jobs (Iterable[tuple[str, str | None, int, int, int, float, int, bool]]): (domain, location, width, aspect_ratio, rim_diameter,
+                duration in seconds, result count, succeeded) of each job, the location is None for a website's default.
+        """
+        self.cursor.executemany('''
+            INSERT INTO job_history (run_id, domain, location, width, aspect_ratio, rim_diameter, duration, result_count, succeeded)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(self.run_id, job[0], job[1] or '', *job[2:7], int(job[7])) for job in jobs])
+
+        self.conn.commit()
+
+    def get_job_history_stats(self, max_jobs: int = 10) -> list[tuple]:
+        """
+        Args:
+            max_jobs (int): How many of the most recent attempts of each job are averaged, so old behaviour of the websites drops out.
+
+        Returns:
+            list[tuple]: (domain, location, width, aspect_ratio, rim_diameter, average duration, average result count of the successful attempts,
+                share of attempts that succeeded, when it last succeeded) of each job that has been run before, the location is '' for a website's default.
+        """
+        self.cursor.execute('''
+            SELECT domain, location, width, aspect_ratio, rim_diameter,
+                   AVG(duration), AVG(CASE WHEN succeeded THEN result_count END), AVG(succeeded),
+                   MAX(CASE WHEN succeeded THEN recorded_at END)
+            FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY domain, location, width, aspect_ratio, rim_diameter ORDER BY recorded_at DESC, rowid DESC) AS recent
+                FROM job_history
+            )
+            WHERE recent <= ?
+            GROUP BY domain, location, width, aspect_ratio, rim_diameter
+        ''', (max_jobs,))
+
+        return self.cursor.fetchall()
\ No newline at end of file
@@ -1,59 +1,100 @@
+import argparse
 import time
-import requests
-import utils
+from datetime import datetime
+from job_planner import JobPlan, plan_within_budget
+from location_planner import LocationZones, plan_jobs
 from retailer import Retailer
-from scrapers import BaseScraper, NationalScraper, DexelScraper
-from tyre import Tyre
+from scrape_scheduler import AdaptiveScheduler, DomainController
+from scrapers import BaseScraper
 from tyre_db import TyreDB
+from tyre_snapshot import get_snapshot_filename, write_snapshot
 
-def start_scrape(scrapers: list[BaseScraper]) -> tuple[float, int]:
+def start_scrape(scrapers: list[BaseScraper], compress_csv: bool = False, changes_filename: str | None = None, scheduler: AdaptiveScheduler | None = None, deadline: float | None = None) -> tuple[float, int]:
     """
-    Sequentially scrapes each scrapers website.
-    Writes the gathered data to a CSV file and a database.
+    Scrapes each scrapers website, running scrapes of different websites at the same time.
+    Each website's concurrency and pacing adapts to how it responds, backing off when it starts refusing scrapes.
+    Each completed scrape is appended to the CSV file straight away.
+    The data is written to a columnar snapshot and the database at the end.
 
     Args:
         scrapers (list[BaseScraper]): The scrapers that will be scraped.
+        compress_csv (bool): Whether to gzip the CSV file.
+        changes_filename (str | None): If given, the changes since the last run are also written to this JSONL file.
+        scheduler (AdaptiveScheduler | None): The scheduler to run the scrapes with, one with the default settings is used if not given.
+        deadline (float | None): The time.monotonic() time after which no more scrapes are started.
 
     Returns:
         float: The total time it took to scrap all the websites.
     """
-    total_time_scraping: float = 0
+    run_time: datetime = datetime.now()
+    start_time: float = time.time()
     total_results: int = 0
     retailers: list[Retailer] = []
+    scheduler = scheduler or AdaptiveScheduler()
 
-    for scrape_count, scraper in enumerate(scrapers, start=1):
-        print(f"Scraping {scraper.domain} for tyres with specs {scraper.get_basic_tyre_details()}.")
+    print(f"Running {len(scrapers)} scrape job{'s' if len(scrapers) != 1 else ''} across {len({scraper.domain for scraper in scrapers})} website(s).\n")
 
-        start_time = time.time()
+    written_jobs: set[tuple] = set()
+    job_history: list[tuple] = []
 
+    # The sink's temporary file only replaces the CSV file if everything gets written, it's deleted if anything goes wrong
+    with BaseScraper.open_csv_sink(compress_csv) as csv_sink:
         try:
-            scrape_data: list[Tyre] = scraper.scrape()
-            retailer = Retailer(scraper.domain, scrape_data) # Stores the scrape data and the website in a single object
-            current_scrape_total: int = len(scrape_data)
-            total_results += current_scrape_total
-            time_for_scrape: float = time.time() - start_time
-            total_time_scraping += round(time_for_scrape, 2)
+            for result in scheduler.run(scrapers, deadline):
+                scraper: BaseScraper = result.scraper
 
-            retailers.append(retailer) # Adds the retailer object to the existing list of retailers
+                # The time and results of each job that was actually fetched are kept for planning future runs
+                if result.attempts and not result.coalesced:
+                    job_history.append((scraper.domain, scraper.location, scraper.tyre_width, scraper.aspect_ratio, scraper.rim_diameter, result.duration,
+                                        len(result.tyres) if result.tyres is not None else 0, result.error is None))
 
-            print(f"Scraping completed in {time_for_scrape:.2f} {get_seconds_formatted_str(time_for_scrape)} and found {current_scrape_total} result{'s' if current_scrape_total != 1 else ''}.")
-        except requests.RequestException as e:
-            print(f"There was a problem accessing the {scraper.domain} website: {e}")
+                if result.error is not None:
+                    print(f"There was a problem accessing the {scraper.domain} website for tyres with specs {scraper.get_basic_tyre_details()}: {result.error}")
+                    continue
 
-        # Sleeps before starting the next scrape
-        if scrape_count < len(scrapers):
-            sleep_count: int = utils.random_number()
-            print(f"\nWaiting {sleep_count} seconds before the next scrape...\n")
-            time.sleep(sleep_count)
+                # Identical jobs share one fetch, the tyres only need writing once for each location
+                retailer_names: list[str] = [name for name in scraper.get_retailer_names() if (scraper.get_job_key(), name) not in written_jobs]
 
-    print(f"\nWriting CSV data to '{BaseScraper.get_csv_filename()}' and database data to '{TyreDB.get_db_name()}'...")
+                if not retailer_names:
+                    continue
 
-    # After all scraping has completed the data is saved to a CSV and the database
-    BaseScraper.write_to_csv_file(retailers)
+                written_jobs.update((scraper.get_job_key(), name) for name in retailer_names)
+
+                current_scrape_total: int = len(result.tyres)
+                total_results += current_scrape_total
+
+                # A scrape standing in for a price zone is stored under every location in the zone, so each one can be queried
+                for retailer_name in retailer_names:
+                    retailer = Retailer(retailer_name, result.tyres) # Stores the scrape data and the website in a single object
+                    retailers.append(retailer) # Adds the retailer object to the existing list of retailers
+                    csv_sink.write_retailer(retailer) # Appends the completed scrape to the CSV file
+
+                print(f"Scraping {scraper.get_retailer_name()} for tyres with specs {scraper.get_basic_tyre_details()} completed in {result.duration:.2f} {get_seconds_formatted_str(result.duration)} and found {current_scrape_total} result{'s' if current_scrape_total != 1 else ''}.")
+        finally:
+            for scraper_class in {type(scraper) for scraper in scrapers}:
+                scraper_class.close_sessions()
+
+        total_time_scraping: float = time.time() - start_time
+
+        print()
+
+        for controller in scheduler.controllers.values():
+            print(controller.get_summary())
+
+        print(f"\nWriting CSV data to '{csv_sink.filename}' and database data to '{TyreDB.get_db_name()}'...")
+
+    # After all scraping has completed the CSV file has replaced the previous one and the data is saved to the database
+    write_snapshot(get_snapshot_filename(run_time), retailers)
 
     # Use context manager to automatically close database connection
     with TyreDB() as db:
+        db.start_run()
+        db.add_job_history(job_history)
         write_scrapes_to_db(db, retailers)
+        change_counts: dict[str, int] = db.finish_run(changes_filename)
+
+    if change_counts:
+        print(f"Changes since the last run: {', '.join(f'{count} {change_type}' for change_type, count in sorted(change_counts.items()))}.")
 
     print("Complete.\n")
 
@@ -80,28 +121,50 @@ def write_scrapes_to_db(db: TyreDB, retailers: list[Retailer]) -> None:
         retailers (list[Retailer]): The retailer objects to write to the database.
     """
     for retailer in retailers:
-        tyres: list[Tyre] = retailer.tyres
         retailer_id: int = db.get_or_create_retailer(retailer.retailer)
-
-        for tyre in tyres:
-            db.add_tyre(retailer_id, tyre)
-
+        db.add_tyres(retailer_id, retailer.tyres)
         db.conn.commit()
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Scrapes tyre prices from each retailer.")
+    parser.add_argument('--postcode', action='append', default=[], help="A postcode to scrape National's prices for, can be given more than once.")
+    parser.add_argument('--branch', action='append', default=[], help="A branch to scrape Dexel's prices for, can be given more than once.")
+    parser.add_argument('--budget', type=float, help="The number of minutes the scrape has to finish in, the most useful jobs that fit are chosen from past runs.")
+    parser.add_argument('--changes', help="A JSONL file to write the tyres that are new, removed or changed in price or rating since the last run to.")
+    args = parser.parse_args()
+
     print("Welcome to the tyre scraper.")
     print("Scraping will now begin...\n")
 
-    scrapers: list[BaseScraper] = [
-        NationalScraper(205, 55, 16),
-        NationalScraper(225, 50, 16),
-        NationalScraper(185, 16, 14),
-        DexelScraper(205, 55, 16),
-        DexelScraper(225, 50, 16),
-        DexelScraper(185, 16, 14)
-    ]
+    start_time: float = time.monotonic()
+    sizes: list[tuple[int, int, int]] = [(205, 55, 16), (225, 50, 16), (185, 16, 14)]
+    scheduler = AdaptiveScheduler()
+
+    # Postcodes/branches that are charged the same prices share one scrape per size
+    with TyreDB() as db:
+        zones: LocationZones = LocationZones.load(db)
+        scrapers: list[BaseScraper] = plan_jobs(['national', 'dexel'], sizes, {'national': args.postcode, 'dexel': args.branch}, zones, scheduler)
+        zones.save(db)
+
+        deadline: float | None = None
+
+        # Chooses the jobs that fit in the time left from how long they've taken and how many tyres they've found before
+        if args.budget is not None:
+            budget: float = args.budget * 60 - (time.monotonic() - start_time)
+            # The scheduler ramps each website up from its current concurrency towards its maximum, so about halfway between is expected on average
+            concurrency: dict[str, float] = {}
+
+            for domain in {scraper.domain for scraper in scrapers}:
+                controller: DomainController = scheduler.get_controller(domain)
+                concurrency[domain] = (controller.concurrency + controller.settings.max_concurrency) / 2
+
+            plan: JobPlan = plan_within_budget(scrapers, budget, db.get_job_history_stats(), concurrency)
+            scrapers = plan.scrapers
+            deadline = start_time + args.budget * 60
+
+            print(plan.get_summary() + "\n")
 
-    total_time, total_items_scraped = start_scrape(scrapers)
+    total_time, total_items_scraped = start_scrape(scrapers, changes_filename=args.changes, scheduler=scheduler, deadline=deadline)
 
     total_time_scraping: float = round(total_time, 2)
 
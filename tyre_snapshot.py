@@ -0,0 +1,405 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+from typing import IO
+from retailer import Retailer
+from tyre import Tyre
+from tyre_batch import NULL, StringColumn, TyreBatch
+
+MAGIC: bytes = b"TYRESNAP"
+VERSION: int = 2
+# Snapshots written before the string dictionaries were moved out of the header can still be read
+READABLE_VERSIONS: tuple[int, ...] = (1, 2)
+ALIGNMENT: int = 8
+
+# Numeric columns are copied straight out of the TyreBatch arrays
+NUMBER_COLUMNS: tuple[str, ...] = ('tyre_width', 'aspect_ratio', 'rim_diameter', 'load_index', 'price_pence', 'db_rating_number', 'budget', 'electric')
+
+# String columns are dictionary encoded, each row holds a uint32 index into the column's dictionary.
+# Each dictionary is stored after the columns as int64 offsets followed by the UTF-8 strings, so the header doesn't grow with the rows.
+STRING_COLUMNS: tuple[str, ...] = ('retailer', 'sku', 'brand', 'pattern', 'speed_rating', 'wet_grip', 'season', 'fuel_efficiency', 'db_rating_letter', 'tyre_type')
+
+def get_snapshot_filename(run_time: datetime | None = None) -> str:
+    """
+    Args:
+        run_time (datetime | None): When the run started, defaults to now.
+
+    Returns:
+        str: The name of the snapshot file for a run (e.g. snapshots/tyre_snapshot_20250101_120000.tys).
+    """
+    run_time = run_time or datetime.now()
+    return os.path.join("snapshots", f"tyre_snapshot_{run_time:%Y%m%d_%H%M%S}.tys")
+
+def write_snapshot(filename: str, retailers: list[Retailer]) -> int:
+    """
+    Writes every tyre of a run to a columnar binary snapshot.
+
+    The file is laid out as the magic bytes, the version and header length, a JSON header describing each column,
+    then each column as a contiguous native-endian array aligned to 8 bytes so it can be memory-mapped without copying,
+    then the dictionary of each string column.
+
+    Args:
+        filename (str): The file to write the snapshot to.
+        retailers (list[Retailer]): The retailers and their tyres that were scraped.
+
+    Returns:
+        int: The number of tyres written.
+
+    Raises:
+        ValueError: The header didn't fit in the space reserved for it.
+    """
+    empty_batch = TyreBatch() # Only used for the typecode of each number column
+    numbers: dict[str, array] = {name: array(getattr(empty_batch, name).data.typecode) for name in NUMBER_COLUMNS}
+    strings: dict[str, StringColumn] = {name: StringColumn() for name in STRING_COLUMNS}
+
+    for retailer in retailers:
+        tyres: TyreBatch = retailer.tyres
+
+        if len(tyres) == 0:
+            continue
+
+        for name in NUMBER_COLUMNS:
+            numbers[name].extend(getattr(tyres, name).data)
+
+        # Every tyre of a retailer shares the same retailer code
+        strings['retailer'].append(retailer.retailer)
+        strings['retailer'].codes.extend([strings['retailer'].codes[-1]] * (len(tyres) - 1))
+
+        for sku in tyres.sku:
+            strings['sku'].append(sku)
+
+        for name in STRING_COLUMNS[2:]:
+            _merge_string_column(strings[name], getattr(tyres, name))
+
+    rows: int = len(strings['sku'])
+    columns: dict[str, dict] = {}
+    blobs: list[tuple[str, str, bytes]] = [] # The column, the header key its offset is stored under and the bytes
+
+    for name in NUMBER_COLUMNS:
+        columns[name] = {'kind': 'number', 'typecode': numbers[name].typecode, 'itemsize': numbers[name].itemsize}
+        blobs.append((name, 'offset', numbers[name].tobytes()))
+
+    for name in STRING_COLUMNS:
+        values: list[str | None] = strings[name].values
+        columns[name] = {
+            'kind': 'string', 'typecode': 'I', 'itemsize': strings[name].codes.itemsize,
+            'dictionary_count': len(values), 'null_code': strings[name]._lookup.get(None, -1)
+        }
+        blobs.append((name, 'offset', strings[name].codes.tobytes()))
+
+    for name in STRING_COLUMNS:
+        blobs.append((name, 'dictionary_offset', _encode_dictionary(strings[name].values)))
+
+    # The header size depends on the offsets inside it, so it's reserved with a first pass then filled in
+    header: dict = {'byteorder': sys.byteorder, 'rows': rows, 'created': datetime.now().isoformat(timespec='seconds'), 'columns': columns}
+    header_size: int = _align(len(MAGIC) + 8 + len(json.dumps(header).encode('utf-8')) + 64 * len(blobs))
+    offset: int = header_size
+
+    for name, key, blob in blobs:
+        columns[name][key] = offset
+        offset = _align(offset + len(blob))
+
+    header_bytes: bytes = json.dumps(header).encode('utf-8')
+
+    if len(MAGIC) + 8 + len(header_bytes) > header_size:
+        raise ValueError(f"The snapshot header is {len(header_bytes)} bytes, more than the {header_size - len(MAGIC) - 8} bytes reserved for it")
+
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    temp_filename: str = f"{filename}.tmp"
+
+    with open(temp_filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<II', VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        _pad_to(f, header_size)
+
+        for name, key, blob in blobs:
+            _pad_to(f, columns[name][key])
+            f.write(blob)
+
+    os.replace(temp_filename, filename)
+
+    return rows
+
+def _merge_string_column(target: StringColumn, source: StringColumn) -> None:
+    """
+    Appends the rows of one dictionary encoded column to another, remapping the codes to the target's dictionary.
+
+    Args:
+        target (StringColumn): The column being added to.
+        source (StringColumn): The column being copied.
+    """
+    remap: list[int] = []
+
+    for value in source.values:
+        code: int | None = target._lookup.get(value)
+
+        if code is None:
+            code = len(target.values)
+            target.values.append(value)
+            target._lookup[value] = code
+
+        remap.append(code)
+
+    target.codes.extend(remap[code] for code in source.codes)
+
+def _encode_dictionary(values: list[str | None]) -> bytes:
+    """
+    Args:
+        values (list[str | None]): The distinct values of a string column, None is stored as an empty string (see null_code).
+
+    Returns:
+        bytes: The int64 offset of each value and the end offset, followed by the values encoded as UTF-8.
+    """
+    encoded: list[bytes] = [value.encode('utf-8') if value is not None else b'' for value in values]
+    offsets: array = array('q', [0])
+
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+
+    return offsets.tobytes() + b''.join(encoded)
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _pad_to(f: IO[bytes], offset: int) -> None:
+    f.write(b'\0' * (offset - f.tell()))
+
+class TyreSnapshot:
+    """Reads a snapshot written by write_snapshot(), every column is a zero-copy view over the memory-mapped file"""
+    def __init__(self, filename: str) -> None:
+        """
+        Memory-maps the snapshot and reads its header.
+
+        Args:
+            filename (str): The snapshot file to read.
+
+        Raises:
+            ValueError: The file isn't a snapshot or was written on a machine with a different byte order.
+        """
+        self.filename: str = filename
+        self._file: IO[bytes] = open(filename, 'rb')
+        self.buffer: mmap.mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: dict[str, memoryview] = {}
+
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"'{filename}' is not a tyre snapshot")
+
+        version, header_length = struct.unpack_from('<II', self.buffer, len(MAGIC))
+        header_start: int = len(MAGIC) + 8
+        header: dict = json.loads(self.buffer[header_start:header_start + header_length].decode('utf-8'))
+
+        if version not in READABLE_VERSIONS or header['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f"'{filename}' was written with an incompatible version or byte order")
+
+        self.rows: int = header['rows']
+        self.created: str = header['created']
+        self.columns: dict[str, dict] = header['columns']
+        self._dictionaries: dict[str, list[str | None]] = {}
+        self._dictionary_lookups: dict[str, dict[str | None, int]] = {}
+
+    def __enter__(self) -> "TyreSnapshot":
+        """Context manager entry point"""
+        return self
+
+    def __exit__(self, exception_type, exception_val, exception_tb) -> bool:
+        """Context manager exit point - ensures the memory map is closed"""
+        self.close()
+        return False
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def close(self) -> None:
+        """Releases the column views and closes the memory map."""
+        for view in self._views.values():
+            view.release()
+
+        self._views.clear()
+        self.buffer.close()
+        self._file.close()
+
+    def column(self, name: str) -> memoryview:
+        """
+        Args:
+            name (str): The name of the column.
+
+        Returns:
+            memoryview: The raw values of a number column, or the dictionary codes of a string column, without copying.
+        """
+        view: memoryview | None = self._views.get(name)
+
+        if view is None:
+            info: dict = self.columns[name]
+            start: int = info['offset']
+            view = memoryview(self.buffer)[start:start + self.rows * info['itemsize']].cast(info['typecode'])
+            self._views[name] = view
+
+        return view
+
+    def dictionary(self, name: str) -> list[str | None]:
+        """
+        Args:
+            name (str): The name of a string column.
+
+        Returns:
+            list[str | None]: The distinct values of the column, indexed by the column's codes. It's decoded the first time it's needed.
+        """
+        dictionary: list[str | None] | None = self._dictionaries.get(name)
+
+        if dictionary is not None:
+            return dictionary
+
+        info: dict = self.columns[name]
+
+        if 'dictionary' in info: # Version 1 snapshots kept the dictionaries in the header
+            dictionary = info['dictionary']
+        else:
+            count: int = info['dictionary_count']
+            start: int = info['dictionary_offset']
+            offsets: array = array('q')
+            offsets.frombytes(self.buffer[start:start + (count + 1) * offsets.itemsize])
+            data: bytes = self.buffer[start + len(offsets) * offsets.itemsize:start + len(offsets) * offsets.itemsize + offsets[-1]]
+            dictionary = [data[offsets[code]:offsets[code + 1]].decode('utf-8') for code in range(count)]
+
+            if info['null_code'] >= 0:
+                dictionary[info['null_code']] = None
+
+        self._dictionaries[name] = dictionary
+
+        return dictionary
+
+    def get_code(self, name: str, value: str | None) -> int | None:
+        """
+        Args:
+            name (str): The name of a string column.
+            value (str | None): The value to look up.
+
+        Returns:
+            int | None: The dictionary code of the value, or None if the value never appears in the column.
+        """
+        if name not in self._dictionary_lookups:
+            self._dictionary_lookups[name] = {value: code for code, value in enumerate(self.dictionary(name))}
+
+        return self._dictionary_lookups[name].get(value)
+
+    def get_value(self, name: str, index: int) -> str | int | bool | None:
+        """
+        Args:
+            name (str): The name of the column.
+            index (int): The row.
+
+        Returns:
+            str | int | bool | None: The decoded value of the column at the row.
+        """
+        info: dict = self.columns[name]
+        value: int = self.column(name)[index]
+
+        if info['kind'] == 'string':
+            return self.dictionary(name)[value]
+
+        if value == NULL:
+            return None
+
+        return bool(value) if info['typecode'] == 'b' else value
+
+    def filter(self,
+               tyre_width: int | None = None,
+               aspect_ratio: int | None = None,
+               rim_diameter: int | None = None,
+               brand: str | None = None,
+               retailer: str | None = None
+    ) -> list[int]:
+        """
+        Finds the rows matching every criteria given, criteria left as None aren't checked.
+        Brand and retailer are compared by their dictionary code so no strings are decoded while filtering.
+
+        Args:
+            tyre_width (int | None): The width of the tyre (e.g. 205).
+            aspect_ratio (int | None): The aspect ratio of the tyre (e.g. 55).
+            rim_diameter (int | None): The diameter of the tyre (e.g. 16).
+            brand (str | None): The brand of the tyre (e.g. Goodyear).
+            retailer (str | None): The retailer the tyre was scraped from (e.g. national.co.uk).
+
+        Returns:
+            list[int]: The indexes of the matching rows.
+        """
+        checks: list[tuple[memoryview, int]] = []
+
+        for name, value in (('tyre_width', tyre_width), ('aspect_ratio', aspect_ratio), ('rim_diameter', rim_diameter)):
+            if value is not None:
+                checks.append((self.column(name), value))
+
+        for name, value in (('brand', brand), ('retailer', retailer)):
+            if value is not None:
+                code: int | None = self.get_code(name, value.title() if name == 'brand' else value)
+
+                if code is None:
+                    return []
+
+                checks.append((self.column(name), code))
+
+        if not checks:
+            return list(range(self.rows))
+
+        # Starts with the first check then narrows the candidate rows down with each of the others
+        first_column, first_value = checks[0]
+        matches: list[int] = [index for index, value in enumerate(first_column) if value == first_value]
+
+        for column, expected in checks[1:]:
+            matches = [index for index in matches if column[index] == expected]
+
+        return matches
+
+    def get_tyre(self, index: int) -> Tyre:
+        """
+        Args:
+            index (int): The row.
+
+        Returns:
+            Tyre: The tyre stored at the row.
+        """
+        price_pence: int | None = self.get_value('price_pence', index)
+
+        return Tyre(
+            sku=self.get_value('sku', index),
+            brand=self.get_value('brand', index),
+            pattern=self.get_value('pattern', index),
+            tyre_width=self.get_value('tyre_width', index),
+            aspect_ratio=self.get_value('aspect_ratio', index),
+            rim_diameter=self.get_value('rim_diameter', index),
+            load_index=self.get_value('load_index', index),
+            speed_rating=self.get_value('speed_rating', index),
+            price=price_pence / 100 if price_pence is not None else None,
+            wet_grip=self.get_value('wet_grip', index),
+            season=self.get_value('season', index),
+            fuel_efficiency=self.get_value('fuel_efficiency', index),
+            db_rating_number=self.get_value('db_rating_number', index),
+            db_rating_letter=self.get_value('db_rating_letter', index),
+            budget=self.get_value('budget', index),
+            electric=self.get_value('electric', index),
+            tyre_type=self.get_value('tyre_type', index)
+        )
+
+    def get_retailers(self, indexes: list[int]) -> list[Retailer]:
+        """
+        Groups rows back into retailers, e.g. to re-export the result of filter().
+
+        Args:
+            indexes (list[int]): The rows to include.
+
+        Returns:
+            list[Retailer]: One Retailer per retailer that appears in the rows.
+        """
+        batches: dict[str, TyreBatch] = {}
+
+        for index in indexes:
+            batches.setdefault(self.get_value('retailer', index), TyreBatch()).append(self.get_tyre(index))
+
+        return [Retailer(retailer, tyres) for retailer, tyres in batches.items()]